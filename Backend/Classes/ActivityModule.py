@@ -1,5 +1,8 @@
 from Classes.DataConfig import DataConfig
+from Classes.ActivityWriter import ActivityWriter
+from Classes.Pagination import Pagination
 from datetime import datetime
+import os
 
 class ActivityTracker:
     """
@@ -9,11 +12,16 @@ class ActivityTracker:
     
     def __init__(self):
         self.supabase = DataConfig.get_client()
+        # Activities are written in the background unless ACTIVITY_ASYNC=0
+        self._async = os.getenv("ACTIVITY_ASYNC", "1") != "0"
     
     def log_activity(self, user_id, activity_type, description, related_item_id=None, related_item_type=None):
         """
         Log a user activity to the activities table.
         
+        By default the record is queued on the ActivityWriter and inserted in a
+        batch by its background thread, so the caller does not wait for it.
+        
         Args:
             user_id (str): The UUID of the user performing the activity
             activity_type (str): Type of activity (create, update, delete, etc.)
@@ -22,7 +30,7 @@ class ActivityTracker:
             related_item_type (str, optional): Type of the related item (project, script, etc.)
             
         Returns:
-            dict: The created activity record or None if failed
+            dict: The created (or queued) activity record or None if failed
         """
         try:
             activity_data = {
@@ -30,9 +38,16 @@ class ActivityTracker:
                 "activity_type": activity_type,
                 "description": description,
                 "related_item_id": related_item_id,
-                "related_item_type": related_item_type
+                "related_item_type": related_item_type,
+                # Stamped here so batching does not reorder the feed
+                "timestamp": DataConfig.get_timestamp()
             }
             
+            if self._async:
+                if ActivityWriter.get_instance().enqueue(activity_data):
+                    return activity_data
+                return None
+            
             # Use authenticated client if available
             result = self.supabase.table("activities").insert(activity_data).execute()
             
@@ -43,6 +58,40 @@ class ActivityTracker:
             print(f"Error logging activity: {str(e)}")
             return None
     
+    def log_activities(self, activities):
+        """
+        Log several activities at once, as a single bulk insert when writing synchronously.
+        
+        Args:
+            activities (list): Dicts with the keyword arguments of log_activity
+            
+        Returns:
+            int: Number of activities logged (or queued)
+        """
+        timestamp = DataConfig.get_timestamp()
+        records = [{
+            "user_id": activity["user_id"],
+            "activity_type": activity["activity_type"],
+            "description": activity["description"],
+            "related_item_id": activity.get("related_item_id"),
+            "related_item_type": activity.get("related_item_type"),
+            "timestamp": timestamp
+        } for activity in activities]
+        
+        if not records:
+            return 0
+        
+        try:
+            if self._async:
+                writer = ActivityWriter.get_instance()
+                return sum(1 for record in records if writer.enqueue(record))
+            
+            result = self.supabase.table("activities").insert(records).execute()
+            return len(result.data or [])
+        except Exception as e:
+            print(f"Error logging activities: {str(e)}")
+            return 0
+    
     def get_user_activities(self, user_id, limit=10):
         """
         Get recent activities for a specific user.
@@ -67,30 +116,75 @@ class ActivityTracker:
             print(f"Error fetching user activities: {str(e)}")
             return []
             
-    def get_auth_activities(self, auth_token, limit=10):
+    def get_auth_activities(self, auth_token, limit=10, activity_type=None, related_item_type=None):
         """
         Get recent activities for the authenticated user.
         
         Args:
             auth_token (str): The authentication token
             limit (int): Maximum number of activities to return
+            activity_type (str, optional): Only return activities of this type
+            related_item_type (str, optional): Only return activities about this kind of item
             
         Returns:
             list: List of activity records
         """
         try:
             auth_client = DataConfig.get_auth_client(auth_token)
-            result = auth_client.table("activities") \
-                .select("*") \
-                .order("timestamp", desc=True) \
-                .limit(limit) \
-                .execute()
+            query = self._activities_query(auth_client, activity_type, related_item_type)
+            result = query.limit(limit).execute()
             
             return result.data
         except Exception as e:
             print(f"Error fetching authenticated user activities: {str(e)}")
             return []
             
+    def get_activity_page(self, auth_token, limit=20, cursor=None, activity_type=None, related_item_type=None):
+        """
+        Get one page of the authenticated user's activity feed, newest first.
+        
+        Pages are selected by keyset on (timestamp, id), so deep pages cost the
+        same as the first one.
+        
+        Args:
+            auth_token (str): The authentication token
+            limit (int): Page size
+            cursor (str, optional): The next_cursor of the previous page
+            activity_type (str, optional): Only return activities of this type
+            related_item_type (str, optional): Only return activities about this kind of item
+            
+        Returns:
+            dict: {"activities": [...], "next_cursor": str or None}
+        """
+        limit = Pagination.clamp_limit(limit)
+        
+        auth_client = DataConfig.get_auth_client(auth_token)
+        query = self._activities_query(auth_client, activity_type, related_item_type)
+        
+        if cursor:
+            last_timestamp, last_id = Pagination.decode_cursor(cursor)
+            query = query.or_(Pagination.after_filter("timestamp", True, last_timestamp, last_id))
+            
+        result = query.limit(limit + 1).execute()
+        activities, next_cursor = Pagination.page(
+            result.data or [],
+            limit,
+            lambda activity: [activity["timestamp"], activity["id"]]
+        )
+        
+        return {"activities": activities, "next_cursor": next_cursor}
+            
+    def _activities_query(self, client, activity_type=None, related_item_type=None):
+        """Build the newest-first activity query with optional filters."""
+        query = client.table("activities").select("*")
+        
+        if activity_type:
+            query = query.eq("activity_type", activity_type)
+        if related_item_type:
+            query = query.eq("related_item_type", related_item_type)
+            
+        return query.order("timestamp", desc=True).order("id", desc=True)
+            
     def delete_user_activities(self, auth_token):
         """
         Delete all activities for the authenticated user.
@@ -0,0 +1,171 @@
+import json
+import os
+import struct
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process owns the spool
+    fcntl = None
+
+
+class ActivitySpool:
+    """
+    Append-only local log of activity records waiting to be written to the database.
+
+    Each record is stored as a 4-byte length, a 4-byte CRC32 and a JSON payload.
+    A separate index file holds the offset up to which records were committed to
+    the database, so replay after a crash starts from there instead of the top.
+    A torn record at the end of the log (from a crash mid-write) is truncated
+    on open. Once everything is committed the log is truncated back to empty.
+
+    Every process locks its own slot file, so several workers can spool into the
+    same directory and a restarted worker picks up the files of a dead one.
+
+    The log is capped at max_bytes; appending past it raises. Records the
+    database rejects are moved to a .rejected file next to the log.
+    """
+
+    _HEADER = struct.Struct(">II")
+
+    def __init__(self, directory: str, max_slots: int = 64, max_bytes: int = None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self._file = None
+        for slot in range(max_slots):
+            path = os.path.join(directory, f"activities-{slot}.spool")
+            handle = open(path, "a+b")
+            if self._try_lock(handle):
+                self._file = handle
+                self.path = path
+                break
+            handle.close()
+
+        if self._file is None:
+            raise Exception(f"No free activity spool slot in {directory}")
+
+        self._index_path = self.path + ".index"
+        self._committed = self._read_index()
+        self._recover()
+
+    @staticmethod
+    def _try_lock(handle) -> bool:
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _read_index(self) -> int:
+        try:
+            with open(self._index_path, "rb") as index:
+                return struct.unpack(">Q", index.read(8))[0]
+        except (OSError, struct.error):
+            return 0
+
+    def _write_index(self, offset: int):
+        """Atomically replace the committed offset."""
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "wb") as index:
+            index.write(struct.pack(">Q", offset))
+            index.flush()
+            os.fsync(index.fileno())
+        os.replace(tmp_path, self._index_path)
+        self._committed = offset
+
+    def _size(self) -> int:
+        # fstat rather than seek, so stats() can be read while the writer thread scans
+        return os.fstat(self._file.fileno()).st_size
+
+    def _recover(self):
+        """Drop a torn tail and reset an index that points past the end of the log."""
+        size = self._size()
+        if self._committed > size:
+            # The log was truncated after everything was committed
+            self._write_index(0)
+
+        offset = self._committed
+        for _, end in self._scan(self._committed):
+            offset = end
+
+        if offset < size:
+            print(f"Truncating {size - offset} torn bytes from activity spool {self.path}")
+            self._file.truncate(offset)
+            self._sync()
+
+    def _scan(self, offset: int, limit: int = None):
+        """Yield (record, end_offset) pairs starting at offset, stopping at the first bad record."""
+        self._file.seek(offset)
+        count = 0
+
+        while limit is None or count < limit:
+            header = self._file.read(self._HEADER.size)
+            if len(header) < self._HEADER.size:
+                return
+
+            length, checksum = self._HEADER.unpack(header)
+            payload = self._file.read(length)
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                return
+
+            offset += self._HEADER.size + length
+            count += 1
+            yield json.loads(payload), offset
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def append(self, records: list):
+        """Append records and fsync them as one batch. Raises if the log would grow past max_bytes."""
+        data = b""
+        for record in records:
+            payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+            data += self._HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        if self.max_bytes is not None and self._size() + len(data) > self.max_bytes:
+            raise Exception(f"Activity spool {self.path} is full")
+
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(data)
+        self._sync()
+
+    def has_pending(self) -> bool:
+        return self._size() > self._committed
+
+    def pending_bytes(self) -> int:
+        return self._size() - self._committed
+
+    def read_pending(self, limit: int) -> list:
+        """
+        Read up to limit uncommitted records.
+
+        Returns:
+            list: (record, offset to commit once it is written) pairs, in log order
+        """
+        return list(self._scan(self._committed, limit))
+
+    def commit(self, offset: int):
+        """Mark records up to offset as written, truncating the log once it is fully drained."""
+        if offset >= self._size():
+            # Truncate first: a crash before the index is rewritten leaves an index
+            # past the end of the log, which _recover resets to zero
+            self._file.truncate(0)
+            self._sync()
+            offset = 0
+        self._write_index(offset)
+
+    def reject(self, record: dict, reason: str):
+        """Keep a record the database refused in the .rejected file, so it is not retried."""
+        line = json.dumps({"record": record, "error": reason}, separators=(",", ":"))
+        with open(self.path + ".rejected", "a", encoding="utf-8") as rejected:
+            rejected.write(line + "\n")
+            rejected.flush()
+            os.fsync(rejected.fileno())
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,276 @@
+from dotenv import load_dotenv
+from Classes.DataConfig import DataConfig
+from Classes.ActivitySpool import ActivitySpool
+from postgrest.exceptions import APIError
+import atexit
+import os
+import queue
+import threading
+import time
+
+# Load environment variables
+load_dotenv()
+
+
+class ActivityWriter:
+    """
+    Background writer that batches activity records into bulk inserts.
+
+    Records are put on a bounded queue and written by a daemon thread as one
+    insert per ACTIVITY_BATCH_SIZE records or ACTIVITY_FLUSH_INTERVAL_MS
+    milliseconds, whichever comes first. When the queue is full, callers wait
+    up to ACTIVITY_ENQUEUE_TIMEOUT_MS before the record is dropped and counted.
+
+    Unless ACTIVITY_SPOOL_DIR is set to an empty string, each batch is first
+    appended to a local ActivitySpool and fsynced, then drained into the
+    database. A failing insert leaves the records in the spool and is retried
+    with backoff, and records left over from a crash are replayed on start.
+    A batch the database rejects (bad data rather than an outage) is split
+    until the offending records are found; those are moved to the spool's
+    .rejected file and counted as dropped. The spool holds at most
+    ACTIVITY_SPOOL_MAX_BYTES; past that, batches are written directly.
+    """
+
+    _MAX_RETRY_DELAY = 30.0
+
+    # Errors caused by the records themselves, which no retry can fix: SQLSTATE
+    # classes 22 (data exception) and 23 (integrity constraint violation),
+    # undefined columns and type mismatches, and PostgREST request errors
+    _REJECTED_CODES = ("22", "23", "42703", "42804", "PGRST1", "PGRST204")
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, batch_size: int = None, flush_interval_ms: int = None,
+                 queue_size: int = None, enqueue_timeout_ms: int = None):
+        self.batch_size = batch_size or int(os.getenv("ACTIVITY_BATCH_SIZE", "50"))
+        self.flush_interval = (flush_interval_ms or int(os.getenv("ACTIVITY_FLUSH_INTERVAL_MS", "250"))) / 1000
+        self.queue_size = queue_size or int(os.getenv("ACTIVITY_QUEUE_SIZE", "10000"))
+        self.enqueue_timeout = (enqueue_timeout_ms if enqueue_timeout_ms is not None
+                                else int(os.getenv("ACTIVITY_ENQUEUE_TIMEOUT_MS", "50"))) / 1000
+
+        self.spool_dir = os.getenv("ACTIVITY_SPOOL_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "spool"))
+        self.spool_max_bytes = int(os.getenv("ACTIVITY_SPOOL_MAX_BYTES", str(64 * 1024 * 1024)))
+
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._spool = None
+        self._retry_delay = 0.0
+        self._retry_at = 0.0
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+        self.enqueued = 0
+        self.spooled = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+
+    @classmethod
+    def get_instance(cls):
+        """Initialize or retrieve the process-wide activity writer."""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+                    atexit.register(cls._instance.shutdown)
+        return cls._instance
+
+    def start(self):
+        """Start the writer now, replaying records spooled before the last shutdown."""
+        self._ensure_started()
+
+    def _ensure_started(self):
+        """Start the writer thread, again in a forked child where it does not exist."""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                if self._pid is not None and self._pid != os.getpid():
+                    # The parent's queued records are the parent's to write
+                    self._queue = queue.Queue(maxsize=self.queue_size)
+                self._pid = os.getpid()
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="activity-writer", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, record: dict) -> bool:
+        """
+        Queue an activity record for writing.
+
+        Returns:
+            bool: False if the queue stayed full and the record was dropped
+        """
+        self._ensure_started()
+
+        try:
+            self._queue.put(record, timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            print("Activity queue full, dropping activity record")
+            return False
+
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def flush(self):
+        """Block until every queued record has been spooled (or written, without a spool)."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def shutdown(self, timeout: float = 5.0):
+        """Flush outstanding records and stop the writer thread."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        """Return writer counters."""
+        with self._lock:
+            return {
+                "enqueued": self.enqueued,
+                "spooled": self.spooled,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed_batches": self.failed_batches,
+                "queued": self._queue.qsize(),
+                "spool_pending_bytes": self._spool.pending_bytes() if self._spool else 0
+            }
+
+    def _next_batch(self):
+        """Collect up to batch_size records, waiting at most flush_interval after the first."""
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                elif self._stopping.is_set():
+                    # Drain without waiting while shutting down
+                    batch.append(self._queue.get_nowait())
+                else:
+                    break
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _open_spool(self):
+        if not self.spool_dir:
+            return None
+        try:
+            return ActivitySpool(self.spool_dir, max_bytes=self.spool_max_bytes)
+        except Exception as e:
+            print(f"Activity spool unavailable, writing directly: {str(e)}")
+            return None
+
+    def _run(self):
+        self._spool = self._open_spool()
+
+        while True:
+            batch = self._next_batch()
+
+            if batch:
+                self._persist(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+            if self._spool and self._spool.has_pending() and time.monotonic() >= self._retry_at:
+                self._drain()
+
+            if not batch and self._stopping.is_set():
+                if self._spool:
+                    self._spool.close()
+                return
+
+    def _persist(self, batch: list):
+        """Spool a batch, or write it straight away when there is no spool."""
+        if self._spool is None:
+            self._write(batch)
+            return
+
+        try:
+            self._spool.append(batch)
+            with self._lock:
+                self.spooled += len(batch)
+        except Exception as e:
+            print(f"Error spooling activity batch: {str(e)}")
+            self._write(batch)
+
+    def _drain(self):
+        """Write spooled records in bulk, committing the spool offset after each insert."""
+        while self._spool.has_pending():
+            pending = self._spool.read_pending(self.batch_size)
+            if not pending:
+                return
+
+            try:
+                self._write_spooled(pending)
+            except Exception as e:
+                with self._lock:
+                    self.failed_batches += 1
+                self._retry_delay = min(max(self._retry_delay * 2, self.flush_interval), self._MAX_RETRY_DELAY)
+                self._retry_at = time.monotonic() + self._retry_delay
+                print(f"Error writing spooled activities, retrying in {self._retry_delay:.1f}s: {str(e)}")
+                return
+
+            self._retry_delay = 0.0
+
+    def _write_spooled(self, pending: list):
+        """
+        Insert (record, end offset) pairs from the spool and commit past them.
+
+        A rejected batch is split in halves, each committed once written, until
+        the rejected records are isolated and set aside. Other errors propagate
+        so the remaining records are retried.
+        """
+        records = [record for record, _ in pending]
+        try:
+            DataConfig.get_client().table("activities").insert(records).execute()
+        except Exception as e:
+            if not self._is_rejected(e):
+                raise
+            if len(pending) > 1:
+                middle = len(pending) // 2
+                self._write_spooled(pending[:middle])
+                self._write_spooled(pending[middle:])
+                return
+
+            print(f"Activity record rejected, moving it out of the spool: {str(e)}")
+            self._spool.reject(records[0], str(e))
+            with self._lock:
+                self.dropped += 1
+        else:
+            with self._lock:
+                self.written += len(records)
+
+        self._spool.commit(pending[-1][1])
+
+    @classmethod
+    def _is_rejected(cls, error) -> bool:
+        """Whether the database refused the records themselves, as opposed to being unavailable."""
+        return isinstance(error, APIError) and str(error.code or "").startswith(cls._REJECTED_CODES)
+
+    def _write(self, batch: list):
+        try:
+            DataConfig.get_client().table("activities").insert(batch).execute()
+            with self._lock:
+                self.written += len(batch)
+        except Exception as e:
+            with self._lock:
+                self.failed_batches += 1
+                self.dropped += len(batch)
+            print(f"Error writing activity batch: {str(e)}")
@@ -1,17 +1,16 @@
 from Classes.DataConfig import DataConfig
+from Classes.CollectionVersions import CollectionVersions
+from Classes.SearchIndex import SearchIndex
+from Classes.QueryCache import QueryCache
 from Classes.ActivityModule import ActivityTracker
+from Classes.Mutations import Mutations
 
 class CanvasManager:
    # Initialization
    def __init__(self):
         self._client = DataConfig.get_client()
-        self._auth_token = None
         self._activity_tracker = ActivityTracker()
         
-   def set_auth_token(self, auth_token):
-        """Set the auth token for authenticated requests."""
-        self._auth_token = auth_token
-        
    def save_canvas(self, name, content, user_id, description=None):
         """Save a canvas to the database."""
         try:
@@ -27,12 +26,15 @@ class CanvasManager:
                 raise Exception("User ID is required for canvas creation")
                 
             # Use auth client for RLS-protected operations
-            client = DataConfig.get_auth_client(self._auth_token)
+            client = DataConfig.get_request_client()
             response = client.table('canvas').insert(canvas_data).execute()
             
             if not response.data:
                 raise Exception("Canvas creation failed")
             
+            CollectionVersions.bump(user_id, 'canvas', 'create', response.data[0]['id'])
+            SearchIndex.get_instance().apply(user_id, 'canvas', upserts=response.data)
+            
             # Log activity
             canvas = response.data[0]
             self._activity_tracker.log_activity(
@@ -52,7 +54,7 @@ class CanvasManager:
         """Fetch a specific canvas by ID."""
         try:
             # Use auth client for RLS-protected operations
-            client = DataConfig.get_auth_client(self._auth_token)
+            client = DataConfig.get_request_client()
             response = client.table('canvas').select('*').eq('id', canvas_id).eq('user_id', user_id).execute()
             
             if not response.data:
@@ -67,10 +69,14 @@ class CanvasManager:
         """Fetch all canvases for a user."""
         try:
             # Use auth client for RLS-protected operations
-            client = DataConfig.get_auth_client(self._auth_token)
-            response = client.table('canvas').select('*').eq('user_id', user_id).order('created_at', desc=True).execute()
+            client = DataConfig.get_request_client()
+            query = client.table('canvas').select('*').eq('user_id', user_id).order('created_at', desc=True)
             
-            return response.data if response.data else []
+            def load():
+                response = query.execute()
+                return response.data if response.data else []
+                
+            return QueryCache.get_instance().get_or_load(user_id, 'canvas', {}, load)
             
         except Exception as e:
             raise Exception(f"Failed to fetch canvases: {str(e)}")
@@ -79,19 +85,15 @@ class CanvasManager:
         """Update a canvas."""
         try:
             # Use auth client for RLS-protected operations
-            client = DataConfig.get_auth_client(self._auth_token)
+            client = DataConfig.get_request_client()
             
-            # Get canvas details before update for activity logging
-            canvas_details = client.table('canvas').select('*').eq('id', canvas_id).eq('user_id', user_id).execute()
-            if not canvas_details.data:
+            # Update and get the previous state for activity logging in one request
+            canvas, updated_canvas = Mutations.update_with_diff(client, 'canvas', canvas_id, updates, user_id)
+            if not updated_canvas:
                 raise Exception("Canvas not found or access denied")
             
-            canvas = canvas_details.data[0]
-            
-            response = client.table('canvas').update(updates).eq('id', canvas_id).eq('user_id', user_id).execute()
-            
-            if not response.data:
-                raise Exception("Canvas update failed")
+            CollectionVersions.bump(user_id, 'canvas', 'update', canvas_id)
+            SearchIndex.get_instance().apply(user_id, 'canvas', upserts=[updated_canvas])
             
             # Log activity
             self._activity_tracker.log_activity(
@@ -102,7 +104,7 @@ class CanvasManager:
                 related_item_type="canvas"
             )
                 
-            return response.data[0]
+            return updated_canvas
             
         except Exception as e:
             raise Exception(f"Failed to update canvas: {str(e)}")
@@ -111,19 +113,18 @@ class CanvasManager:
         """Delete a canvas."""
         try:
             # Use auth client for RLS-protected operations
-            client = DataConfig.get_auth_client(self._auth_token)
-            
-            # Get canvas details before deletion for activity logging
-            canvas_details = client.table('canvas').select('*').eq('id', canvas_id).eq('user_id', user_id).execute()
-            if not canvas_details.data:
-                raise Exception("Canvas not found or access denied")
-            
-            canvas = canvas_details.data[0]
+            client = DataConfig.get_request_client()
             
+            # The deleted row is returned, so it does not need to be read first
             response = client.table('canvas').delete().eq('id', canvas_id).eq('user_id', user_id).execute()
             
             if not response.data:
-                raise Exception("Canvas deletion failed")
+                raise Exception("Canvas not found or access denied")
+            
+            canvas = response.data[0]
+            
+            CollectionVersions.bump(user_id, 'canvas', 'delete', canvas_id)
+            SearchIndex.get_instance().apply(user_id, 'canvas', deletes=[canvas_id])
             
             # Log activity
             self._activity_tracker.log_activity(
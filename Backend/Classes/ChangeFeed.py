@@ -0,0 +1,155 @@
+from dotenv import load_dotenv
+from Classes.CollectionVersions import CollectionVersions
+from Classes.SharedState import SharedState
+from collections import deque
+import json
+import os
+import threading
+import time
+
+# Load environment variables
+load_dotenv()
+
+
+class Subscription:
+    """One open change stream: a bounded buffer of changes and a wake-up event."""
+
+    def __init__(self, user_id, buffer_size: int):
+        self.user_id = user_id
+        self.changes = deque(maxlen=buffer_size)
+        self.overflowed = False
+        self.wakeup = threading.Event()
+
+    def push(self, change: dict):
+        if len(self.changes) == self.changes.maxlen:
+            # The oldest change is dropped; the client is told to refetch instead
+            self.overflowed = True
+        self.changes.append(change)
+        self.wakeup.set()
+
+
+class ChangeFeed:
+    """
+    In-process publish/subscribe of collection changes, served as Server-Sent Events.
+
+    Every CollectionVersions.bump (i.e. every committed manager mutation) is
+    pushed to the open streams of that user. Each stream has its own bounded
+    buffer, so a slow client can never hold more than STREAM_BUFFER_SIZE
+    changes; when it falls further behind it gets a "resync" event instead.
+
+    Waiting only uses threading.Event, which gevent and eventlet monkey patch,
+    so an idle stream does not hold an OS thread under a cooperative worker.
+    When SharedState is enabled, changes made by other worker processes are
+    picked up by polling the shared collection versions. Without it, a stream
+    only sees the changes of its own process, so the "ready" event asks the
+    client to refetch every STREAM_FALLBACK_POLL_SECONDS as well (set it to 0
+    for a single worker process, where the stream alone is complete).
+    """
+
+    COLLECTIONS = ("tasks", "scripts", "projects", "events", "items", "canvas")
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self.buffer_size = int(os.getenv("STREAM_BUFFER_SIZE", "100"))
+        self.heartbeat = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+        self.poll_interval = float(os.getenv("STREAM_SHARED_POLL_MS", "1000")) / 1000
+        self.max_per_user = int(os.getenv("STREAM_MAX_PER_USER", "5"))
+        self.fallback_poll = int(os.getenv("STREAM_FALLBACK_POLL_SECONDS", "30"))
+
+        self._subscriptions = {}  # user_id -> set of Subscription
+        self._lock = threading.Lock()
+
+        CollectionVersions.add_listener(self.publish)
+
+    @classmethod
+    def get_instance(cls):
+        """Initialize or retrieve the process-wide change feed."""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def publish(self, user_id, collection, version, op=None, row_id=None):
+        """Push a change to every open stream of the user."""
+        change = {"collection": collection, "id": row_id, "op": op, "version": version}
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(str(user_id), ()))
+        for subscription in subscriptions:
+            subscription.push(change)
+
+    def subscribe(self, user_id) -> Subscription:
+        with self._lock:
+            subscriptions = self._subscriptions.setdefault(str(user_id), set())
+            if len(subscriptions) >= self.max_per_user:
+                raise Exception("Too many open change streams")
+            subscription = Subscription(str(user_id), self.buffer_size)
+            subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    @staticmethod
+    def _frame(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n"
+
+    def _versions(self, user_id) -> dict:
+        return {collection: CollectionVersions.get(user_id, collection) for collection in self.COLLECTIONS}
+
+    def stream(self, subscription: Subscription, expires_at=None):
+        """
+        Yield Server-Sent Events frames for a subscription until the client
+        disconnects or its token expires (it then reconnects with a fresh one).
+        """
+        shared = SharedState.is_enabled()
+        known = self._versions(subscription.user_id)
+
+        try:
+            yield "retry: 5000\n\n"
+            # poll: seconds between full refetches the client needs on top of the stream
+            yield self._frame("ready", {"versions": known, "poll": None if shared else (self.fallback_poll or None)})
+
+            last_frame = time.monotonic()
+            while expires_at is None or time.time() < expires_at:
+                timeout = self.poll_interval if shared else self.heartbeat
+                subscription.wakeup.wait(timeout)
+                subscription.wakeup.clear()
+
+                frames = []
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    subscription.changes.clear()
+                    known = self._versions(subscription.user_id)
+                    frames.append(self._frame("resync", {"versions": known}))
+
+                while subscription.changes:
+                    change = subscription.changes.popleft()
+                    known[change["collection"]] = max(known.get(change["collection"], 0), change["version"])
+                    frames.append(self._frame("change", change))
+
+                # Changes committed by other worker processes only show up as newer versions
+                if shared:
+                    for collection, version in self._versions(subscription.user_id).items():
+                        if version > known.get(collection, 0):
+                            known[collection] = version
+                            frames.append(self._frame("change", {
+                                "collection": collection, "id": None, "op": None, "version": version
+                            }))
+
+                if frames:
+                    yield "".join(frames)
+                    last_frame = time.monotonic()
+                elif time.monotonic() - last_frame >= self.heartbeat:
+                    # Comment frames keep proxies from closing an idle connection
+                    yield ": heartbeat\n\n"
+                    last_frame = time.monotonic()
+        finally:
+            self.unsubscribe(subscription)
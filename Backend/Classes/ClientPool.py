@@ -0,0 +1,70 @@
+from postgrest import SyncPostgrestClient
+import os
+import threading
+
+
+class ClientPool:
+    """
+    Pool of PostgREST sessions with keep-alive HTTP connections.
+
+    A session is borrowed by exactly one caller at a time and carries that
+    caller's auth token for as long as it is borrowed, so concurrent requests
+    never share an RLS identity. Idle sessions keep their connections open and
+    are re-authorized on the next borrow.
+    """
+
+    def __init__(self, url: str, key: str, max_idle: int = None, timeout: int = None):
+        self._rest_url = f"{url.rstrip('/')}/rest/v1"
+        self._key = key
+        self._max_idle = max_idle if max_idle is not None else int(os.getenv("SUPABASE_POOL_MAX_IDLE", "16"))
+        self._timeout = timeout if timeout is not None else int(os.getenv("SUPABASE_POOL_TIMEOUT", "30"))
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _new_session(self) -> SyncPostgrestClient:
+        headers = {
+            "apiKey": self._key,
+            "Authorization": f"Bearer {self._key}"
+        }
+        return SyncPostgrestClient(self._rest_url, headers=headers, timeout=self._timeout)
+
+    def _check_fork(self):
+        """Forget sessions inherited from a parent process; their sockets belong to it."""
+        if self._pid != os.getpid():
+            self._idle = []
+            self._pid = os.getpid()
+
+    def acquire(self, auth_token: str) -> SyncPostgrestClient:
+        """Borrow a session authorized with the given token."""
+        with self._lock:
+            self._check_fork()
+            session = self._idle.pop() if self._idle else None
+
+        if session is None:
+            session = self._new_session()
+
+        session.auth(auth_token)
+        return session
+
+    def release(self, session: SyncPostgrestClient):
+        """Return a borrowed session to the pool, closing it if the pool is full."""
+        # Never leave a user's token on an idle session
+        session.auth(self._key)
+
+        with self._lock:
+            self._check_fork()
+            if len(self._idle) < self._max_idle:
+                self._idle.append(session)
+                return
+
+        session.session.close()
+
+    def close(self):
+        """Close all idle sessions."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+
+        for session in idle:
+            session.session.close()
@@ -0,0 +1,176 @@
+from Classes.SharedState import SharedState
+from flask import make_response, request
+from functools import wraps
+import hashlib
+import threading
+import uuid
+
+
+class CollectionVersions:
+    """
+    Per-user version counters for each collection (tasks, events, projects, ...).
+
+    Every manager mutation bumps the counter of the collection it changed, so a
+    list endpoint can build an ETag from the counters and answer If-None-Match
+    without querying Supabase. Counters live in SharedState when it is enabled
+    and in process memory otherwise, where they only see the writes handled by
+    the same process, so conditional responses need SharedState.
+    """
+
+    _lock = threading.Lock()
+    _counters = {}  # (user_id, collection) -> version
+    _epoch = uuid.uuid4().hex[:8]  # Changes on restart, so stale ETags never match
+    _shared_epoch = None
+    _schema_ready = False
+    _listeners = []
+
+    @classmethod
+    def _connect(cls):
+        connection = SharedState.connect()
+        if not cls._schema_ready:
+            connection.execute(
+                "create table if not exists collection_versions ("
+                " user_id text not null, collection text not null, version integer not null,"
+                " primary key (user_id, collection))"
+            )
+            connection.execute("create table if not exists collection_epoch (epoch text not null)")
+            connection.execute(
+                "insert into collection_epoch (epoch) select ? where not exists (select 1 from collection_epoch)",
+                (cls._epoch,)
+            )
+            cls._schema_ready = True
+        return connection
+
+    @classmethod
+    def epoch(cls) -> str:
+        if SharedState.is_enabled():
+            if cls._shared_epoch is None:
+                cls._shared_epoch = cls._connect().execute("select epoch from collection_epoch").fetchone()[0]
+            return cls._shared_epoch
+        return cls._epoch
+
+    @classmethod
+    def get(cls, user_id, collection) -> int:
+        """Current version of a user's collection."""
+        if SharedState.is_enabled():
+            row = cls._connect().execute(
+                "select version from collection_versions where user_id = ? and collection = ?",
+                (str(user_id), collection)
+            ).fetchone()
+            return row[0] if row else 0
+
+        with cls._lock:
+            return cls._counters.get((str(user_id), collection), 0)
+
+    @classmethod
+    def add_listener(cls, listener):
+        """
+        Call listener(user_id, collection, version, op, row_id) after every bump.
+
+        Listeners run on the request thread, so they should only hand the change
+        off (e.g. to a queue) and return.
+        """
+        cls._listeners.append(listener)
+
+    @classmethod
+    def bump(cls, user_id, collection, op=None, row_id=None) -> int:
+        """
+        Record a change to a user's collection and return the new version.
+
+        Args:
+            user_id (str): Owner of the collection
+            collection (str): The collection that changed, e.g. "tasks"
+            op (str, optional): What happened: "create", "update", "delete", "clear" or "batch"
+            row_id (optional): The row that changed, when there is a single one
+        """
+        if not user_id:
+            return 0
+
+        version = cls._increment(user_id, collection)
+
+        for listener in cls._listeners:
+            try:
+                listener(user_id, collection, version, op, row_id)
+            except Exception as e:
+                print(f"Error notifying change listener: {str(e)}")
+
+        return version
+
+    @classmethod
+    def _increment(cls, user_id, collection) -> int:
+        if SharedState.is_enabled():
+            connection = cls._connect()
+            connection.execute("begin immediate")
+            try:
+                connection.execute(
+                    "insert into collection_versions (user_id, collection, version) values (?, ?, 1)"
+                    " on conflict (user_id, collection) do update set version = version + 1",
+                    (str(user_id), collection)
+                )
+                version = connection.execute(
+                    "select version from collection_versions where user_id = ? and collection = ?",
+                    (str(user_id), collection)
+                ).fetchone()[0]
+                connection.execute("commit")
+            except Exception:
+                connection.execute("rollback")
+                raise
+            return version
+
+        with cls._lock:
+            key = (str(user_id), collection)
+            cls._counters[key] = cls._counters.get(key, 0) + 1
+            return cls._counters[key]
+
+    @classmethod
+    def etag(cls, user_id, collections, variant="") -> str:
+        """
+        Build the ETag value for a view of the given collections.
+
+        The user and the variant (e.g. the query string) are hashed in, so the
+        same counters never validate another user's or another query's response.
+        """
+        versions = ".".join(str(cls.get(user_id, collection)) for collection in collections)
+        scope = hashlib.sha1(f"{user_id}|{variant}".encode("utf-8")).hexdigest()[:12]
+        return f"{cls.epoch()}-{versions}-{scope}"
+
+    @classmethod
+    def conditional(cls, *collections, variant=None):
+        """
+        Decorator for list endpoints: answers If-None-Match with 304 Not Modified
+        while the collections are unchanged, and adds a weak ETag otherwise.
+
+        Views that also depend on something other than the collections, such as
+        the current date, pass a variant callable whose result is hashed into
+        the ETag.
+
+        Without SharedState the view always runs: another worker process may
+        have changed the collections without bumping this process's counters.
+
+        Must be applied below Auth.auth_required, which sets request.user.
+        """
+        def decorator(f):
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                if not SharedState.is_enabled():
+                    return f(*args, **kwargs)
+
+                scope = request.full_path
+                if variant is not None:
+                    scope += f"|{variant()}"
+                etag = cls.etag(request.user.id, collections, scope)
+
+                if request.if_none_match.contains_weak(etag):
+                    response = make_response("", 304)
+                    response.set_etag(etag, weak=True)
+                    return response
+
+                response = make_response(f(*args, **kwargs))
+                if response.status_code == 200:
+                    response.set_etag(etag, weak=True)
+                    # Let the browser cache the response but always revalidate it
+                    response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+
+            return decorated
+        return decorator
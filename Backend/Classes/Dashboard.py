@@ -0,0 +1,113 @@
+from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from flask import copy_current_request_context
+import os
+
+# Load environment variables
+load_dotenv()
+
+
+class DashboardManager:
+    """
+    Builds the dashboard page in a single request.
+
+    The task, project, activity and event queries are independent, so they are
+    run concurrently on a shared thread pool, each inside a copy of the current
+    request context (for the per-request database session and token). Only the
+    fields the dashboard renders are returned.
+    """
+
+    ACTIVITY_LIMIT = 10
+    EVENT_LIMIT = 5
+    EVENT_WINDOW_DAYS = 30
+
+    ACTIVITY_FIELDS = ("id", "activity_type", "description", "timestamp", "related_item_id", "related_item_type")
+    EVENT_FIELDS = ("id", "title", "description", "start_date", "end_date", "all_day", "color")
+
+    def __init__(self, task_manager, activity_tracker, event_manager, project_manager):
+        self._tasks = task_manager
+        self._activities = activity_tracker
+        self._events = event_manager
+        self._projects = project_manager
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("DASHBOARD_WORKERS", "8")),
+            thread_name_prefix="dashboard"
+        )
+
+    def get_dashboard(self, user_id, auth_token=None):
+        """
+        Get everything the dashboard renders on load.
+
+        Args:
+            user_id (str): The authenticated user
+            auth_token (str): The user's access token, for the RLS-scoped activities query
+
+        Returns:
+            dict: tasks and projects counts, recent activities and upcoming events.
+                  A section that failed is None and its error is listed under "errors".
+        """
+        sections = {
+            "tasks": lambda: self._task_counts(user_id),
+            "projects": lambda: self._project_counts(user_id),
+            "activities": lambda: self._recent_activities(auth_token),
+            "upcoming_events": lambda: self._upcoming_events(user_id)
+        }
+
+        futures = {
+            name: self._executor.submit(copy_current_request_context(section))
+            for name, section in sections.items()
+        }
+
+        dashboard = {}
+        errors = {}
+        for name, future in futures.items():
+            try:
+                dashboard[name] = future.result()
+            except Exception as e:
+                print(f"Error building dashboard {name}: {str(e)}")
+                dashboard[name] = None
+                errors[name] = str(e)
+
+        if errors:
+            dashboard["errors"] = errors
+        return dashboard
+
+    def _task_counts(self, user_id):
+        stats = self._tasks.fetch_task_stats(user_id=user_id, periods=1)
+        return {
+            "total": stats["total"],
+            # Statuses are written as both "Completed" and "completed"
+            "completed": sum(
+                count for status, count in stats["by_status"].items()
+                if (status or "").lower() == "completed"
+            )
+        }
+
+    def _project_counts(self, user_id):
+        projects = self._projects.fetch_projects(user_id=user_id)
+        statuses = [project.get("status") for project in projects]
+        return {
+            "total": len(projects),
+            "active": statuses.count("Active"),
+            "on_hold": statuses.count("On Hold"),
+            "completed": statuses.count("Completed")
+        }
+
+    def _recent_activities(self, auth_token):
+        activities = self._activities.get_auth_activities(auth_token, limit=self.ACTIVITY_LIMIT)
+        return [{field: activity.get(field) for field in self.ACTIVITY_FIELDS} for activity in activities]
+
+    def _upcoming_events(self, user_id):
+        # Whole minutes keep the window stable enough for the query cache to hit
+        now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        events = self._events.fetch_events(
+            user_id=user_id,
+            start_date=now.isoformat(),
+            end_date=(now + timedelta(days=self.EVENT_WINDOW_DAYS)).isoformat()
+        )
+        if isinstance(events, dict) and "error" in events:
+            raise Exception(events["error"])
+
+        # fetch_events already orders by start date
+        return [{field: event.get(field) for field in self.EVENT_FIELDS} for event in events[:self.EVENT_LIMIT]]
@@ -1,6 +1,10 @@
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from contextlib import contextmanager
+from flask import g, has_app_context, has_request_context, request
+from Classes.ClientPool import ClientPool
 import os
+import threading
 from datetime import datetime
 
 # Load environment variables
@@ -10,6 +14,8 @@ class DataConfig:
     """Centralized class for Supabase client configuration."""
 
     _client: Client = None  # Shared client instance
+    _pool: ClientPool = None  # Pooled per-request authenticated sessions
+    _pool_lock = threading.Lock()
 
     @classmethod
     def get_client(cls) -> Client:
@@ -26,16 +32,81 @@ class DataConfig:
         return cls._client
         
     @classmethod
-    def get_auth_client(cls, auth_token=None) -> Client:
-        """Get a client with auth token for RLS policies."""
-        client = cls.get_client()
-        
-        if auth_token:
-            # Set the auth header for RLS policies
-            client.postgrest.auth(auth_token)
-            
+    def get_pool(cls) -> ClientPool:
+        """Initialize or retrieve the pool of authenticated PostgREST sessions."""
+        if cls._pool is None:
+            with cls._pool_lock:
+                if cls._pool is None:
+                    url = os.getenv("SUPABASE_URL")
+                    key = os.getenv("SUPABASE_KEY")
+
+                    if not url or not key:
+                        raise Exception("Supabase configuration missing")
+
+                    cls._pool = ClientPool(url, key)
+
+        return cls._pool
+
+    @classmethod
+    def get_auth_client(cls, auth_token=None):
+        """
+        Get a client with auth token for RLS policies.
+
+        The session is borrowed from the pool for the rest of the current
+        request (or app context) and returned by release_request_clients, so
+        it is never shared with another request.
+        """
+        if not auth_token:
+            return cls.get_client()
+
+        if not has_app_context():
+            raise Exception("Authenticated clients outside a request must be borrowed with DataConfig.pooled_client()")
+
+        borrowed = g.setdefault('_pooled_clients', {})
+        client = borrowed.get(auth_token)
+
+        if client is None:
+            client = cls.get_pool().acquire(auth_token)
+            borrowed[auth_token] = client
+
         return client
-        
+
+    @classmethod
+    def get_request_token(cls):
+        """Get the bearer token of the current request, if any."""
+        if not has_request_context():
+            return None
+
+        auth_header = request.headers.get('Authorization')
+        if auth_header and auth_header.startswith('Bearer '):
+            return auth_header.split(' ')[1]
+
+        return None
+
+    @classmethod
+    def get_request_client(cls):
+        """Get a client authorized as the user making the current request."""
+        return cls.get_auth_client(cls.get_request_token())
+
+    @classmethod
+    def release_request_clients(cls, exception=None):
+        """Return the sessions borrowed during the current app context to the pool."""
+        borrowed = g.pop('_pooled_clients', None)
+
+        if borrowed:
+            for client in borrowed.values():
+                cls.get_pool().release(client)
+
+    @classmethod
+    @contextmanager
+    def pooled_client(cls, auth_token):
+        """Borrow an authenticated session outside of a request."""
+        client = cls.get_pool().acquire(auth_token)
+        try:
+            yield client
+        finally:
+            cls.get_pool().release(client)
+
     @classmethod
     def get_timestamp(cls):
         """Get current timestamp in ISO format."""
@@ -1,4 +1,6 @@
 from Classes.DataConfig import DataConfig
+from Classes.CollectionVersions import CollectionVersions
+from Classes.QueryCache import QueryCache
 
 class EventManager:
     def __init__(self):
@@ -24,8 +26,13 @@ class EventManager:
             if hasattr(response, 'error') and response.error:
                 return {"error": str(response.error)}
                 
+            if not response.data:
+                return {"error": "Failed to create event"}
+                
+            CollectionVersions.bump(user_id, 'events', 'create', response.data[0]['id'])
+                
             # Return the created event
-            return response.data[0] if response.data else {"error": "Failed to create event"}
+            return response.data[0]
             
         except Exception as e:
             return {"error": str(e)}
@@ -41,13 +48,19 @@ class EventManager:
             if end_date:
                 query = query.lte("end_date", end_date)
                 
-            # Execute the query
-            response = query.order("start_date").execute()
-            
-            if hasattr(response, 'error') and response.error:
-                return {"error": str(response.error)}
+            def load():
+                # Execute the query
+                response = query.order("start_date").execute()
                 
-            return response.data
+                if hasattr(response, 'error') and response.error:
+                    # Raised so the error is not cached
+                    raise Exception(str(response.error))
+                    
+                return response.data
+                
+            return QueryCache.get_instance().get_or_load(
+                user_id, "events", {"start_date": start_date, "end_date": end_date}, load
+            )
             
         except Exception as e:
             return {"error": str(e)}
@@ -71,19 +84,16 @@ class EventManager:
     def update_event(self, event_id, event_data, user_id):
         """Updates an existing event."""
         try:
-            # Ensure the event exists and belongs to the user
-            event = self.get_event(event_id, user_id)
-            if "error" in event:
-                return event
-                
-            # Update the event
+            # Update the event; filtering on user_id makes a separate ownership check unnecessary
             response = self._client.table("events").update(event_data).eq("id", event_id).eq("user_id", user_id).execute()
             
             if hasattr(response, 'error') and response.error:
                 return {"error": str(response.error)}
                 
             if not response.data:
-                return {"error": "Failed to update event"}
+                return {"error": "Event not found"}
+                
+            CollectionVersions.bump(user_id, 'events', 'update', event_id)
                 
             return response.data[0]
             
@@ -93,17 +103,17 @@ class EventManager:
     def delete_event(self, event_id, user_id):
         """Deletes an event."""
         try:
-            # Ensure the event exists and belongs to the user
-            event = self.get_event(event_id, user_id)
-            if "error" in event:
-                return event
-                
-            # Delete the event
+            # Delete the event; filtering on user_id makes a separate ownership check unnecessary
             response = self._client.table("events").delete().eq("id", event_id).eq("user_id", user_id).execute()
             
             if hasattr(response, 'error') and response.error:
                 return {"error": str(response.error)}
                 
+            if not response.data:
+                return {"error": "Event not found"}
+                
+            CollectionVersions.bump(user_id, 'events', 'delete', event_id)
+                
             return {"success": "Event deleted successfully"}
             
         except Exception as e:
@@ -118,6 +128,8 @@ class EventManager:
             if hasattr(response, 'error') and response.error:
                 return {"error": str(response.error)}
                 
+            CollectionVersions.bump(user_id, 'events', 'clear')
+                
             return {"success": "All events deleted successfully"}
             
         except Exception as e:
@@ -1,16 +1,28 @@
+from dotenv import load_dotenv
 from Classes.DataConfig import DataConfig
+from Classes.CollectionVersions import CollectionVersions
+from Classes.SearchIndex import SearchIndex
+from Classes.QueryCache import QueryCache
 from Classes.ActivityModule import ActivityTracker
+from Classes.Mutations import Mutations
+from Classes.Pagination import Pagination
+import json
+
+# Load environment variables
+load_dotenv()
 
 class ItemsManager:
+    ITEM_FIELDS = ("id", "name", "type", "file_type", "file_url", "size", "parent_id",
+                   "user_id", "created_at", "updated_at", "path", "depth", "canvas_id",
+                   "total_size", "descendant_count")
+    # Sortable fields of folder listings and their item_listing column
+    SORT_FIELDS = {"name": "name", "created_at": "created_at", "size": "sort_size", "type": "type"}
+    TREE_PAGE_SIZE = 500
+
     def __init__(self):
         self._client = DataConfig.get_client()
-        self._auth_token = None
         self._activity_tracker = ActivityTracker()
         
-    def set_auth_token(self, auth_token):
-        """Set the auth token for authenticated requests."""
-        self._auth_token = auth_token
-        
     def create_folder(self, name, parent_id, user_id):
         """Create a new folder in the database."""
         try:
@@ -26,12 +38,15 @@ class ItemsManager:
                 raise Exception("User ID is required for folder creation")
                 
             # Use auth client for RLS-protected operations
-            client = DataConfig.get_auth_client(self._auth_token)
+            client = DataConfig.get_request_client()
             response = client.table('items').insert(folder_data).execute()
             
             if not response.data:
                 raise Exception("Folder creation failed")
             
+            CollectionVersions.bump(user_id, 'items', 'create', response.data[0]['id'])
+            SearchIndex.get_instance().apply(user_id, 'items', upserts=response.data)
+            
             # Log activity
             folder = response.data[0]
             self._activity_tracker.log_activity(
@@ -61,12 +76,15 @@ class ItemsManager:
             }
             
             # Use auth client for RLS-protected operations
-            client = DataConfig.get_auth_client(self._auth_token)
+            client = DataConfig.get_request_client()
             response = client.table('items').insert(file_data).execute()
             
             if not response.data:
                 raise Exception("File creation failed")
             
+            CollectionVersions.bump(user_id, 'items', 'create', response.data[0]['id'])
+            SearchIndex.get_instance().apply(user_id, 'items', upserts=response.data)
+            
             # Log activity
             file = response.data[0]
             self._activity_tracker.log_activity(
@@ -82,66 +100,179 @@ class ItemsManager:
         except Exception as e:
             raise Exception(f"Failed to create file: {str(e)}")
 
-    def fetch_items(self, user_id, parent_id=None):
-        """Fetch all items (files and folders) from a specific folder for a user."""
+    def fetch_items(self, user_id, parent_id=None, sort=None, order=None):
+        """
+        Fetch all items (files and folders) from a specific folder for a user.
+        
+        The root listing includes the user's canvases (Database/013_item_listing.sql).
+        With a sort, the items are sorted by the database.
+        """
         try:
-            # Use auth client for RLS-protected operations
-            client = DataConfig.get_auth_client(self._auth_token)
-            query = client.table('items').select('*').eq('user_id', user_id)
+            query = self._listing_query(user_id, parent_id)
+            params = {"parent_id": parent_id}
+            if sort is not None:
+                sort, desc = self._sort_order(sort, order)
+                query = query.order(sort, desc=desc).order('sort_id', desc=desc)
+                params.update(sort=sort, desc=desc)
+            
+            def load():
+                return [self._listing_item(row) for row in query.execute().data or []]
+                
+            # Root listings merge in the user's canvases, so they depend on those too
+            depends_on = ('canvas',) if parent_id is None else ()
+            return QueryCache.get_instance().get_or_load(user_id, 'items', params, load, depends_on)
+        except ValueError:
+            raise  # Invalid sort, order or cursor, reported to the client as is
+        except Exception as e:
+            raise Exception(f"Failed to fetch items: {str(e)}")
+
+    def fetch_item_page(self, user_id, parent_id=None, sort=None, order=None, limit=None, cursor=None):
+        """
+        Fetch one page of a folder, selected by keyset on (sort field, sort_id).
+        
+        At the root the user's canvases are paged together with the items,
+        in the same order (Database/013_item_listing.sql).
+        
+        Returns:
+            dict: {"items": [...], "next_cursor": str or None}
+        """
+        try:
+            sort, desc = self._sort_order(sort or 'name', order)
+            limit = Pagination.clamp_limit(limit)
             
-            if parent_id is not None:
-                query = query.eq('parent_id', parent_id)
-            else:
-                query = query.is_('parent_id', 'null')  # Root items
+            query = self._listing_query(user_id, parent_id)
+            
+            if cursor:
+                last_value, last_id = Pagination.decode_cursor(cursor)
+                query = query.or_(Pagination.after_filter(sort, desc, last_value, last_id, id_field='sort_id'))
+                
+            query = query.order(sort, desc=desc).order('sort_id', desc=desc).limit(limit + 1)
+            
+            def load():
+                response = query.execute()
+                rows, next_cursor = Pagination.page(
+                    response.data or [],
+                    limit,
+                    lambda row: [row[sort], row['sort_id']]
+                )
+                return {"items": [self._listing_item(row) for row in rows], "next_cursor": next_cursor}
                 
-            response = query.execute()
-            items = response.data if response.data else []
-            
-            # If we're at the root level, also fetch canvas items
-            if parent_id is None:
-                try:
-                    # Check if there are any canvas items already in the items list
-                    existing_canvas_ids = set()
-                    for item in items:
-                        if item.get('file_type') == 'canvas' and item.get('file_url'):
-                            # Extract canvas ID from file_url if it follows the pattern /canvas/{id}
-                            try:
-                                canvas_id = item.get('file_url').split('/')[-1]
-                                if canvas_id.isdigit():
-                                    existing_canvas_ids.add(int(canvas_id))
-                            except:
-                                pass
+            depends_on = ('canvas',) if parent_id is None else ()
+            params = {"parent_id": parent_id, "sort": sort, "desc": desc, "limit": limit, "cursor": cursor}
+            return QueryCache.get_instance().get_or_load(user_id, 'items', params, load, depends_on)
+        except ValueError:
+            raise  # Invalid sort, order or cursor, reported to the client as is
+        except Exception as e:
+            raise Exception(f"Failed to fetch items: {str(e)}")
+
+    def _listing_query(self, user_id, parent_id=None):
+        """Query a folder of the item_listing view, which adds the canvases to the root."""
+        # Use auth client for RLS-protected operations
+        client = DataConfig.get_request_client()
+        query = client.table('item_listing').select('*').eq('user_id', user_id)
+        
+        if parent_id is not None:
+            return query.eq('parent_id', parent_id)
+        return query.is_('parent_id', 'null')  # Root items and canvases
+
+    @staticmethod
+    def _listing_item(row):
+        # The sort columns only exist for ordering and paging
+        row.pop('sort_size', None)
+        row.pop('sort_id', None)
+        return row
+
+    def _sort_order(self, sort, order=None):
+        """Validate a sort field and direction, returning (column, descending)."""
+        if sort not in self.SORT_FIELDS:
+            raise ValueError(f"Cannot sort by '{sort}'")
+        if order and order not in ('asc', 'desc'):
+            raise ValueError("Order must be 'asc' or 'desc'")
+        
+        # Newest and largest first by default, alphabetical otherwise
+        if order is None:
+            return self.SORT_FIELDS[sort], sort in ('created_at', 'size')
+        return self.SORT_FIELDS[sort], order == 'desc'
+
+    def stream_tree(self, user_id, max_depth=None, fields=None):
+        """
+        Get every item of a user, depth first, as newline-delimited JSON.
+        
+        The rows are read TREE_PAGE_SIZE at a time while the output is
+        consumed, so memory does not grow with the size of the tree. The user's
+        canvases follow the tree as root items, from the same item_listing view
+        as the root listing.
+        
+        Args:
+            user_id (str): The authenticated user
+            max_depth (int, optional): Skip items nested deeper than this (roots are depth 0)
+            fields (list, optional): Only include these ITEM_FIELDS
+        
+        Returns:
+            generator: One JSON line per item
+        """
+        # Validated up front, so bad arguments fail before the response starts
+        if fields:
+            unknown = [field for field in fields if field not in self.ITEM_FIELDS]
+            if unknown:
+                raise Exception(f"Unknown fields: {', '.join(unknown)}")
+        if max_depth is not None and max_depth < 0:
+            raise Exception("max_depth cannot be negative")
+        
+        # Use auth client for RLS-protected operations
+        client = DataConfig.get_request_client()
+        requested = list(dict.fromkeys(fields or self.ITEM_FIELDS))
+        columns = ','.join(dict.fromkeys(requested + ['path', 'canvas_id']))
+        
+        def line(row):
+            return json.dumps({field: row.get(field) for field in requested}, separators=(',', ':'), default=str) + "\n"
+        
+        def generate():
+            try:
+                last_path = None
+                while True:
+                    query = client.table('items').select(columns).eq('user_id', user_id)
+                    if max_depth is not None:
+                        query = query.lte('depth', max_depth)
+                    if last_path is not None:
+                        query = query.gt('path', last_path)
+                    rows = query.order('path').limit(self.TREE_PAGE_SIZE).execute().data or []
                     
-                    # Fetch all canvases for the user
-                    canvas_response = client.table('canvas').select('*').eq('user_id', user_id).execute()
-                    canvases = canvas_response.data if canvas_response.data else []
+                    for row in rows:
+                        yield line(row)
+                    if len(rows) < self.TREE_PAGE_SIZE:
+                        break
+                    last_path = rows[-1]['path']
+                
+                # Only the canvas rows of the view have no path
+                last_id = None
+                while True:
+                    query = client.table('item_listing').select(columns + ',sort_id')\
+                        .eq('user_id', user_id)\
+                        .is_('path', 'null')
+                    if last_id is not None:
+                        query = query.gt('sort_id', last_id)
+                    canvases = query.order('sort_id').limit(self.TREE_PAGE_SIZE).execute().data or []
                     
-                    # Convert canvas items to the same format as regular items, but only if they don't already exist
                     for canvas in canvases:
-                        if canvas['id'] not in existing_canvas_ids:
-                            canvas_item = {
-                                "id": f"canvas_{canvas['id']}",  # Prefix to distinguish from regular items
-                                "name": canvas['name'],
-                                "type": "file",
-                                "file_type": "canvas",
-                                "file_url": f"/canvas/{canvas['id']}",  # URL format for canvas items
-                                "user_id": canvas['user_id'],
-                                "created_at": canvas['created_at'],
-                                "updated_at": canvas['updated_at'],
-                                "parent_id": None  # Canvas items are at root level
-                            }
-                            items.append(canvas_item)
-                except Exception as e:
-                    # Log the error but continue with regular items
-                    print(f"Error fetching canvas items: {str(e)}")
-            
-            return items
-            
-        except Exception as e:
-            raise Exception(f"Failed to fetch items: {str(e)}")
+                        yield line(canvas)
+                    if len(canvases) < self.TREE_PAGE_SIZE:
+                        break
+                    last_id = canvases[-1]['sort_id']
+            except Exception as e:
+                # The status line is already sent; the client sees the error as the last line
+                print(f"Error streaming items: {str(e)}")
+                yield json.dumps({"error": f"Failed to fetch items: {str(e)}"}) + "\n"
+        
+        return generate()
 
     def delete_item(self, item_id, user_id):
-        """Delete an item (file or folder) from the database."""
+        """
+        Delete an item (file or folder) from the database, with everything inside it.
+        
+        Returns:
+            dict: The deleted item's id and the number of folders and files deleted
+        """
         try:
             # Check if this is a canvas item (ID starts with "canvas_")
             if isinstance(item_id, str) and item_id.startswith("canvas_"):
@@ -151,71 +282,138 @@ class ItemsManager:
                 # Use the canvas manager to delete the canvas
                 from Classes.Canvas import CanvasManager
                 canvas_manager = CanvasManager()
-                canvas_manager.set_auth_token(self._auth_token)
                 return canvas_manager.delete_canvas(canvas_id, user_id)
             
             # Use auth client for RLS-protected operations
-            client = DataConfig.get_auth_client(self._auth_token)
+            client = DataConfig.get_request_client()
             
-            # Get item details before deletion for activity logging
-            item_details = client.table('items').select('*').eq('id', item_id).eq('user_id', user_id).execute()
-            if not item_details.data:
-                raise Exception("Item not found")
+            response = client.table('items').select('id,name,type,path')\
+                .eq('id', item_id)\
+                .eq('user_id', user_id)\
+                .execute()
             
-            item = item_details.data[0]
+            if not response.data:
+                raise Exception("Item not found or already deleted")
             
-            # First check if it's a folder and has children
-            children = client.table('items').select('id').eq('parent_id', item_id).execute()
+            item = response.data[0]
             
-            if children.data:
-                # Recursively delete all children
-                for child in children.data:
-                    self.delete_item(child['id'], user_id)
+            # The item and its whole subtree are the rows whose path starts with the item's path
+            response = client.table('items').delete()\
+                .eq('user_id', user_id)\
+                .gte('path', item['path'])\
+                .lt('path', self._path_end(item['path']))\
+                .execute()
+            rows = response.data or []
+            if not rows:
+                raise Exception("Item not found or already deleted")
             
-            # Delete the item itself
-            response = client.table('items').delete().eq('id', item_id).eq('user_id', user_id).execute()
+            deleted_ids = [row['id'] for row in rows]
+            folders = sum(1 for row in rows if row['type'] == 'folder')
+            files = len(rows) - folders
             
-            if not response.data:
-                raise Exception("Item not found or already deleted")
+            CollectionVersions.bump(user_id, 'items', 'delete' if len(rows) == 1 else 'batch', item_id)
+            SearchIndex.get_instance().apply(user_id, 'items', deletes=deleted_ids)
             
-            # Log activity
+            # Log one activity for the whole subtree
             item_type = "folder" if item['type'] == "folder" else "file"
+            description = f"Deleted {item_type} '{item['name']}'"
+            if len(rows) > 1:
+                description += f" and {len(rows) - 1} item{'s' if len(rows) > 2 else ''} inside it"
             self._activity_tracker.log_activity(
                 user_id=user_id,
                 activity_type="delete",
-                description=f"Deleted {item_type} '{item['name']}'",
+                description=description,
                 related_item_id=item_id,
                 related_item_type=item_type
             )
             
-            return {"id": item_id, "message": "Item deleted successfully"}
+            return {
+                "id": item_id,
+                "message": "Item deleted successfully",
+                "deleted": {"folders": folders, "files": files}
+            }
             
         except Exception as e:
             raise Exception(f"Failed to delete item: {str(e)}")
 
+    @staticmethod
+    def _path_end(path):
+        """Upper bound of the paths starting with path (Database/009_items_path.sql)."""
+        return path[:-1] + "0"
+
+    def fetch_ancestors(self, item_id, user_id):
+        """Get the folders containing an item, from the root down."""
+        return self._fetch_related('item_ancestors', item_id, user_id)
+
+    def fetch_descendants(self, item_id, user_id):
+        """Get everything inside a folder, depth first."""
+        return self._fetch_related('item_descendants', item_id, user_id)
+
+    def _fetch_related(self, function, item_id, user_id):
+        # Canvases are listed at the root and never contain items
+        if isinstance(item_id, str) and item_id.startswith("canvas_"):
+            return []
+        
+        try:
+            # Use auth client for RLS-protected operations
+            client = DataConfig.get_request_client()
+            response = client.rpc(function, {"p_id": item_id, "p_user_id": user_id}).execute()
+            return response.data or []
+        except Exception as e:
+            raise Exception(f"Failed to fetch items: {str(e)}")
+
+    def repair_aggregates(self, user_id):
+        """
+        Recompute the total_size and descendant_count of a user's items.
+        
+        The database triggers keep them up to date (Database/012); this fixes
+        rows changed while the triggers were disabled or by a failed migration.
+        
+        Returns:
+            int: Number of items whose aggregates were wrong
+        """
+        try:
+            # Use auth client for RLS-protected operations
+            client = DataConfig.get_request_client()
+            response = client.rpc('repair_item_aggregates', {"p_user_id": user_id}).execute()
+            repaired = response.data or 0
+            
+            if repaired:
+                CollectionVersions.bump(user_id, 'items', 'batch')
+            
+            return repaired
+        except Exception as e:
+            raise Exception(f"Failed to repair item aggregates: {str(e)}")
+
     def move_item(self, item_id, new_parent_id, user_id):
         """Move an item to a different folder."""
         try:
             update_data = {"parent_id": new_parent_id}
             
             # Use auth client for RLS-protected operations
-            client = DataConfig.get_auth_client(self._auth_token)
-            
-            # Get item details before update for activity logging
-            item_details = client.table('items').select('*').eq('id', item_id).eq('user_id', user_id).execute()
-            if not item_details.data:
-                raise Exception("Item not found")
-            
-            item = item_details.data[0]
-            
-            response = client.table('items').update(update_data)\
-                .eq('id', item_id)\
-                .eq('user_id', user_id)\
-                .execute()
+            client = DataConfig.get_request_client()
+            
+            # The path trigger rewrites the subtree's paths and rejects moves into the item's own subtree
+            try:
+                response = client.table('items').update(update_data)\
+                    .eq('id', item_id)\
+                    .eq('user_id', user_id)\
+                    .execute()
+            except Exception as e:
+                if "own subtree" in str(e):
+                    raise Exception("Cannot move an item into its own subtree")
+                if "Parent folder not found" in str(e):
+                    raise Exception("Parent folder not found")
+                raise
             
             if not response.data:
                 raise Exception("Item not found or unauthorized")
             
+            item = response.data[0]
+            
+            CollectionVersions.bump(user_id, 'items', 'update', item_id)
+            SearchIndex.get_instance().apply(user_id, 'items', upserts=[item])
+            
             # Log activity
             item_type = "folder" if item['type'] == "folder" else "file"
             self._activity_tracker.log_activity(
@@ -235,24 +433,18 @@ class ItemsManager:
         """Rename an item."""
         try:
             # Use auth client for RLS-protected operations
-            client = DataConfig.get_auth_client(self._auth_token)
+            client = DataConfig.get_request_client()
             
-            # Get item details before update for activity logging
-            item_details = client.table('items').select('*').eq('id', item_id).eq('user_id', user_id).execute()
-            if not item_details.data:
-                raise Exception("Item not found")
+            # Update and get the previous name for activity logging in one request
+            update_data = {"name": new_name}
+            item, updated_item = Mutations.update_with_diff(client, 'items', item_id, update_data, user_id)
+            if not updated_item:
+                raise Exception("Item not found or unauthorized")
             
-            item = item_details.data[0]
             old_name = item['name']
             
-            update_data = {"name": new_name}
-            response = client.table('items').update(update_data)\
-                .eq('id', item_id)\
-                .eq('user_id', user_id)\
-                .execute()
-            
-            if not response.data:
-                raise Exception("Item not found or unauthorized")
+            CollectionVersions.bump(user_id, 'items', 'update', item_id)
+            SearchIndex.get_instance().apply(user_id, 'items', upserts=[updated_item])
             
             # Log activity
             item_type = "folder" if item['type'] == "folder" else "file"
@@ -264,7 +456,7 @@ class ItemsManager:
                 related_item_type=item_type
             )
                 
-            return response.data[0]
+            return updated_item
             
         except Exception as e:
             raise Exception(f"Failed to rename item: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,34 @@
+class Mutations:
+    """Single round trip mutations that also report the previous state of a row."""
+
+    @staticmethod
+    def update_with_diff(client, table, row_id, patch, user_id=None):
+        """
+        Update one row and return it as it was before and after the update.
+
+        Uses the update_returning_diff database function (Database/002), so the
+        row is not selected in a separate request first.
+
+        Args:
+            client: Supabase or PostgREST client to run the update with
+            table (str): Table name
+            row_id: Primary key of the row
+            patch (dict): Columns to update
+            user_id (str, optional): Only update the row if it belongs to this user
+
+        Returns:
+            tuple: (old_row, new_row), or (None, None) if the row was not found
+        """
+        response = client.rpc('update_returning_diff', {
+            "p_table": table,
+            "p_id": str(row_id),
+            "p_patch": patch,
+            "p_user_id": user_id
+        }).execute()
+
+        result = response.data
+        if not result:
+            return None, None
+
+        return result['old'], result['new']
+
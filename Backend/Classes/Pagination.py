@@ -0,0 +1,90 @@
+import base64
+import json
+
+
+class Pagination:
+    """Helpers for keyset pagination with opaque cursors."""
+
+    MAX_LIMIT = 100
+
+    @staticmethod
+    def encode_cursor(values: list) -> str:
+        """Encode the sort key of the last row of a page as an opaque cursor."""
+        payload = json.dumps(values, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(payload).rstrip(b"=").decode("ascii")
+
+    @staticmethod
+    def decode_cursor(cursor: str, size: int = 2) -> list:
+        """
+        Decode a cursor produced by encode_cursor from a sort key of size values.
+
+        Raises:
+            ValueError: If the cursor was not produced by encode_cursor (a client error)
+        """
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        except (ValueError, TypeError):
+            raise ValueError("Invalid cursor")
+
+        # Callers unpack the values, so a tampered cursor must not reach them
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("Invalid cursor")
+        return values
+
+    @staticmethod
+    def clamp_limit(limit, default: int = 20) -> int:
+        """Keep a requested page size between 1 and MAX_LIMIT."""
+        if not limit:
+            return default
+        return max(1, min(int(limit), Pagination.MAX_LIMIT))
+
+    @staticmethod
+    def quote(value) -> str:
+        """Quote a value for use inside a PostgREST logic filter."""
+        if value is None:
+            return "null"
+        text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{text}"'
+
+    @classmethod
+    def contains_pattern(cls, text: str) -> str:
+        """Quote an ilike pattern matching text anywhere, with its wildcards taken literally."""
+        text = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        # PostgREST turns every * into %, so a literal * can only match as any one character
+        text = text.replace("*", "_")
+        return cls.quote(f"*{text}*")
+
+    @classmethod
+    def after_filter(cls, sort_field: str, desc: bool, last_value, last_id, id_field: str = "id") -> str:
+        """
+        Build the or_() filter selecting rows after (last_value, last_id) in
+        (sort_field, id_field) order.
+
+        Nulls are placed like PostgreSQL does by default: last in ascending
+        order and first in descending order.
+        """
+        op = "lt" if desc else "gt"
+        after_id = f"{id_field}.{op}.{cls.quote(last_id)}"
+
+        if last_value is None:
+            if desc:
+                return f"{sort_field}.not.is.null,and({sort_field}.is.null,{after_id})"
+            return f"and({sort_field}.is.null,{after_id})"
+
+        value = cls.quote(last_value)
+        after = f"{sort_field}.{op}.{value},and({sort_field}.eq.{value},{after_id})"
+        return after if desc else f"{after},{sort_field}.is.null"
+
+    @classmethod
+    def page(cls, rows: list, limit: int, key) -> tuple:
+        """
+        Trim a limit + 1 result to one page.
+
+        Returns:
+            tuple: (rows, next_cursor), where next_cursor is None on the last page
+        """
+        if len(rows) <= limit:
+            return rows, None
+
+        rows = rows[:limit]
+        return rows, cls.encode_cursor(key(rows[-1]))
@@ -1,6 +1,9 @@
 from Classes.DataConfig import DataConfig
+from Classes.CollectionVersions import CollectionVersions
+from Classes.SearchIndex import SearchIndex
+from Classes.QueryCache import QueryCache
 from Classes.ActivityModule import ActivityTracker
-from flask import request
+from Classes.Mutations import Mutations
 
 class ProjectManager:
     def __init__(self):
@@ -22,12 +25,6 @@ class ProjectManager:
             dict: Created project data
         """
         try:
-            # Get auth token from request headers
-            auth_header = request.headers.get('Authorization')
-            auth_token = None
-            if auth_header and auth_header.startswith('Bearer '):
-                auth_token = auth_header.split(' ')[1]
-            
             # Create project in database
             data = {
                 "title": title,
@@ -39,12 +36,15 @@ class ProjectManager:
             }
             
             # Get authenticated client
-            auth_client = DataConfig.get_auth_client(auth_token)
+            auth_client = DataConfig.get_request_client()
             
             # Insert project into the database
             response = auth_client.table("projects").insert(data).execute()
             
             if response.data and len(response.data) > 0:
+                CollectionVersions.bump(user_id, 'projects', 'create', response.data[0]['id'])
+                SearchIndex.get_instance().apply(user_id, 'projects', upserts=response.data)
+                
                 # Log activity
                 project = response.data[0]
                 self._activity_tracker.log_activity(
@@ -73,14 +73,8 @@ class ProjectManager:
             list: List of projects
         """
         try:
-            # Get auth token from request headers
-            auth_header = request.headers.get('Authorization')
-            auth_token = None
-            if auth_header and auth_header.startswith('Bearer '):
-                auth_token = auth_header.split(' ')[1]
-            
             # Get authenticated client
-            auth_client = DataConfig.get_auth_client(auth_token)
+            auth_client = DataConfig.get_request_client()
             
             query = auth_client.table("projects").select("*")
             
@@ -91,9 +85,11 @@ class ProjectManager:
             # Order by created_at
             query = query.order("created_at", desc=True)
             
-            response = query.execute()
-            
-            return response.data
+            def load():
+                response = query.execute()
+                return response.data
+                
+            return QueryCache.get_instance().get_or_load(user_id, "projects", {}, load)
             
         except Exception as e:
             print(f"Error fetching projects: {e}")
@@ -111,14 +107,8 @@ class ProjectManager:
             dict: Project data
         """
         try:
-            # Get auth token from request headers
-            auth_header = request.headers.get('Authorization')
-            auth_token = None
-            if auth_header and auth_header.startswith('Bearer '):
-                auth_token = auth_header.split(' ')[1]
-            
             # Get authenticated client
-            auth_client = DataConfig.get_auth_client(auth_token)
+            auth_client = DataConfig.get_request_client()
             
             query = auth_client.table("projects").select("*").eq("id", project_id)
             
@@ -150,36 +140,20 @@ class ProjectManager:
             dict: Updated project data
         """
         try:
-            # Get auth token from request headers
-            auth_header = request.headers.get('Authorization')
-            auth_token = None
-            if auth_header and auth_header.startswith('Bearer '):
-                auth_token = auth_header.split(' ')[1]
-            
             # Get authenticated client
-            auth_client = DataConfig.get_auth_client(auth_token)
-            
-            # Get project details before update for activity logging
-            project_details = auth_client.table("projects").select("*").eq("id", project_id).execute()
-            if not project_details.data or len(project_details.data) == 0:
-                raise Exception("Project not found")
-            
-            project = project_details.data[0]
+            auth_client = DataConfig.get_request_client()
             
             # Add updated_at timestamp
             data["updated_at"] = DataConfig.get_timestamp()
             
-            query = auth_client.table("projects").update(data).eq("id", project_id)
+            # Update and get the previous state for activity logging in one request
+            project, updated_project = Mutations.update_with_diff(auth_client, "projects", project_id, data, user_id)
             
-            # Filter by user_id if provided (for authorization)
-            if user_id:
-                query = query.eq("user_id", user_id)
+            if updated_project:
+                CollectionVersions.bump(user_id, 'projects', 'update', project_id)
+                SearchIndex.get_instance().apply(user_id, 'projects', upserts=[updated_project])
                 
-            response = query.execute()
-            
-            if response.data and len(response.data) > 0:
                 # Log activity
-                updated_project = response.data[0]
                 description = f"Updated project '{project['title']}'"
                 
                 # Add specific details about what was updated
@@ -222,21 +196,8 @@ class ProjectManager:
             dict: Deleted project data
         """
         try:
-            # Get auth token from request headers
-            auth_header = request.headers.get('Authorization')
-            auth_token = None
-            if auth_header and auth_header.startswith('Bearer '):
-                auth_token = auth_header.split(' ')[1]
-            
             # Get authenticated client
-            auth_client = DataConfig.get_auth_client(auth_token)
-            
-            # Get project details before deletion for activity logging
-            project_details = auth_client.table("projects").select("*").eq("id", project_id).execute()
-            if not project_details.data or len(project_details.data) == 0:
-                raise Exception("Project not found")
-            
-            project = project_details.data[0]
+            auth_client = DataConfig.get_request_client()
             
             query = auth_client.table("projects").delete().eq("id", project_id)
             
@@ -244,10 +205,15 @@ class ProjectManager:
             if user_id:
                 query = query.eq("user_id", user_id)
                 
+            # The deleted row is returned, so it does not need to be read first
             response = query.execute()
             
             if response.data and len(response.data) > 0:
+                CollectionVersions.bump(user_id, 'projects', 'delete', project_id)
+                SearchIndex.get_instance().apply(user_id, 'projects', deletes=[project_id])
+                
                 # Log activity
+                project = response.data[0]
                 self._activity_tracker.log_activity(
                     user_id=user_id,
                     activity_type="delete",
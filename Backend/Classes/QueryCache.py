@@ -0,0 +1,207 @@
+from dotenv import load_dotenv
+from Classes.CollectionVersions import CollectionVersions
+from Classes.SharedState import SharedState
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Load environment variables
+load_dotenv()
+
+
+class MemoryCacheBackend:
+    """Size-bounded LRU with TTL, private to the process."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float):
+        if len(value) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, time.time() + ttl)
+            self._size += len(value)
+
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        value, _ = self._entries.pop(key)
+        self._size -= len(value)
+
+
+class SharedCacheBackend:
+    """Size-bounded LRU with TTL in the SharedState SQLite file, shared by all worker processes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._schema_ready = False
+
+    def _connect(self):
+        connection = SharedState.connect()
+        if not self._schema_ready:
+            connection.execute(
+                "create table if not exists query_cache ("
+                " key text primary key, value text not null, size integer not null,"
+                " expires_at real not null, last_used real not null)"
+            )
+            connection.execute("create index if not exists query_cache_last_used on query_cache (last_used)")
+            self._schema_ready = True
+        return connection
+
+    def get(self, key: str):
+        connection = self._connect()
+        now = time.time()
+
+        row = connection.execute(
+            "select value, expires_at from query_cache where key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        value, expires_at = row
+        if expires_at <= now:
+            connection.execute("delete from query_cache where key = ?", (key,))
+            return None
+
+        connection.execute("update query_cache set last_used = ? where key = ?", (now, key))
+        return value
+
+    def set(self, key: str, value: str, ttl: float):
+        if len(value) > self.max_bytes:
+            return
+
+        connection = self._connect()
+        now = time.time()
+
+        connection.execute("begin immediate")
+        try:
+            connection.execute(
+                "insert or replace into query_cache (key, value, size, expires_at, last_used) values (?, ?, ?, ?, ?)",
+                (key, value, len(value), now + ttl, now)
+            )
+            connection.execute("delete from query_cache where expires_at <= ?", (now,))
+
+            # Evict least recently used entries until the cache fits its budget again
+            total = connection.execute("select coalesce(sum(size), 0) from query_cache").fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, size in connection.execute(
+                    "select key, size from query_cache order by last_used"
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    connection.execute("delete from query_cache where key = ?", (old_key,))
+                    total -= size
+
+            connection.execute("commit")
+        except Exception:
+            connection.execute("rollback")
+            raise
+
+
+class QueryCache:
+    """
+    Read-through cache for the managers' fetch_* results.
+
+    Entries are keyed by user, table, the current versions of the collections
+    the result depends on, and the normalized query. A create, update or delete
+    through a manager bumps the collection version (CollectionVersions), which
+    makes every cached result for that user and table unreachable at once. When
+    the versions live in SharedState, that invalidation is seen by all worker
+    processes.
+
+    QUERY_CACHE_BACKEND selects "shared" (requires SHARED_STATE_PATH),
+    "memory" or "off". Without SharedState every worker process has its own
+    collection versions and misses the writes made by the others, so the
+    default is "shared" when SHARED_STATE_PATH is set and "off" otherwise;
+    "memory" is only safe with a single worker process.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, backend: str = None, ttl: float = None, max_bytes: int = None):
+        backend = backend or os.getenv("QUERY_CACHE_BACKEND") or ("shared" if SharedState.is_enabled() else "off")
+        self.ttl = ttl if ttl is not None else float(os.getenv("QUERY_CACHE_TTL", "60"))
+        max_bytes = max_bytes if max_bytes is not None else int(os.getenv("QUERY_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+        if backend == "off":
+            self._backend = None
+        elif backend == "shared":
+            if not SharedState.is_enabled():
+                raise Exception("The shared query cache requires SHARED_STATE_PATH")
+            self._backend = SharedCacheBackend(max_bytes)
+        else:
+            if not SharedState.is_enabled():
+                print("Query cache: the memory backend does not see writes made by other worker processes; "
+                      "run a single worker or set SHARED_STATE_PATH")
+            self._backend = MemoryCacheBackend(max_bytes)
+
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def get_instance(cls):
+        """Initialize or retrieve the process-wide query cache."""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def _key(self, user_id, table, query, depends_on) -> str:
+        # Versions are read before the loader runs, so a write that lands during
+        # the load bumps past this key instead of being hidden by it
+        versions = [CollectionVersions.get(user_id, collection) for collection in (table,) + tuple(depends_on)]
+        normalized = json.dumps(query, sort_keys=True, default=str)
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        return f"{user_id}|{table}|{'.'.join(map(str, versions))}|{digest}"
+
+    def get_or_load(self, user_id, table, query, loader, depends_on=()):
+        """
+        Return the cached result of a query, running loader() on a miss.
+
+        Args:
+            user_id (str): Owner of the rows; queries without a user are not cached
+            table (str): Collection the query reads
+            query (dict): Everything else that determines the result
+            loader (callable): Runs the query; its result must be JSON serializable
+            depends_on (tuple): Other collections the result is built from
+        """
+        if self._backend is None or not user_id:
+            return loader()
+
+        key = self._key(user_id, table, query, depends_on)
+        cached = self._backend.get(key)
+        if cached is not None:
+            self.hits += 1
+            return json.loads(cached)
+
+        self.misses += 1
+        result = loader()
+        self._backend.set(key, json.dumps(result, default=str), self.ttl)
+        return result
@@ -0,0 +1,134 @@
+from dotenv import load_dotenv
+from Classes.DataConfig import DataConfig
+from collections import OrderedDict
+import json
+import os
+import threading
+
+# Load environment variables
+load_dotenv()
+
+
+class ScriptHistory:
+    """
+    Reads the content-addressed, delta-compressed version history of script code.
+
+    Versions are written by a trigger on scripts (Database/015) whenever the
+    code changes, as a snapshot, a delta against the previous version or a
+    reference to an older version with the same code hash. Rebuilding a
+    version replays the deltas since the nearest snapshot at or before it.
+
+    Rebuilt code is cached by its sha256 code hash, so a cached entry is valid
+    for every version and worker that has the same hash.
+    """
+
+    _cache = OrderedDict()  # code_hash -> code, most recently used last
+    _cache_size = 0
+    _cache_lock = threading.Lock()
+
+    def __init__(self):
+        self.cache_max_bytes = int(os.getenv("SCRIPT_HISTORY_CACHE_BYTES", str(16 * 1024 * 1024)))
+
+    @staticmethod
+    def patch(base: str, delta: list) -> str:
+        """Apply a [prefix, suffix, text] delta to the code of the previous version."""
+        prefix, suffix, text = delta
+        return base[:prefix] + text + base[len(base) - suffix:]
+
+    def _cache_get(self, code_hash):
+        with self._cache_lock:
+            code = self._cache.get(code_hash)
+            if code is not None:
+                self._cache.move_to_end(code_hash)
+            return code
+
+    def _cache_put(self, code_hash, code):
+        if len(code) > self.cache_max_bytes:
+            return
+        with self._cache_lock:
+            if code_hash in self._cache:
+                self._cache.move_to_end(code_hash)
+                return
+            self._cache[code_hash] = code
+            ScriptHistory._cache_size += len(code)
+            while ScriptHistory._cache_size > self.cache_max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                ScriptHistory._cache_size -= len(evicted)
+
+    def _table(self):
+        # script_versions is only readable by the script's owner (RLS)
+        return DataConfig.get_request_client().table("script_versions")
+
+    def get_code(self, script_id, version) -> str:
+        """Rebuild the code of a version from the nearest snapshot, or cached version, before it."""
+        snapshot = self._table().select("version")\
+            .eq("script_id", script_id)\
+            .eq("kind", "snapshot")\
+            .lte("version", version)\
+            .order("version", desc=True)\
+            .limit(1)\
+            .execute().data
+        start = snapshot[0]["version"] if snapshot else 1
+
+        rows = self._table().select("version,kind,base_version,payload,code_hash")\
+            .eq("script_id", script_id)\
+            .gte("version", start)\
+            .lte("version", version)\
+            .order("version")\
+            .execute().data or []
+
+        if not rows or rows[-1]["version"] != version:
+            raise Exception(f"Version {version} not found")
+
+        # Start from the newest version whose code is already cached
+        code = None
+        for index in range(len(rows) - 1, -1, -1):
+            code = self._cache_get(rows[index]["code_hash"])
+            if code is not None:
+                rows = rows[index + 1:]
+                break
+
+        for row in rows:
+            if row["kind"] == "snapshot":
+                code = row["payload"]
+            elif row["kind"] == "ref":
+                code = self.get_code(script_id, row["base_version"])
+            else:
+                if code is None:
+                    raise Exception(f"Version {row['version']} has no base to apply its delta to")
+                code = self.patch(code, json.loads(row["payload"]))
+
+        if rows:
+            self._cache_put(rows[-1]["code_hash"], code)
+        return code
+
+    def list_versions(self, script_id, user_id):
+        """List the versions of a script, newest first."""
+        try:
+            response = self._table().select("version,code_hash,size,kind,created_at")\
+                .eq("script_id", script_id)\
+                .eq("user_id", user_id)\
+                .order("version", desc=True)\
+                .execute()
+            return response.data or []
+        except Exception as e:
+            raise Exception(f"Failed to fetch script versions: {str(e)}")
+
+    def get_version(self, script_id, version, user_id):
+        """Get one version of a script with its code. Returns None if it does not exist."""
+        try:
+            response = self._table().select("version,code_hash,size,created_at")\
+                .eq("script_id", script_id)\
+                .eq("version", version)\
+                .eq("user_id", user_id)\
+                .execute()
+            if not response.data:
+                return None
+
+            result = response.data[0]
+            result["code"] = self._cache_get(result["code_hash"])
+            if result["code"] is None:
+                result["code"] = self.get_code(script_id, version)
+            return result
+        except Exception as e:
+            raise Exception(f"Failed to fetch script version: {str(e)}")
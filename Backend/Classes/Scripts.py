@@ -1,12 +1,30 @@
 from dotenv import load_dotenv
 from Classes.ActivityModule import ActivityTracker
 from Classes.DataConfig import DataConfig
+from Classes.CollectionVersions import CollectionVersions
+from Classes.SearchIndex import SearchIndex
+from Classes.QueryCache import QueryCache
+from Classes.Mutations import Mutations
+from Classes.ScriptHistory import ScriptHistory
 import os
 
+
+class ScriptConflictError(Exception):
+    """Raised when a script edit was made against a version of the code that is no longer current."""
+
+    def __init__(self, code_hash):
+        super().__init__("Script was changed since the base version")
+        self.code_hash = code_hash
+
+
 class ScriptsManager:
+    # Listing columns: everything but the code, whose size is returned instead
+    SUMMARY_FIELDS = "id,title,language,description,size:code_size,updated_at"
+
     def __init__(self):
         self._client = DataConfig.get_client()
         self._activity_tracker = ActivityTracker()
+        self._history = ScriptHistory()
 
 
     def create_script(self, title, description, code, language, user_id):
@@ -25,6 +43,9 @@ class ScriptsManager:
             if not response.data:
                 raise Exception("Script creation failed")
             
+            CollectionVersions.bump(user_id, 'scripts', 'create', response.data[0]['id'])
+            SearchIndex.get_instance().apply(user_id, 'scripts', upserts=response.data)
+            
             # Log activity
             script = response.data[0]
             self._activity_tracker.log_activity(
@@ -41,42 +62,71 @@ class ScriptsManager:
             raise Exception(f"Failed to create script: {str(e)}")
         
         
-    def fetch_scripts(self, user_id=None):
-        """Fetch all scripts from the database for a specific user."""
+    def fetch_scripts(self, user_id=None, view=None):
+        """
+        Fetch all scripts from the database for a specific user.
+        
+        With view='summary' the code is left out and its size in bytes is
+        returned instead; open a script with get_script to load its code.
+        """
         try:
-            query = self._client.table('scripts').select('*')
+            if view not in (None, 'full', 'summary'):
+                raise Exception(f"Unknown view '{view}'")
+                
+            columns = self.SUMMARY_FIELDS if view == 'summary' else '*'
+            query = self._client.table('scripts').select(columns)
             
             # Filter by user_id if provided
             if user_id:
                 query = query.eq('user_id', user_id)
                 
-            response = query.execute()
-            return response.data if response.data else []
+            def load():
+                response = query.execute()
+                return response.data if response.data else []
+                
+            return QueryCache.get_instance().get_or_load(user_id, 'scripts', {"view": view or 'full'}, load)
         except Exception as e:
             raise Exception(f"Failed to fetch scripts: {str(e)}")    
 
 
+    def get_script(self, script_id, user_id=None):
+        """Fetch a single script, including its code. Returns None if it does not exist."""
+        try:
+            query = self._client.table('scripts').select('*').eq('id', script_id)
+            
+            # Ensure the script belongs to the user if user_id is provided
+            if user_id:
+                query = query.eq('user_id', user_id)
+                
+            def load():
+                response = query.execute()
+                return response.data[0] if response.data else None
+                
+            return QueryCache.get_instance().get_or_load(user_id, 'scripts', {"id": script_id}, load)
+        except Exception as e:
+            raise Exception(f"Failed to fetch script: {str(e)}")
+
+
     def delete_script(self, script_id, user_id=None):
         """Delete a script from the database."""
         try:
-            # Get script details before deletion for activity logging
-            script_details = self._client.table('scripts').select('*').eq('id', script_id).execute()
-            if not script_details.data or len(script_details.data) == 0:
-                raise Exception("Script not found")
-            
-            script = script_details.data[0]
-            
             query = self._client.table('scripts').delete().eq('id', script_id)
             
             # Ensure the script belongs to the user if user_id is provided
             if user_id:
                 query = query.eq('user_id', user_id)
                 
+            # The deleted row is returned, so it does not need to be read first
             response = query.execute()
             
             if not response.data:
                 raise Exception("Script not found or already deleted")
             
+            script = response.data[0]
+            
+            CollectionVersions.bump(user_id, 'scripts', 'delete', script_id)
+            SearchIndex.get_instance().apply(user_id, 'scripts', deletes=[script_id])
+            
             # Log activity
             self._activity_tracker.log_activity(
                 user_id=user_id,
@@ -92,17 +142,20 @@ class ScriptsManager:
         
 
 
-    # TODO: Implement the optimization methods # type: ignore
-    def edit_script(self, script_id, title, description, code, language, user_id=None):
-        """Edit a script in the database."""
+    def edit_script(self, script_id, title, description, code, language, user_id=None, base_hash=None, ops=None):
+        """
+        Edit a script in the database.
+        
+        With base_hash the code is only written if it is still at that version
+        (its code_hash), otherwise ScriptConflictError is raised. ops then
+        describes the change as ranged edits of the base version, e.g.
+        [{"start": 10, "end": 14, "text": "new"}], so only the edit is sent
+        to the database instead of the whole code.
+        """
         try:
-            # Get script details before update for activity logging
-            script_details = self._client.table('scripts').select('*').eq('id', script_id).execute()
-            if not script_details.data or len(script_details.data) == 0:
-                raise Exception("Script not found")
+            if base_hash is not None or ops is not None:
+                return self._patch_code(script_id, base_hash, ops, code, user_id)
                 
-            script = script_details.data[0]
-            
             # Only update fields that are provided (not None)
             update_data = {}
             if title is not None:
@@ -114,29 +167,67 @@ class ScriptsManager:
             if language is not None:
                 update_data['language'] = language
             
-            query = self._client.table('scripts').update(update_data).eq('id', script_id)
-            
-            # Ensure the script belongs to the user if user_id is provided
-            if user_id:
-                query = query.eq('user_id', user_id)
-                
-            response = query.execute()
-            
-            if not response.data:
+            # Update and get the previous state for activity logging in one request
+            script, updated_script = Mutations.update_with_diff(self._client, 'scripts', script_id, update_data, user_id)
+            if not updated_script:
                 raise Exception("Script not found or unauthorized")
             
-            # Log activity
-            self._activity_tracker.log_activity(
-                user_id=user_id,
-                activity_type="edit",
-                description=f"Updated script '{script['title']}'",
-                related_item_id=script_id,
-                related_item_type="script"
-            )
+            self._log_edit(script, updated_script, user_id)
             
-            return response.data[0]
+            return updated_script
+        except ScriptConflictError:
+            raise
         except Exception as e:
             raise Exception(f"Failed to edit script: {str(e)}")
+
+    def _patch_code(self, script_id, base_hash, ops, code, user_id):
+        """Conditionally apply ranged edits (or a full replacement) to a script's code."""
+        if base_hash is None:
+            raise Exception("A base hash is required to patch code")
+        if ops is None:
+            if code is None:
+                raise Exception("Code or edit operations are required")
+            ops = [{"start": 0, "end": None, "text": code}]
+        if not isinstance(ops, list) or not all(isinstance(op, dict) for op in ops):
+            raise Exception("Edit operations must be a list of objects")
+            
+        response = self._client.rpc('patch_script_code', {
+            "p_id": script_id,
+            "p_base_hash": base_hash,
+            "p_ops": ops,
+            "p_user_id": user_id
+        }).execute()
+        result = response.data or {}
+        
+        if result.get('status') == 'conflict':
+            raise ScriptConflictError(result.get('code_hash'))
+        if result.get('status') != 'ok':
+            raise Exception("Script not found or unauthorized")
+            
+        self._log_edit(result['old'], result['new'], user_id)
+        
+        return result['new']
+
+    def _log_edit(self, script, updated_script, user_id):
+        CollectionVersions.bump(user_id, 'scripts', 'update', updated_script['id'])
+        SearchIndex.get_instance().apply(user_id, 'scripts', upserts=[updated_script])
+        
+        # Log activity
+        self._activity_tracker.log_activity(
+            user_id=user_id,
+            activity_type="edit",
+            description=f"Updated script '{script['title']}'",
+            related_item_id=updated_script['id'],
+            related_item_type="script"
+        )
+
+    def fetch_versions(self, script_id, user_id=None):
+        """List the saved versions of a script's code, newest first (recorded by Database/015)."""
+        return self._history.list_versions(script_id, user_id)
+
+    def get_version(self, script_id, version, user_id=None):
+        """Get the code of a script as it was at a version. Returns None if there is no such version."""
+        return self._history.get_version(script_id, version, user_id)
     
 
 
@@ -0,0 +1,303 @@
+from dotenv import load_dotenv
+from Classes.DataConfig import DataConfig
+from Classes.CollectionVersions import CollectionVersions
+from collections import OrderedDict
+import bisect
+import heapq
+import math
+import os
+import re
+import sys
+import threading
+
+# Load environment variables
+load_dotenv()
+
+
+class UserIndex:
+    """Inverted index over one user's documents."""
+
+    # Rough per-entry overhead of the dicts below, used for the memory cap
+    POSTING_BYTES = 120
+    DOCUMENT_BYTES = 300
+
+    def __init__(self):
+        self.postings = {}  # term -> {doc_key: weighted term frequency}
+        self.terms = []  # Sorted vocabulary, for prefix lookups
+        self.documents = {}  # doc_key -> (length, title, terms, row id)
+        self.total_length = 0
+        self.versions = {}  # collection -> CollectionVersions version the index reflects
+        self.size = 0
+        self.lock = threading.RLock()
+
+    def add(self, key, row_id, title, weighted_fields):
+        """Index a document given as [(text, weight), ...], replacing any previous version."""
+        self.remove(key)
+
+        frequencies = {}
+        for text, weight in weighted_fields:
+            for term in SearchIndex.tokenize(text):
+                frequencies[term] = frequencies.get(term, 0) + weight
+
+        length = sum(frequencies.values())
+        for term, frequency in frequencies.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                bisect.insort(self.terms, term)
+                self.size += sys.getsizeof(term)
+            postings[key] = frequency
+
+        self.documents[key] = (length, title, tuple(frequencies), row_id)
+        self.total_length += length
+        self.size += self.DOCUMENT_BYTES + sys.getsizeof(title or "") + self.POSTING_BYTES * len(frequencies)
+
+    def remove(self, key):
+        document = self.documents.pop(key, None)
+        if document is None:
+            return
+
+        length, title, terms, _ = document
+        for term in terms:
+            postings = self.postings[term]
+            del postings[key]
+            if not postings:
+                del self.postings[term]
+                del self.terms[bisect.bisect_left(self.terms, term)]
+                self.size -= sys.getsizeof(term)
+
+        self.total_length -= length
+        self.size -= self.DOCUMENT_BYTES + sys.getsizeof(title or "") + self.POSTING_BYTES * len(terms)
+
+    def remove_collection(self, collection):
+        for key in [key for key in self.documents if key[0] == collection]:
+            self.remove(key)
+
+    def expand(self, prefix, max_terms):
+        """Terms of the vocabulary starting with prefix, the exact term first."""
+        start = bisect.bisect_left(self.terms, prefix)
+        matches = []
+        for term in self.terms[start:]:
+            if not term.startswith(prefix) or len(matches) >= max_terms:
+                break
+            matches.append(term)
+        return matches
+
+
+class SearchIndex:
+    """
+    Per-user full-text search over tasks, scripts, projects, items and canvases.
+
+    A user's index is built from the database on their first search and then
+    kept up to date by the managers, which call apply() right after each
+    CollectionVersions.bump. The index remembers which collection version it
+    reflects; when a change it did not see is detected (another worker process,
+    or a write racing with the initial load), that collection is reloaded on
+    the next search.
+
+    Queries match every term as a prefix and are ranked with BM25. Indexes are
+    evicted least recently used first once SEARCH_INDEX_MAX_BYTES is exceeded.
+    """
+
+    # collection -> (title field, [(field, weight), ...])
+    FIELDS = {
+        "tasks": ("title", [("title", 2), ("description", 1)]),
+        "scripts": ("title", [("title", 2), ("description", 1), ("code", 1)]),
+        "projects": ("title", [("title", 2), ("description", 1)]),
+        "items": ("name", [("name", 2)]),
+        "canvas": ("name", [("name", 2)])
+    }
+
+    K1 = 1.2
+    B = 0.75
+    MAX_EXPANSIONS = 50
+    MAX_TERM_LENGTH = 64
+    PAGE_SIZE = 1000
+
+    _TOKEN = re.compile(r"\w+")
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv("SEARCH_INDEX_MAX_BYTES", str(256 * 1024 * 1024))
+        )
+        self._indexes = OrderedDict()  # user_id -> UserIndex, least recently used first
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """Initialize or retrieve the process-wide search index."""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def tokenize(cls, text):
+        if not text:
+            return []
+        return [term for term in cls._TOKEN.findall(str(text).lower()) if len(term) <= cls.MAX_TERM_LENGTH]
+
+    def _document(self, collection, row):
+        title_field, fields = self.FIELDS[collection]
+        key = (collection, str(row["id"]))
+        return key, row["id"], row.get(title_field), [(row.get(field), weight) for field, weight in fields]
+
+    def apply(self, user_id, collection, upserts=(), deletes=()):
+        """
+        Apply a committed change to the user's index, if it is loaded.
+
+        Must be called once per CollectionVersions.bump of the collection, after it.
+
+        Args:
+            user_id (str): Owner of the rows
+            collection (str): One of FIELDS
+            upserts (list): Created or updated rows, with at least the indexed fields
+            deletes (list): Ids of deleted rows
+        """
+        with self._lock:
+            index = self._indexes.get(str(user_id))
+        if index is None:
+            return
+
+        try:
+            with index.lock:
+                version = CollectionVersions.get(user_id, collection)
+                if index.versions.get(collection) != version - 1:
+                    # A change was missed; the collection is reloaded on the next search
+                    return
+
+                for row in upserts:
+                    index.add(*self._document(collection, row))
+                for row_id in deletes:
+                    index.remove((collection, str(row_id)))
+                index.versions[collection] = version
+        except Exception as e:
+            print(f"Error updating search index: {str(e)}")
+            index.versions.pop(collection, None)
+
+        self._evict()
+
+    def _load_collection(self, index, user_id, collection):
+        """(Re)load one collection of the user's documents from the database."""
+        # Read the version first, so a write during the load is caught by the next search
+        version = CollectionVersions.get(user_id, collection)
+        _, fields = self.FIELDS[collection]
+        columns = ",".join(["id"] + [field for field, _ in fields])
+
+        # Loads run inside the user's search request; items, canvas and projects are only visible through RLS
+        client = DataConfig.get_request_client()
+
+        index.versions.pop(collection, None)
+        index.remove_collection(collection)
+        start = 0
+        while True:
+            response = client.table(collection).select(columns)\
+                .eq("user_id", user_id)\
+                .order("id")\
+                .range(start, start + self.PAGE_SIZE - 1)\
+                .execute()
+            rows = response.data or []
+            for row in rows:
+                index.add(*self._document(collection, row))
+            if len(rows) < self.PAGE_SIZE:
+                break
+            start += self.PAGE_SIZE
+
+        index.versions[collection] = version
+
+    def _get_index(self, user_id, collections):
+        with self._lock:
+            index = self._indexes.get(str(user_id))
+            if index is None:
+                index = self._indexes[str(user_id)] = UserIndex()
+            self._indexes.move_to_end(str(user_id))
+
+        with index.lock:
+            for collection in collections:
+                if index.versions.get(collection) != CollectionVersions.get(user_id, collection):
+                    self._load_collection(index, user_id, collection)
+        return index
+
+    def _evict(self, keep=None):
+        with self._lock:
+            total = sum(index.size for index in self._indexes.values())
+            for user_id in list(self._indexes):
+                if total <= self.max_bytes:
+                    break
+                if user_id == keep:
+                    continue
+                total -= self._indexes.pop(user_id).size
+
+    def search(self, user_id, query, collections=None, limit=20):
+        """
+        Search a user's documents.
+
+        Args:
+            user_id (str): The authenticated user
+            query (str): Search text; every term must match, as a prefix
+            collections (list, optional): Only search these collections
+            limit (int): Maximum number of results
+
+        Returns:
+            list: [{"collection", "id", "title", "score"}], best match first
+        """
+        collections = list(collections or self.FIELDS)
+        unknown = [collection for collection in collections if collection not in self.FIELDS]
+        if unknown:
+            raise Exception(f"Cannot search {', '.join(unknown)}")
+
+        terms = list(dict.fromkeys(self.tokenize(query)))
+        if not terms:
+            return []
+
+        index = self._get_index(user_id, collections)
+        self._evict(keep=str(user_id))
+
+        with index.lock:
+            count = len(index.documents)
+            average_length = index.total_length / count if count else 0
+
+            # Start with the rarest term, so later terms only score its candidates
+            expansions = [index.expand(term, self.MAX_EXPANSIONS) for term in terms]
+            expansions.sort(key=lambda matches: sum(len(index.postings[match]) for match in matches))
+
+            scores = None
+            for matches in expansions:
+                term_scores = {}
+                for match in matches:
+                    postings = index.postings[match]
+                    idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+
+                    if scores is None or len(postings) <= len(scores):
+                        candidates = postings.items()
+                    else:
+                        candidates = [(key, postings[key]) for key in scores if key in postings]
+
+                    for key, frequency in candidates:
+                        if key[0] not in collections:
+                            continue
+                        length = index.documents[key][0]
+                        norm = frequency + self.K1 * (1 - self.B + self.B * length / average_length)
+                        score = idf * frequency * (self.K1 + 1) / norm
+                        # A document matching several expansions counts its best one
+                        if score > term_scores.get(key, 0):
+                            term_scores[key] = score
+
+                # Every term has to match
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {key: scores[key] + score for key, score in term_scores.items() if key in scores}
+                if not scores:
+                    return []
+
+            best = heapq.nlargest(limit, scores.items(), key=lambda entry: entry[1])
+            return [
+                {"collection": key[0], "id": index.documents[key][3], "title": index.documents[key][1],
+                 "score": round(score, 4)}
+                for key, score in best
+            ]
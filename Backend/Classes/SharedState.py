@@ -0,0 +1,43 @@
+from dotenv import load_dotenv
+import os
+import sqlite3
+import threading
+
+# Load environment variables
+load_dotenv()
+
+
+class SharedState:
+    """
+    Access to the optional SQLite file shared by all worker processes on a host.
+
+    Set SHARED_STATE_PATH to enable it; without it, state that has to be
+    consistent across processes (collection versions, cached queries) is kept
+    in process memory, which is only correct with a single worker process.
+    """
+
+    _local = threading.local()
+
+    @staticmethod
+    def path():
+        return os.getenv("SHARED_STATE_PATH") or None
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        return cls.path() is not None
+
+    @classmethod
+    def connect(cls) -> sqlite3.Connection:
+        """Get this thread's connection to the shared state file."""
+        connection = getattr(cls._local, "connection", None)
+        pid = getattr(cls._local, "pid", None)
+
+        if connection is None or pid != os.getpid():
+            # isolation_level=None leaves transactions to explicit BEGIN statements
+            connection = sqlite3.connect(cls.path(), timeout=5, isolation_level=None)
+            connection.execute("pragma journal_mode=wal")
+            connection.execute("pragma synchronous=normal")
+            cls._local.connection = connection
+            cls._local.pid = os.getpid()
+
+        return connection
@@ -0,0 +1,67 @@
+from dotenv import load_dotenv
+from Classes.DataConfig import DataConfig
+from Classes.Pagination import Pagination
+import os
+
+# Load environment variables
+load_dotenv()
+
+
+class SyncManager:
+    """
+    Delta sync of all of a user's collections.
+
+    Changed rows are found through the updated_at column of each table and
+    deleted ones through the tombstones that a trigger on each table writes
+    (see Database/005_sync.sql and 014_deletion_tombstones.sql).
+    """
+
+    COLLECTIONS = ("tasks", "scripts", "projects", "events", "items", "canvas")
+    DEFAULT_LIMIT = 1000
+    MAX_LIMIT = 5000
+
+    def __init__(self):
+        self.overlap_ms = int(os.getenv("SYNC_OVERLAP_MS", "5000"))
+
+    def fetch_changes(self, user_id, cursor=None, limit=None):
+        """
+        Get everything that changed in a user's collections since a cursor.
+
+        Args:
+            user_id (str): The authenticated user
+            cursor (str, optional): Cursor from the previous sync; without it every row is returned
+            limit (int, optional): Maximum rows per collection in one response
+
+        Returns:
+            dict: {"changes": {"tasks": [...], ...}, "deleted": [{"collection", "id", "deleted_at"}],
+                   "cursor": str, "has_more": bool}. While has_more is true, call again
+                   with the returned cursor right away.
+        """
+        try:
+            since, after = Pagination.decode_cursor(cursor) if cursor else [None, None]
+            limit = max(1, min(int(limit or self.DEFAULT_LIMIT), self.MAX_LIMIT))
+
+            # sync_changes runs as the caller, so RLS only shows the user's rows to their own client
+            client = DataConfig.get_request_client()
+            response = client.rpc("sync_changes", {
+                "p_user_id": user_id,
+                "p_since": since,
+                "p_after": after,
+                "p_limit": limit,
+                "p_overlap": f"{self.overlap_ms} milliseconds"
+            }).execute()
+            result = response.data
+
+            return {
+                "changes": result["changes"],
+                "deleted": [
+                    {"collection": row["collection"], "id": row["id"], "deleted_at": row["deleted_at"]}
+                    for row in result["deleted"]
+                ],
+                "cursor": Pagination.encode_cursor([result["since"], result["after"]]),
+                "has_more": result["has_more"]
+            }
+        except ValueError:
+            raise  # An invalid cursor, reported to the client as is
+        except Exception as e:
+            raise Exception(f"Failed to sync changes: {str(e)}")
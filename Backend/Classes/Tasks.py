@@ -1,12 +1,26 @@
 from dotenv import load_dotenv
 from Classes.DataConfig import DataConfig
+from Classes.CollectionVersions import CollectionVersions
+from Classes.QueryCache import QueryCache
 from Classes.ActivityModule import ActivityTracker
+from Classes.Mutations import Mutations
+from Classes.Pagination import Pagination
+from Classes.SearchIndex import SearchIndex
+from datetime import datetime, timedelta, timezone
+import json
 import os
 
 # Load environment variables once at module level
 load_dotenv()
 
 class TaskManager:
+    MAX_BATCH_SIZE = 500
+    BATCH_OPERATIONS = ("create", "update", "status", "delete")
+    TASK_FIELDS = ("id", "title", "description", "priority", "status", "user_id", "created_at")
+    SORT_FIELDS = ("created_at", "title", "priority", "status", "id")
+    STATS_BUCKETS = ("day", "week", "month")
+    MAX_STATS_PERIODS = 366
+
     def __init__(self):
           self._client = DataConfig.get_client()
           self._activity_tracker = ActivityTracker()
@@ -28,6 +42,9 @@ class TaskManager:
             if not response.data:
                 raise Exception("Task creation failed")
             
+            CollectionVersions.bump(user_id, 'tasks', 'create', response.data[0]['id'])
+            SearchIndex.get_instance().apply(user_id, 'tasks', upserts=response.data)
+            
             # Log activity
             task = response.data[0]
             self._activity_tracker.log_activity(
@@ -43,40 +60,183 @@ class TaskManager:
         except Exception as e:
             raise Exception(f"Failed to create task: {str(e)}")
 
-    def fetch_tasks(self, user_id=None):
-        """Fetch all tasks from the database for a specific user."""
+    def fetch_tasks(self, user_id=None, status=None, priority=None, search=None, sort=None, order=None, fields=None):
+        """
+        Fetch all tasks from the database for a specific user.
+        
+        Filters, sorting and column projection are all pushed down into the query.
+        """
         try:
-            query = self._client.table('tasks').select('*')
+            query = self._tasks_query(user_id, status, priority, search, fields)
             
-            # Filter by user_id if provided
-            if user_id:
-                query = query.eq('user_id', user_id)
+            if sort:
+                sort, desc = self._sort_order(sort, order)
+                query = query.order(sort, desc=desc).order('id', desc=desc)
                 
-            response = query.execute()
-            return response.data if response.data else []
+            def load():
+                response = query.execute()
+                return response.data if response.data else []
+                
+            params = {"status": status, "priority": priority, "search": search,
+                      "sort": sort, "order": order, "fields": fields}
+            return QueryCache.get_instance().get_or_load(user_id, 'tasks', params, load)
+        except ValueError:
+            raise  # Invalid sort, order, fields or cursor, reported to the client as is
         except Exception as e:
             raise Exception(f"Failed to fetch tasks: {str(e)}")
 
-    def delete_task(self, task_id, user_id=None):
-        """Delete a task from the database."""
+    def fetch_task_page(self, user_id, status=None, priority=None, search=None, sort=None, order=None,
+                        fields=None, limit=None, cursor=None):
+        """
+        Fetch one page of a user's tasks, selected by keyset on (sort field, id).
+        
+        Returns:
+            dict: {"tasks": [...], "next_cursor": str or None}
+        """
         try:
-            # Get task details before deletion for activity logging
-            task_details = self._client.table('tasks').select('*').eq('id', task_id).execute()
-            if not task_details.data or len(task_details.data) == 0:
-                raise Exception("Task not found")
+            sort, desc = self._sort_order(sort or 'created_at', order)
+            limit = Pagination.clamp_limit(limit)
             
-            task = task_details.data[0]
+            # The cursor is built from the sort field and id, so they are always selected
+            if fields:
+                fields = list(fields) + [field for field in ('id', sort) if field not in fields]
+                
+            query = self._tasks_query(user_id, status, priority, search, fields)
             
+            if cursor:
+                last_value, last_id = Pagination.decode_cursor(cursor)
+                query = query.or_(Pagination.after_filter(sort, desc, last_value, last_id))
+                
+            query = query.order(sort, desc=desc).order('id', desc=desc).limit(limit + 1)
+            
+            def load():
+                response = query.execute()
+                tasks, next_cursor = Pagination.page(
+                    response.data or [],
+                    limit,
+                    lambda task: [task[sort], task['id']]
+                )
+                return {"tasks": tasks, "next_cursor": next_cursor}
+                
+            params = {"status": status, "priority": priority, "search": search, "sort": sort,
+                      "desc": desc, "fields": fields, "limit": limit, "cursor": cursor}
+            return QueryCache.get_instance().get_or_load(user_id, 'tasks', params, load)
+        except ValueError:
+            raise  # Invalid sort, order, fields or cursor, reported to the client as is
+        except Exception as e:
+            raise Exception(f"Failed to fetch tasks: {str(e)}")
+
+    def _tasks_query(self, user_id=None, status=None, priority=None, search=None, fields=None):
+        """Build a tasks query with the given filters and column projection."""
+        if fields:
+            unknown = [field for field in fields if field not in self.TASK_FIELDS]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+            columns = ','.join(dict.fromkeys(fields))
+        else:
+            columns = '*'
+            
+        query = self._client.table('tasks').select(columns)
+        
+        # Filter by user_id if provided
+        if user_id:
+            query = query.eq('user_id', user_id)
+            
+        # Status and priority accept comma-separated lists
+        if status:
+            query = query.in_('status', status.split(','))
+        if priority:
+            query = query.in_('priority', priority.split(','))
+            
+        if search:
+            pattern = Pagination.contains_pattern(search)
+            query = query.or_(f"title.ilike.{pattern},description.ilike.{pattern}")
+            
+        return query
+
+    def _sort_order(self, sort, order=None):
+        """Validate a sort field and direction, returning (field, descending)."""
+        if sort not in self.SORT_FIELDS:
+            raise ValueError(f"Cannot sort by '{sort}'")
+        if order and order not in ('asc', 'desc'):
+            raise ValueError("Order must be 'asc' or 'desc'")
+        
+        # Newest first by default, alphabetical otherwise
+        if order is None:
+            return sort, sort == 'created_at'
+        return sort, order == 'desc'
+
+    def fetch_task_stats(self, user_id, bucket='day', periods=30):
+        """
+        Get a user's task counts without downloading the tasks.
+
+        Counts by status and priority and the number of tasks completed per
+        bucket are computed by the task_stats function in the database.
+
+        Args:
+            user_id (str): Owner of the tasks
+            bucket (str): 'day', 'week' or 'month'
+            periods (int): Number of buckets, ending with the current one
+
+        Returns:
+            dict: {"total": n, "by_status": {...}, "by_priority": {...},
+                   "completed": {"bucket": ..., "since": ..., "counts": [...]}}
+        """
+        try:
+            if bucket not in self.STATS_BUCKETS:
+                raise ValueError(f"Bucket must be one of {', '.join(self.STATS_BUCKETS)}")
+            periods = max(1, min(int(periods or 30), self.MAX_STATS_PERIODS))
+            
+            def load():
+                response = self._client.rpc('task_stats', {
+                    "p_user_id": user_id,
+                    "p_bucket": bucket,
+                    "p_periods": periods
+                }).execute()
+                return response.data
+                
+            # The window ends with the current bucket, so it moves with the clock too
+            params = {"stats": True, "bucket": bucket, "periods": periods,
+                      "period": self.stats_period(bucket)}
+            return QueryCache.get_instance().get_or_load(user_id, 'tasks', params, load)
+        except ValueError:
+            raise  # An invalid bucket, reported to the client as is
+        except Exception as e:
+            raise Exception(f"Failed to fetch task statistics: {str(e)}")
+
+    @staticmethod
+    def stats_period(bucket='day', now=None) -> str:
+        """
+        Start of the current stats bucket, the last one in the task_stats window.
+
+        Matches date_trunc in the database, which runs in UTC: weeks start on Monday.
+        """
+        today = (now or datetime.now(timezone.utc)).date()
+        if bucket == 'week':
+            return (today - timedelta(days=today.weekday())).isoformat()
+        if bucket == 'month':
+            return today.replace(day=1).isoformat()
+        return today.isoformat()
+
+    def delete_task(self, task_id, user_id=None):
+        """Delete a task from the database."""
+        try:
             query = self._client.table('tasks').delete().eq('id', task_id)
             
             # Ensure the task belongs to the user if user_id is provided
             if user_id:
                 query = query.eq('user_id', user_id)
                 
+            # The deleted row is returned, so it does not need to be read first
             response = query.execute()
             
             if not response.data:
-                raise Exception("Task deletion failed")
+                raise Exception("Task not found")
+            
+            task = response.data[0]
+            
+            CollectionVersions.bump(user_id, 'tasks', 'delete', task_id)
+            SearchIndex.get_instance().apply(user_id, 'tasks', deletes=[task_id])
             
             # Log activity
             self._activity_tracker.log_activity(
@@ -94,27 +254,15 @@ class TaskManager:
     def update_task(self, task_id, data, user_id=None):
         """Update a task's title in the database."""
         try:
-            # Get task details before update for activity logging
-            task_details = self._client.table('tasks').select('*').eq('id', task_id).execute()
-            if not task_details.data or len(task_details.data) == 0:
+            # Update and get the previous state for activity logging in one request
+            task, updated_task = Mutations.update_with_diff(self._client, 'tasks', task_id, data, user_id)
+            if not updated_task:
                 raise Exception("Task not found")
             
-            task = task_details.data[0]
-            
-            query = self._client.table('tasks').update(data).eq('id', task_id)
-            
-            # Ensure the task belongs to the user if user_id is provided
-            if user_id:
-                query = query.eq('user_id', user_id)
-                
-            response = query.execute()
-            
-            if not response.data:
-                raise Exception("Task update failed")
+            CollectionVersions.bump(user_id, 'tasks', 'update', task_id)
+            SearchIndex.get_instance().apply(user_id, 'tasks', upserts=[updated_task])
             
             # Log activity
-            updated_task = response.data[0]
-            
             # Determine what was changed
             changes = []
             if data.get('title') and data['title'] != task['title']:
@@ -146,13 +294,6 @@ class TaskManager:
     def mark_task_completed(self, task_id, user_id=None):
         """Mark a task as completed in the database."""
         try:
-            # Get task details before update for activity logging
-            task_details = self._client.table('tasks').select('*').eq('id', task_id).execute()
-            if not task_details.data or len(task_details.data) == 0:
-                raise Exception("Task not found")
-            
-            task = task_details.data[0]
-            
             query = self._client.table('tasks').update({"status": "completed"}).eq('id', task_id)
             
             # Ensure the task belongs to the user if user_id is provided
@@ -162,7 +303,12 @@ class TaskManager:
             response = query.execute()
             
             if not response.data:
-                raise Exception("Failed to mark task as completed")
+                raise Exception("Task not found")
+            
+            task = response.data[0]
+            
+            CollectionVersions.bump(user_id, 'tasks', 'update', task_id)
+            SearchIndex.get_instance().apply(user_id, 'tasks', upserts=[task])
             
             # Log activity
             self._activity_tracker.log_activity(
@@ -181,24 +327,15 @@ class TaskManager:
     def set_status(self, task_id, status, user_id=None):
         """Set the status of a task in the database."""
         try:
-            # Get task details before update for activity logging
-            task_details = self._client.table('tasks').select('*').eq('id', task_id).execute()
-            if not task_details.data or len(task_details.data) == 0:
+            # Update and get the previous status for activity logging in one request
+            task, updated_task = Mutations.update_with_diff(self._client, 'tasks', task_id, {"status": status}, user_id)
+            if not updated_task:
                 raise Exception("Task not found")
             
-            task = task_details.data[0]
             old_status = task['status']
             
-            query = self._client.table('tasks').update({"status": status}).eq('id', task_id)
-            
-            # Ensure the task belongs to the user if user_id is provided
-            if user_id:
-                query = query.eq('user_id', user_id)
-                
-            response = query.execute()
-            
-            if not response.data:
-                raise Exception("Failed to set task status")
+            CollectionVersions.bump(user_id, 'tasks', 'update', task_id)
+            SearchIndex.get_instance().apply(user_id, 'tasks', upserts=[updated_task])
             
             # Log activity
             self._activity_tracker.log_activity(
@@ -209,6 +346,180 @@ class TaskManager:
                 related_item_type="task"
             )
             
-            return response.data[0]
+            return updated_task
         except Exception as e:
             raise Exception(f"Failed to set task status: {str(e)}")
+
+
+    def apply_batch(self, operations, user_id):
+        """
+        Apply a list of task operations with as few requests as possible.
+
+        Creates are one bulk insert, updates with the same changes (including
+        status changes) are one update per distinct change filtered with in_(),
+        and deletes are one in_() delete. Activities are logged in bulk.
+
+        Args:
+            operations (list): Operations such as {"op": "create", "data": {...}},
+                {"op": "update", "id": 1, "data": {...}}, {"op": "status", "id": 1,
+                "status": "completed"} or {"op": "delete", "id": 1}
+            user_id (str): Owner of the tasks
+
+        Returns:
+            list: One result per operation, in the same order
+        """
+        if not isinstance(operations, list):
+            raise Exception("Operations must be a list")
+        if len(operations) > self.MAX_BATCH_SIZE:
+            raise Exception(f"A batch can contain at most {self.MAX_BATCH_SIZE} operations")
+
+        results = [None] * len(operations)
+        creates = []  # (index, task_data)
+        updates = {}  # serialized changes -> (changes, [(index, task_id)])
+        deletes = []  # (index, task_id)
+        seen_ids = set()
+
+        for index, operation in enumerate(operations):
+            op = operation.get('op') if isinstance(operation, dict) else None
+            task_id = operation.get('id') if op else None
+
+            if op not in self.BATCH_OPERATIONS:
+                results[index] = {"op": op, "error": f"Unknown operation '{op}'"}
+                continue
+
+            data = operation.get('data')
+            if data is None:
+                data = {}
+            elif not isinstance(data, dict):
+                results[index] = {"op": op, "error": "Data must be an object"}
+                continue
+
+            if op == 'create':
+                if not data.get('title'):
+                    results[index] = {"op": op, "error": "Title is required"}
+                    continue
+                creates.append((index, {
+                    "title": data.get('title'),
+                    "description": data.get('description', ''),
+                    "priority": data.get('priority', 'Medium'),
+                    "status": data.get('status', 'Pending'),
+                    "user_id": user_id
+                }))
+                continue
+
+            if task_id is None:
+                results[index] = {"op": op, "error": "Task ID is required"}
+                continue
+            if not isinstance(task_id, (int, str)) or isinstance(task_id, bool):
+                results[index] = {"op": op, "error": "Task ID must be a number or a string"}
+                continue
+            # Operations on the same task in one batch would have no defined order
+            if str(task_id) in seen_ids:
+                results[index] = {"op": op, "id": task_id, "error": "Task appears in more than one operation"}
+                continue
+            seen_ids.add(str(task_id))
+
+            if op == 'delete':
+                deletes.append((index, task_id))
+                continue
+
+            if op == 'status':
+                if not operation.get('status'):
+                    results[index] = {"op": op, "id": task_id, "error": "Status is required"}
+                    continue
+                changes = {"status": operation['status']}
+            else:
+                changes = {key: value for key, value in data.items() if key not in ('id', 'user_id')}
+                if not changes:
+                    results[index] = {"op": op, "id": task_id, "error": "No data provided"}
+                    continue
+
+            key = json.dumps(changes, sort_keys=True)
+            updates.setdefault(key, (changes, []))[1].append((index, task_id))
+
+        activities = []
+
+        if creates:
+            try:
+                response = self._client.table('tasks').insert([data for _, data in creates]).execute()
+                for (index, data), task in zip(creates, response.data or []):
+                    results[index] = {"op": "create", "id": task['id'], "task": task}
+                    activities.append({
+                        "user_id": user_id,
+                        "activity_type": "create",
+                        "description": f"Created task '{task['title']}' with {task['priority']} priority",
+                        "related_item_id": task['id'],
+                        "related_item_type": "task"
+                    })
+            except Exception as e:
+                for index, _ in creates:
+                    results[index] = {"op": "create", "error": f"Failed to create task: {str(e)}"}
+
+        for changes, targets in updates.values():
+            ids = [task_id for _, task_id in targets]
+            try:
+                response = self._client.table('tasks').update(changes)\
+                    .in_('id', ids)\
+                    .eq('user_id', user_id)\
+                    .execute()
+                updated = {str(task['id']): task for task in response.data or []}
+            except Exception as e:
+                updated = None
+                error = f"Failed to update task: {str(e)}"
+
+            for index, task_id in targets:
+                op = operations[index]['op']
+                task = updated.get(str(task_id)) if updated is not None else None
+                if task is None:
+                    results[index] = {"op": op, "id": task_id, "error": error if updated is None else "Task not found"}
+                    continue
+
+                results[index] = {"op": op, "id": task_id, "task": task}
+                if op == 'status':
+                    description = f"Changed task '{task['title']}' status to '{changes['status']}'"
+                else:
+                    description = f"Updated task '{task['title']}' ({', '.join(sorted(changes))})"
+                activities.append({
+                    "user_id": user_id,
+                    "activity_type": "update",
+                    "description": description,
+                    "related_item_id": task['id'],
+                    "related_item_type": "task"
+                })
+
+        if deletes:
+            try:
+                response = self._client.table('tasks').delete()\
+                    .in_('id', [task_id for _, task_id in deletes])\
+                    .eq('user_id', user_id)\
+                    .execute()
+                deleted = {str(task['id']): task for task in response.data or []}
+                for index, task_id in deletes:
+                    task = deleted.get(str(task_id))
+                    if task is None:
+                        results[index] = {"op": "delete", "id": task_id, "error": "Task not found"}
+                        continue
+                    results[index] = {"op": "delete", "id": task_id, "task": task}
+                    activities.append({
+                        "user_id": user_id,
+                        "activity_type": "delete",
+                        "description": f"Deleted task '{task['title']}'",
+                        "related_item_id": task['id'],
+                        "related_item_type": "task"
+                    })
+            except Exception as e:
+                for index, task_id in deletes:
+                    results[index] = {"op": "delete", "id": task_id, "error": f"Failed to delete task: {str(e)}"}
+
+        succeeded = [result for result in results if result and "error" not in result]
+        if succeeded:
+            CollectionVersions.bump(user_id, 'tasks', 'batch')
+            SearchIndex.get_instance().apply(
+                user_id, 'tasks',
+                upserts=[result['task'] for result in succeeded if result['op'] != 'delete'],
+                deletes=[result['id'] for result in succeeded if result['op'] == 'delete']
+            )
+
+        self._activity_tracker.log_activities(activities)
+
+        return results
@@ -0,0 +1,7 @@
+-- Keyset pagination of the activity feed (ActivityTracker.get_activity_page)
+-- walks (timestamp, id) newest first within one user's rows.
+create index if not exists activities_user_feed_idx
+    on public.activities (user_id, "timestamp" desc, id desc);
+
+create index if not exists activities_user_type_feed_idx
+    on public.activities (user_id, activity_type, "timestamp" desc, id desc);
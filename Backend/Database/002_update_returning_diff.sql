@@ -0,0 +1,57 @@
+-- Applies a partial update to one row and returns the row before and after the
+-- update as {"old": ..., "new": ...}, so managers can describe a change in the
+-- activity log without selecting the row first (Classes/Mutations.py).
+--
+-- Runs as the caller, so RLS still applies to authenticated clients. Returns
+-- null when the row does not exist or does not belong to p_user_id.
+create or replace function public.update_returning_diff(
+    p_table text,
+    p_id text,
+    p_patch jsonb,
+    p_user_id uuid default null
+) returns jsonb
+language plpgsql
+security invoker
+as $$
+declare
+    v_columns text;
+    v_old jsonb;
+    v_new jsonb;
+begin
+    if p_table not in ('tasks', 'scripts', 'projects', 'canvas', 'items', 'events') then
+        raise exception 'Table % is not allowed', p_table;
+    end if;
+
+    select string_agg(format('%I', key), ', ')
+      into v_columns
+      from jsonb_object_keys(p_patch) as key
+     where key not in ('id', 'user_id');
+
+    if v_columns is null then
+        raise exception 'No columns to update';
+    end if;
+
+    -- The id is cast through the table's row type so the primary key index is used
+    execute format(
+        'select to_jsonb(t) from public.%1$I t
+          where t.id = (jsonb_populate_record(null::public.%1$I, jsonb_build_object(''id'', $1))).id
+            and ($2::uuid is null or t.user_id = $2)
+          for update',
+        p_table
+    ) into v_old using p_id, p_user_id;
+
+    if v_old is null then
+        return null;
+    end if;
+
+    execute format(
+        'update public.%1$I t
+            set (%2$s) = (select %2$s from jsonb_populate_record(null::public.%1$I, $1))
+          where t.id = (jsonb_populate_record(null::public.%1$I, jsonb_build_object(''id'', $2))).id
+         returning to_jsonb(t)',
+        p_table, v_columns
+    ) into v_new using p_patch, p_id;
+
+    return jsonb_build_object('old', v_old, 'new', v_new);
+end;
+$$;
@@ -0,0 +1,20 @@
+-- Server-side filtering, sorting and keyset pagination of GET /api/tasks
+-- (TaskManager.fetch_task_page) always filter by user_id and order by
+-- (sort field, id).
+create index if not exists tasks_user_created_idx
+    on public.tasks (user_id, created_at desc, id desc);
+
+create index if not exists tasks_user_status_idx
+    on public.tasks (user_id, status, created_at desc, id desc);
+
+create index if not exists tasks_user_priority_idx
+    on public.tasks (user_id, priority, created_at desc, id desc);
+
+-- Text search uses ilike '%term%', which needs trigram indexes
+create extension if not exists pg_trgm;
+
+create index if not exists tasks_title_trgm_idx
+    on public.tasks using gin (title gin_trgm_ops);
+
+create index if not exists tasks_description_trgm_idx
+    on public.tasks using gin (description gin_trgm_ops);
@@ -0,0 +1,104 @@
+-- Task statistics for GET /api/tasks/stats (TaskManager.fetch_task_stats),
+-- aggregated in the database so the response stays a few hundred bytes no
+-- matter how many tasks a user has.
+
+-- When a task was completed, kept up to date by a trigger so every write path
+-- (single updates, batch updates, update_returning_diff) records it
+alter table public.tasks add column if not exists completed_at timestamptz;
+
+create or replace function public.tasks_set_completed_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    if lower(coalesce(new.status, '')) = 'completed' then
+        if tg_op = 'INSERT' or lower(coalesce(old.status, '')) <> 'completed' then
+            new.completed_at := now();
+        end if;
+    else
+        new.completed_at := null;
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists tasks_set_completed_at on public.tasks;
+create trigger tasks_set_completed_at
+    before insert or update of status on public.tasks
+    for each row execute function public.tasks_set_completed_at();
+
+-- Tasks completed before this migration have no completion time; the creation
+-- time is the best estimate available
+update public.tasks
+   set completed_at = created_at
+ where lower(status) = 'completed'
+   and completed_at is null;
+
+create index if not exists tasks_user_completed_idx
+    on public.tasks (user_id, completed_at)
+    where completed_at is not null;
+
+-- Returns {"total": n, "by_status": {...}, "by_priority": {...},
+--          "completed": {"bucket": "day", "since": ..., "counts": [...]}}
+-- where counts holds one entry per bucket, oldest first, ending with the
+-- current one. Runs as the caller, so RLS still applies.
+create or replace function public.task_stats(
+    p_user_id uuid,
+    p_bucket text default 'day',
+    p_periods integer default 30
+) returns jsonb
+language plpgsql
+stable
+security invoker
+as $$
+declare
+    v_step interval;
+    v_since timestamptz;
+    v_result jsonb;
+begin
+    if p_bucket not in ('day', 'week', 'month') then
+        raise exception 'Bucket % is not allowed', p_bucket;
+    end if;
+
+    v_step := ('1 ' || p_bucket)::interval;
+    v_since := date_trunc(p_bucket, now()) - (greatest(p_periods, 1) - 1) * v_step;
+
+    select jsonb_build_object(
+        'total', coalesce(sum(n), 0),
+        'by_status', coalesce(jsonb_object_agg(status, n), '{}'::jsonb)
+    )
+      into v_result
+      from (select coalesce(status, 'none') as status, count(*) as n
+              from public.tasks
+             where user_id = p_user_id
+             group by 1) s;
+
+    v_result := v_result || jsonb_build_object(
+        'by_priority',
+        (select coalesce(jsonb_object_agg(priority, n), '{}'::jsonb)
+           from (select coalesce(priority, 'none') as priority, count(*) as n
+                   from public.tasks
+                  where user_id = p_user_id
+                  group by 1) p)
+    );
+
+    v_result := v_result || jsonb_build_object(
+        'completed',
+        jsonb_build_object(
+            'bucket', p_bucket,
+            'since', v_since,
+            'counts', (
+                select coalesce(jsonb_agg(coalesce(c.n, 0) order by b.bucket), '[]'::jsonb)
+                  from generate_series(v_since, date_trunc(p_bucket, now()), v_step) as b(bucket)
+                  left join (select date_trunc(p_bucket, completed_at) as bucket, count(*) as n
+                               from public.tasks
+                              where user_id = p_user_id
+                                and completed_at >= v_since
+                              group by 1) c using (bucket)
+            )
+        )
+    );
+
+    return v_result;
+end;
+$$;
@@ -0,0 +1,175 @@
+-- Delta sync for GET /api/sync (Classes/Sync.py): every synced table tracks
+-- when each row last changed, and deletes leave a tombstone in public.deletions.
+
+create or replace function public.set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    -- clock_timestamp() rather than now(), so rows of one bulk insert or update
+    -- get distinct times instead of all sharing the transaction start
+    new.updated_at := clock_timestamp();
+    return new;
+end;
+$$;
+
+do $$
+declare
+    v_table text;
+begin
+    foreach v_table in array array['tasks', 'scripts', 'projects', 'events', 'items', 'canvas'] loop
+        execute format('alter table public.%I add column if not exists updated_at timestamptz', v_table);
+        execute format('update public.%I set updated_at = now() where updated_at is null', v_table);
+        execute format('alter table public.%I alter column updated_at set default clock_timestamp()', v_table);
+        execute format('alter table public.%I alter column updated_at set not null', v_table);
+
+        execute format('drop trigger if exists %I on public.%I', v_table || '_set_updated_at', v_table);
+        execute format(
+            'create trigger %I before insert or update on public.%I
+                 for each row execute function public.set_updated_at()',
+            v_table || '_set_updated_at', v_table
+        );
+
+        execute format(
+            'create index if not exists %I on public.%I (user_id, updated_at, id)',
+            v_table || '_user_updated_idx', v_table
+        );
+    end loop;
+end;
+$$;
+
+-- Written by each manager's delete path (SyncManager.record_deletions)
+create table if not exists public.deletions (
+    id bigint generated always as identity primary key,
+    user_id uuid not null,
+    collection text not null,
+    row_id text not null,
+    deleted_at timestamptz not null default clock_timestamp()
+);
+
+create index if not exists deletions_user_deleted_idx
+    on public.deletions (user_id, deleted_at, id);
+
+alter table public.deletions enable row level security;
+
+drop policy if exists "Users can read their own deletions" on public.deletions;
+create policy "Users can read their own deletions"
+    on public.deletions for select
+    using (auth.uid() = user_id);
+
+-- Tombstones only have to outlive the longest gap between two syncs
+create or replace function public.prune_deletions(p_older_than interval default '30 days')
+returns integer
+language sql
+as $$
+    with pruned as (
+        delete from public.deletions where deleted_at < now() - p_older_than returning 1
+    )
+    select count(*)::integer from pruned;
+$$;
+
+-- Returns the rows of every synced table changed since p_since, and the
+-- tombstones written since then, as
+--   {"changes": {"tasks": [...], ...}, "deleted": [...], "since": ..., "after": {...}, "has_more": bool}
+--
+-- Each table returns at most p_limit rows in (updated_at, id) order. When one
+-- is cut off, "after" holds the (updated_at, id) of the last row returned for
+-- each table, to be passed back with the same p_since for the next page. Once
+-- everything was returned, "since" is the new cursor: now() minus p_overlap,
+-- so writes still committing while the sync ran are picked up next time.
+-- Clients apply rows idempotently, so the overlap only re-sends a few rows.
+create or replace function public.sync_changes(
+    p_user_id uuid,
+    p_since timestamptz default null,
+    p_after jsonb default null,
+    p_limit integer default 1000,
+    p_overlap interval default '5 seconds'
+) returns jsonb
+language plpgsql
+stable
+security invoker
+as $$
+declare
+    v_table text;
+    v_key jsonb;
+    v_rows jsonb;
+    v_count integer;
+    v_changes jsonb := '{}'::jsonb;
+    v_deleted jsonb := '[]'::jsonb;
+    v_after jsonb := '{}'::jsonb;
+    v_has_more boolean := false;
+begin
+    foreach v_table in array array['tasks', 'scripts', 'projects', 'events', 'items', 'canvas'] loop
+        v_key := p_after -> v_table;
+
+        execute format(
+            'select coalesce(jsonb_agg(to_jsonb(t) order by t.updated_at, t.id), ''[]''::jsonb), count(*)
+               from (select * from public.%1$I t
+                      where t.user_id = $1
+                        and ($2::timestamptz is null or t.updated_at >= $2)
+                        and ($3::jsonb is null or (t.updated_at, t.id) > (
+                                ($3->>0)::timestamptz,
+                                (jsonb_populate_record(null::public.%1$I, jsonb_build_object(''id'', $3->1))).id))
+                      order by t.updated_at, t.id
+                      limit $4 + 1) t',
+            v_table
+        ) into v_rows, v_count using p_user_id, p_since, v_key, p_limit;
+
+        if v_count > p_limit then
+            v_rows := v_rows - p_limit;
+            v_has_more := true;
+        end if;
+
+        if jsonb_array_length(v_rows) > 0 then
+            v_after := v_after || jsonb_build_object(v_table, jsonb_build_array(
+                v_rows -> -1 -> 'updated_at', v_rows -> -1 -> 'id'
+            ));
+        elsif v_key is not null then
+            v_after := v_after || jsonb_build_object(v_table, v_key);
+        end if;
+
+        v_changes := v_changes || jsonb_build_object(v_table, v_rows);
+    end loop;
+
+    -- A first sync starts from an empty client, so there is nothing to tombstone
+    if p_since is not null then
+        v_key := p_after -> 'deletions';
+
+        select coalesce(jsonb_agg(jsonb_build_object(
+                   'collection', d.collection, 'id', d.row_id, 'deleted_at', d.deleted_at, 'seq', d.id
+               ) order by d.deleted_at, d.id), '[]'::jsonb), count(*)
+          into v_deleted, v_count
+          from (select * from public.deletions d
+                 where d.user_id = p_user_id
+                   and d.deleted_at >= p_since
+                   and (v_key is null or (d.deleted_at, d.id) > ((v_key->>0)::timestamptz, (v_key->>1)::bigint))
+                 order by d.deleted_at, d.id
+                 limit p_limit + 1) d;
+
+        if v_count > p_limit then
+            v_deleted := v_deleted - p_limit;
+            v_has_more := true;
+        end if;
+
+        if jsonb_array_length(v_deleted) > 0 then
+            v_after := v_after || jsonb_build_object('deletions', jsonb_build_array(
+                v_deleted -> -1 -> 'deleted_at', v_deleted -> -1 -> 'seq'
+            ));
+        elsif v_key is not null then
+            v_after := v_after || jsonb_build_object('deletions', v_key);
+        end if;
+    end if;
+
+    if v_has_more then
+        return jsonb_build_object(
+            'changes', v_changes, 'deleted', v_deleted,
+            'since', p_since, 'after', v_after, 'has_more', true
+        );
+    end if;
+
+    return jsonb_build_object(
+        'changes', v_changes, 'deleted', v_deleted,
+        'since', now() - p_overlap, 'after', null, 'has_more', false
+    );
+end;
+$$;
@@ -0,0 +1,7 @@
+-- Script listings (GET /api/scripts?view=summary) return the size of the code
+-- instead of the code itself; a stored generated column keeps the size from
+-- having to be computed from the full text on every listing.
+alter table public.scripts
+    add column if not exists code_size integer
+    generated always as (octet_length(coalesce(code, ''))) stored;
+
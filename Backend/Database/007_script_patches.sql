@@ -0,0 +1,79 @@
+-- Incremental script saves (PATCH /api/scripts/<id>/code, ScriptsManager.edit_script).
+--
+-- code_hash identifies the version of the code a client edited, so a patch
+-- made against an older version is rejected instead of silently merged.
+alter table public.scripts
+    add column if not exists code_hash text
+    generated always as (md5(coalesce(code, ''))) stored;
+
+-- Applies ranged edits to a script's code if it still has the hash p_base_hash.
+--
+-- p_ops is a list of {"start": n, "end": n or null, "text": "..."}: replace
+-- the characters [start, end) of the base version with text (end null means
+-- up to the end of the code). Offsets are in characters (code points) of the
+-- base version; ranges must be sorted and must not overlap.
+--
+-- Returns {"status": "ok", "old": {...}, "new": {...}} with the row before and
+-- after the edit, {"status": "conflict", "code_hash": current hash} when the
+-- base is stale, or {"status": "not_found"}. Runs as the caller, so RLS applies.
+create or replace function public.patch_script_code(
+    p_id bigint,
+    p_base_hash text,
+    p_ops jsonb,
+    p_user_id uuid default null
+) returns jsonb
+language plpgsql
+security invoker
+as $$
+declare
+    v_old public.scripts;
+    v_new public.scripts;
+    v_code text;
+    v_op jsonb;
+    v_start integer;
+    v_end integer;
+    v_previous_end integer := 0;
+    v_length integer;
+begin
+    select * into v_old
+      from public.scripts
+     where id = p_id
+       and (p_user_id is null or user_id = p_user_id)
+       for update;
+
+    if not found then
+        return jsonb_build_object('status', 'not_found');
+    end if;
+
+    if v_old.code_hash is distinct from p_base_hash then
+        return jsonb_build_object('status', 'conflict', 'code_hash', v_old.code_hash);
+    end if;
+
+    v_code := coalesce(v_old.code, '');
+    v_length := char_length(v_code);
+
+    -- Validate against the base version before changing anything
+    for v_op in select * from jsonb_array_elements(p_ops) loop
+        v_start := (v_op->>'start')::integer;
+        v_end := coalesce((v_op->>'end')::integer, v_length);
+        if v_start is null or v_start < v_previous_end or v_end < v_start or v_end > v_length then
+            raise exception 'Invalid edit range [%, %)', v_start, v_end;
+        end if;
+        v_previous_end := v_end;
+    end loop;
+
+    -- Apply from the last range to the first, so earlier offsets stay valid
+    for v_op in select value from jsonb_array_elements(p_ops) with ordinality order by ordinality desc loop
+        v_start := (v_op->>'start')::integer;
+        v_end := coalesce((v_op->>'end')::integer, v_length);
+        v_code := overlay(v_code placing coalesce(v_op->>'text', '') from v_start + 1 for v_end - v_start);
+    end loop;
+
+    update public.scripts
+       set code = v_code
+     where id = p_id
+    returning * into v_new;
+
+    return jsonb_build_object('status', 'ok', 'old', to_jsonb(v_old) - 'code', 'new', to_jsonb(v_new));
+end;
+$$;
@@ -0,0 +1,35 @@
+-- Version history of script code (Classes/ScriptHistory.py).
+--
+-- Each version is one of:
+--   snapshot  payload is the full code
+--   delta     payload is a JSON line delta against version - 1
+--   ref       the code is identical to version base_version, nothing is stored
+-- code_hash is the sha256 of the code, so identical code is found by hash.
+create table if not exists public.script_versions (
+    id bigint generated always as identity primary key,
+    script_id bigint not null references public.scripts (id) on delete cascade,
+    user_id uuid not null,
+    version integer not null,
+    kind text not null check (kind in ('snapshot', 'delta', 'ref')),
+    base_version integer,
+    payload text,
+    code_hash text not null,
+    size integer not null,
+    created_at timestamptz not null default now(),
+    unique (script_id, version)
+);
+
+create index if not exists script_versions_script_hash_idx
+    on public.script_versions (script_id, code_hash);
+
+-- Reconstruction starts from the nearest snapshot at or before a version
+create index if not exists script_versions_snapshots_idx
+    on public.script_versions (script_id, version)
+    where kind = 'snapshot';
+
+alter table public.script_versions enable row level security;
+
+drop policy if exists "Users can read their own script versions" on public.script_versions;
+create policy "Users can read their own script versions"
+    on public.script_versions for select
+    using (auth.uid() = user_id);
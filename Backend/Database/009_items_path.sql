@@ -0,0 +1,154 @@
+-- Materialized paths for the items hierarchy (Classes/Items.py).
+--
+-- path lists the ids from the root down to the item itself, e.g. '/4/17/52/'.
+-- The descendants of an item are the rows whose path starts with its path,
+-- its ancestors are the ids in its path, and ordering by path lists a tree
+-- depth first. The column uses the "C" collation so that a prefix is a plain
+-- btree range: path > '/4/' and path < '/40' (the last '/' bumped to '0').
+--
+-- Triggers keep path consistent for every writer: inserts take their
+-- parent's path, and moving an item rewrites the paths of its subtree.
+alter table public.items
+    add column if not exists path text collate "C";
+
+-- Backfill existing rows from the parent_id links
+with recursive tree as (
+    select id, user_id, '/' || id || '/' as path
+      from public.items
+     where parent_id is null
+    union all
+    select child.id, child.user_id, tree.path || child.id || '/'
+      from public.items child
+      join tree on child.parent_id = tree.id and child.user_id = tree.user_id
+     -- Stops at existing cycles instead of looping forever
+     where tree.path not like '%/' || child.id || '/%'
+)
+update public.items i
+   set path = tree.path
+  from tree
+ where i.id = tree.id
+   and i.path is distinct from tree.path;
+
+-- Rows the walk did not reach (orphans of a deleted parent) become roots
+update public.items
+   set path = '/' || id || '/'
+ where path is null;
+
+create index if not exists items_user_path_idx
+    on public.items (user_id, path);
+
+create or replace function public.items_set_path()
+returns trigger
+language plpgsql
+as $$
+declare
+    v_parent_path text;
+begin
+    if tg_op = 'UPDATE' and new.parent_id is not distinct from old.parent_id then
+        -- Only items_move_subtree (a nested trigger) may rewrite a path directly
+        if pg_trigger_depth() < 2 then
+            new.path := old.path;
+        end if;
+        return new;
+    end if;
+
+    if new.parent_id is null then
+        new.path := '/' || new.id || '/';
+        return new;
+    end if;
+
+    select path into v_parent_path
+      from public.items
+     where id = new.parent_id
+       and user_id = new.user_id;
+
+    if v_parent_path is null then
+        raise exception 'Parent folder not found';
+    end if;
+
+    -- The parent's path contains the item itself when it is the item or one of its descendants
+    if tg_op = 'UPDATE' and v_parent_path like old.path || '%' then
+        raise exception 'Cannot move an item into its own subtree';
+    end if;
+
+    new.path := v_parent_path || new.id || '/';
+    return new;
+end;
+$$;
+
+drop trigger if exists items_set_path on public.items;
+create trigger items_set_path
+    before insert or update of parent_id, path on public.items
+    for each row execute function public.items_set_path();
+
+create or replace function public.items_move_subtree()
+returns trigger
+language plpgsql
+as $$
+begin
+    update public.items
+       set path = new.path || substr(path, char_length(old.path) + 1)
+     where user_id = new.user_id
+       and path > old.path
+       and path < left(old.path, -1) || '0';
+    return null;
+end;
+$$;
+
+drop trigger if exists items_move_subtree on public.items;
+create trigger items_move_subtree
+    after update of parent_id on public.items
+    for each row
+    when (old.path is distinct from new.path)
+    execute function public.items_move_subtree();
+
+-- The folders containing an item, from the root down. Runs as the caller, so RLS applies.
+create or replace function public.item_ancestors(
+    p_id bigint,
+    p_user_id uuid default null
+) returns setof public.items
+language sql
+stable
+security invoker
+as $$
+    select a.*
+      from public.items i
+      join public.items a
+        on a.id = any (string_to_array(trim(both '/' from i.path), '/')::bigint[])
+       and a.user_id = i.user_id
+     where i.id = p_id
+       and (p_user_id is null or i.user_id = p_user_id)
+       and a.id <> i.id
+     order by a.path;
+$$;
+
+-- Everything inside a folder, depth first. Runs as the caller, so RLS applies.
+create or replace function public.item_descendants(
+    p_id bigint,
+    p_user_id uuid default null
+) returns setof public.items
+language plpgsql
+stable
+security invoker
+as $$
+declare
+    v_item public.items;
+begin
+    select * into v_item
+      from public.items
+     where id = p_id
+       and (p_user_id is null or user_id = p_user_id);
+
+    if not found then
+        return;
+    end if;
+
+    return query
+        select *
+          from public.items
+         where user_id = v_item.user_id
+           and path > v_item.path
+           and path < left(v_item.path, -1) || '0'
+         order by path;
+end;
+$$;
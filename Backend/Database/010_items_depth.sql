@@ -0,0 +1,5 @@
+-- Depth of each item in its tree, for GET /api/items/tree?max_depth= (Classes/Items.py).
+-- Root items have depth 0; derived from the materialized path (Database/009).
+alter table public.items
+    add column if not exists depth integer
+    generated always as (char_length(path) - char_length(replace(path, '/', '')) - 2) stored;
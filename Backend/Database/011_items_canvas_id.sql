@@ -0,0 +1,15 @@
+-- The canvas an item links to (Classes/Items.py), so root listings can merge
+-- canvases without parsing file_url. Generated from file_url ('/canvas/{id}'),
+-- so it is always consistent with it and existing rows need no backfill.
+alter table public.items
+    add column if not exists canvas_id bigint
+    generated always as (
+        case
+            when file_type = 'canvas' and file_url ~ '^/canvas/[0-9]{1,18}$'
+            then substring(file_url from 9)::bigint
+        end
+    ) stored;
+
+create index if not exists items_user_canvas_idx
+    on public.items (user_id, canvas_id)
+    where canvas_id is not null;
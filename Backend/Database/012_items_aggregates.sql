@@ -0,0 +1,161 @@
+-- Folder sizes and item counts (Classes/Items.py), so listings show them
+-- without reading the folder's subtree.
+--
+-- total_size is the sum of the sizes of everything inside an item and
+-- descendant_count the number of items inside it (both 0 for files).
+-- Statement-level triggers add the changes of each insert, delete, move or
+-- resize to the ancestors of the rows involved, read from their materialized
+-- paths (Database/009), so a subtree delete or move costs one update per
+-- statement instead of one per row. repair_item_aggregates recomputes them.
+alter table public.items
+    add column if not exists total_size bigint not null default 0,
+    add column if not exists descendant_count integer not null default 0;
+
+-- Ids of the folders containing the item with this path, root first
+create or replace function public.items_ancestor_ids(p_path text)
+returns bigint[]
+language sql
+immutable
+as $$
+    select v_ids[1:array_length(v_ids, 1) - 1]
+      from (select string_to_array(trim(both '/' from p_path), '/')::bigint[] as v_ids) ids;
+$$;
+
+create or replace function public.items_roll_up_insert()
+returns trigger
+language plpgsql
+as $$
+begin
+    update public.items i
+       set total_size = i.total_size + d.size,
+           descendant_count = i.descendant_count + d.count
+      from (
+            select a.id, sum(coalesce(n.size, 0)) as size, count(*) as count
+              from new_rows n
+             cross join lateral unnest(public.items_ancestor_ids(n.path)) as a(id)
+             group by a.id
+           ) d
+     where i.id = d.id;
+    return null;
+end;
+$$;
+
+create or replace function public.items_roll_up_delete()
+returns trigger
+language plpgsql
+as $$
+begin
+    -- Ancestors deleted by the same statement are already gone and are skipped
+    update public.items i
+       set total_size = i.total_size - d.size,
+           descendant_count = i.descendant_count - d.count
+      from (
+            select a.id, sum(coalesce(o.size, 0)) as size, count(*) as count
+              from old_rows o
+             cross join lateral unnest(public.items_ancestor_ids(o.path)) as a(id)
+             group by a.id
+           ) d
+     where i.id = d.id;
+    return null;
+end;
+$$;
+
+create or replace function public.items_roll_up_update()
+returns trigger
+language plpgsql
+as $$
+begin
+    -- Only moves and resizes change the aggregates. This also ends the
+    -- recursion: the update below fires this trigger again with neither.
+    if not exists (
+        select 1
+          from old_rows o
+          join new_rows n on n.id = o.id
+         where o.path is distinct from n.path
+            or o.size is distinct from n.size
+    ) then
+        return null;
+    end if;
+
+    -- A moved subtree's paths are rewritten by a nested statement
+    -- (items_move_subtree), which rolls up its own rows
+    with changed as (
+        select o.path as old_path, o.size as old_size, n.path as new_path, n.size as new_size
+          from old_rows o
+          join new_rows n on n.id = o.id
+         where o.path is distinct from n.path
+            or o.size is distinct from n.size
+    ),
+    deltas as (
+        select a.id, -coalesce(c.old_size, 0) as size, -1 as count
+          from changed c
+         cross join lateral unnest(public.items_ancestor_ids(c.old_path)) as a(id)
+        union all
+        select a.id, coalesce(c.new_size, 0), 1
+          from changed c
+         cross join lateral unnest(public.items_ancestor_ids(c.new_path)) as a(id)
+    )
+    update public.items i
+       set total_size = i.total_size + d.size,
+           descendant_count = i.descendant_count + d.count
+      from (
+            select id, sum(size) as size, sum(count) as count
+              from deltas
+             group by id
+            having sum(size) <> 0 or sum(count) <> 0
+           ) d
+     where i.id = d.id;
+    return null;
+end;
+$$;
+
+drop trigger if exists items_roll_up_insert on public.items;
+create trigger items_roll_up_insert
+    after insert on public.items
+    referencing new table as new_rows
+    for each statement execute function public.items_roll_up_insert();
+
+drop trigger if exists items_roll_up_delete on public.items;
+create trigger items_roll_up_delete
+    after delete on public.items
+    referencing old table as old_rows
+    for each statement execute function public.items_roll_up_delete();
+
+drop trigger if exists items_roll_up_update on public.items;
+create trigger items_roll_up_update
+    after update on public.items
+    referencing old table as old_rows new table as new_rows
+    for each statement execute function public.items_roll_up_update();
+
+-- Recomputes the aggregates of a user's items (every user's when p_user_id is
+-- null) and returns how many rows were wrong. Runs as the caller, so RLS applies.
+create or replace function public.repair_item_aggregates(p_user_id uuid default null)
+returns integer
+language plpgsql
+security invoker
+as $$
+declare
+    v_fixed integer;
+begin
+    with totals as (
+        select a.id, sum(coalesce(d.size, 0)) as size, count(*) as count
+          from public.items d
+         cross join lateral unnest(public.items_ancestor_ids(d.path)) as a(id)
+         where p_user_id is null or d.user_id = p_user_id
+         group by a.id
+    )
+    update public.items i
+       set total_size = coalesce(t.size, 0),
+           descendant_count = coalesce(t.count, 0)
+      from public.items s
+      left join totals t on t.id = s.id
+     where i.id = s.id
+       and (p_user_id is null or s.user_id = p_user_id)
+       and (i.total_size <> coalesce(t.size, 0) or i.descendant_count <> coalesce(t.count, 0));
+
+    get diagnostics v_fixed = row_count;
+    return v_fixed;
+end;
+$$;
+
+select public.repair_item_aggregates();
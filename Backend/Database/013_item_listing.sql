@@ -0,0 +1,60 @@
+-- Folder listings with canvases merged in (GET /api/items, Classes/Items.py).
+--
+-- The root of the items tree also lists the user's canvases that no item
+-- links to. Merging them in one view lets the database sort and page both
+-- kinds of rows in a single order, which Python could not reproduce for
+-- names under the database's collation.
+--
+--   id         the item id, or 'canvas_{id}' for canvases (jsonb, so item ids stay numbers)
+--   sort_size  the size of a file or the total size of a folder, for sort=size
+--   sort_id    a unique tiebreaker for keyset pagination: item ids are even, canvas ids odd
+create or replace view public.item_listing
+with (security_invoker = true)
+as
+select to_jsonb(i.id) as id,
+       i.name,
+       i.type,
+       i.file_type,
+       i.file_url,
+       i.size,
+       i.parent_id,
+       i.user_id,
+       i.created_at,
+       i.updated_at,
+       i.path,
+       i.depth,
+       i.canvas_id,
+       i.total_size,
+       i.descendant_count,
+       case when i.type = 'folder' then i.total_size else coalesce(i.size, 0) end as sort_size,
+       i.id * 2 as sort_id
+  from public.items i
+union all
+select to_jsonb('canvas_' || c.id),
+       c.name,
+       'file',
+       'canvas',
+       '/canvas/' || c.id,
+       null,
+       null,
+       c.user_id,
+       c.created_at,
+       c.updated_at,
+       null,
+       0,
+       c.id,
+       0,
+       0,
+       0,
+       c.id * 2 + 1
+  from public.canvas c
+ where not exists (
+        select 1
+          from public.items i
+         where i.user_id = c.user_id
+           and i.canvas_id = c.id
+           and i.parent_id is null
+       );
+
+create index if not exists items_user_parent_idx
+    on public.items (user_id, parent_id);
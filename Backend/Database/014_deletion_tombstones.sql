@@ -0,0 +1,36 @@
+-- Tombstones for delta sync (Database/005) written by the database itself.
+--
+-- public.deletions only lets users read their own rows, so tombstones cannot
+-- be inserted by the API's clients. An after delete trigger on every synced
+-- table writes them instead, for every writer and without an extra round
+-- trip. It runs as the function owner, so clients still cannot forge them.
+create or replace function public.record_deletions()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    insert into public.deletions (user_id, collection, row_id)
+    select user_id, tg_table_name, id::text
+      from old_rows
+     where user_id is not null;
+    return null;
+end;
+$$;
+
+do $$
+declare
+    v_table text;
+begin
+    foreach v_table in array array['tasks', 'scripts', 'projects', 'events', 'items', 'canvas'] loop
+        execute format('drop trigger if exists %I on public.%I', v_table || '_record_deletions', v_table);
+        execute format(
+            'create trigger %I after delete on public.%I
+                 referencing old table as old_rows
+                 for each statement execute function public.record_deletions()',
+            v_table || '_record_deletions', v_table
+        );
+    end loop;
+end;
+$$;
@@ -0,0 +1,133 @@
+-- Script versions (Database/008) recorded by the database instead of the API.
+--
+-- script_versions only lets users read their own rows, and writing versions
+-- from the API added several round trips and a diff to every save. A trigger
+-- on scripts now appends a version whenever the code changes, in the same
+-- transaction and without a round trip. Versions are append-only: a version
+-- number is never rewritten, so cached code for a version stays valid.
+--
+-- Each version is one of:
+--   snapshot  payload is the full code
+--   delta     payload is [prefix, suffix, text]: the code of version - 1 with
+--             everything between its first prefix and last suffix characters
+--             replaced by text (character counts, like Python string indices)
+--   ref       the code is identical to version base_version
+-- A snapshot is written every 20 versions, when the previous version does not
+-- hold the old code, or when a delta would not save at least half the size.
+create or replace function public.record_script_version()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_code text := coalesce(new.code, '');
+    v_hash text := encode(sha256(convert_to(coalesce(new.code, ''), 'UTF8')), 'hex');
+    v_latest public.script_versions;
+    v_same public.script_versions;
+    v_snapshot integer;
+    v_version integer;
+    v_old text;
+    v_old_length integer;
+    v_length integer := char_length(coalesce(new.code, ''));
+    v_prefix integer := 0;
+    v_suffix integer := 0;
+    v_low integer;
+    v_high integer;
+    v_middle integer;
+    v_text text;
+begin
+    select * into v_latest
+      from public.script_versions
+     where script_id = new.id
+     order by version desc
+     limit 1;
+
+    if found and v_latest.code_hash = v_hash then
+        return null;
+    end if;
+    v_version := coalesce(v_latest.version, 0) + 1;
+
+    -- Identical code saved before only needs a reference
+    select * into v_same
+      from public.script_versions
+     where script_id = new.id
+       and code_hash = v_hash
+     order by version
+     limit 1;
+
+    if found then
+        insert into public.script_versions (script_id, user_id, version, kind, base_version, code_hash, size)
+        values (new.id, new.user_id, v_version, 'ref',
+                case when v_same.kind = 'ref' then v_same.base_version else v_same.version end,
+                v_hash, octet_length(v_code));
+        return null;
+    end if;
+
+    select max(version) into v_snapshot
+      from public.script_versions
+     where script_id = new.id
+       and kind = 'snapshot';
+
+    v_old := case when tg_op = 'UPDATE' then coalesce(old.code, '') end;
+
+    if v_old is not null
+       and v_latest.code_hash = encode(sha256(convert_to(v_old, 'UTF8')), 'hex')
+       and v_version - v_snapshot < 20 then
+        v_old_length := char_length(v_old);
+
+        -- Longest common prefix and suffix, by binary search over substrings
+        v_low := 0;
+        v_high := least(v_old_length, v_length);
+        while v_low < v_high loop
+            v_middle := (v_low + v_high + 1) / 2;
+            if left(v_old, v_middle) = left(v_code, v_middle) then
+                v_low := v_middle;
+            else
+                v_high := v_middle - 1;
+            end if;
+        end loop;
+        v_prefix := v_low;
+
+        v_low := 0;
+        v_high := least(v_old_length, v_length) - v_prefix;
+        while v_low < v_high loop
+            v_middle := (v_low + v_high + 1) / 2;
+            if right(v_old, v_middle) = right(v_code, v_middle) then
+                v_low := v_middle;
+            else
+                v_high := v_middle - 1;
+            end if;
+        end loop;
+        v_suffix := v_low;
+
+        v_text := substr(v_code, v_prefix + 1, v_length - v_prefix - v_suffix);
+
+        if char_length(v_text) * 2 <= v_length then
+            insert into public.script_versions (script_id, user_id, version, kind, base_version, payload, code_hash, size)
+            values (new.id, new.user_id, v_version, 'delta', v_version - 1,
+                    jsonb_build_array(v_prefix, v_suffix, v_text)::text, v_hash, octet_length(v_code));
+            return null;
+        end if;
+    end if;
+
+    insert into public.script_versions (script_id, user_id, version, kind, payload, code_hash, size)
+    values (new.id, new.user_id, v_version, 'snapshot', v_code, v_hash, octet_length(v_code));
+    return null;
+end;
+$$;
+
+drop trigger if exists scripts_record_version on public.scripts;
+create trigger scripts_record_version
+    after insert or update of code on public.scripts
+    for each row
+    when (new.user_id is not null)
+    execute function public.record_script_version();
+
+-- Existing scripts start their history with their current code
+insert into public.script_versions (script_id, user_id, version, kind, payload, code_hash, size)
+select s.id, s.user_id, 1, 'snapshot', coalesce(s.code, ''),
+       encode(sha256(convert_to(coalesce(s.code, ''), 'UTF8')), 'hex'), octet_length(coalesce(s.code, ''))
+  from public.scripts s
+ where s.user_id is not null
+   and not exists (select 1 from public.script_versions v where v.script_id = s.id);
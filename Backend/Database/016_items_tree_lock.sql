@@ -0,0 +1,54 @@
+-- Serializes changes to each user's items tree (Database/009_items_path.sql).
+--
+-- items_set_path reads the parent's path to build the new one and to reject
+-- cycles. Under READ COMMITTED two concurrent moves (A into B and B into A)
+-- could both pass the check on the old paths and commit a cycle, and an
+-- insert into a folder that was being moved could keep the folder's old
+-- path. Moves and inserts into a folder now take a transaction-level advisory
+-- lock on the user's tree first, so they run one at a time per user and each
+-- reads the paths committed before it. Renames, resizes and the path rewrites
+-- of a moved subtree do not take the lock.
+create or replace function public.items_set_path()
+returns trigger
+language plpgsql
+as $$
+declare
+    v_parent_path text;
+begin
+    if tg_op = 'UPDATE' and new.parent_id is not distinct from old.parent_id then
+        -- Only items_move_subtree (a nested trigger) may rewrite a path directly
+        if pg_trigger_depth() < 2 then
+            new.path := old.path;
+        end if;
+        return new;
+    end if;
+
+    -- Held until commit; the queries that follow (and items_move_subtree) then
+    -- see every insert and move committed before it. A new root needs no lock.
+    if tg_op = 'UPDATE' or new.parent_id is not null then
+        perform pg_advisory_xact_lock(hashtext('public.items'), hashtext(new.user_id::text));
+    end if;
+
+    if new.parent_id is null then
+        new.path := '/' || new.id || '/';
+        return new;
+    end if;
+
+    select path into v_parent_path
+      from public.items
+     where id = new.parent_id
+       and user_id = new.user_id;
+
+    if v_parent_path is null then
+        raise exception 'Parent folder not found';
+    end if;
+
+    -- The parent's path contains the item itself when it is the item or one of its descendants
+    if tg_op = 'UPDATE' and v_parent_path like old.path || '%' then
+        raise exception 'Cannot move an item into its own subtree';
+    end if;
+
+    new.path := v_parent_path || new.id || '/';
+    return new;
+end;
+$$;
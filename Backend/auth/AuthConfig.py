@@ -1,4 +1,6 @@
 from Classes.DataConfig import DataConfig
+from auth.TokenVerifier import TokenVerifier, UnknownKeyError
+from auth.TokenCache import TokenCache
 from supabase import Client
 from functools import wraps
 from flask import request, jsonify
@@ -105,7 +107,7 @@ class Auth:
             return {"error": f"Failed to fetch user data: {str(e)}"}
 
     @staticmethod
-    def logout():
+    def logout(access_token: str = None):
         """Logs out the user and ends the session."""
         client: Client = DataConfig.get_client()
         
@@ -116,6 +118,10 @@ class Auth:
             if hasattr(response, 'error') and response.error:
                 return {"error": str(response.error)}
                 
+            # Stop serving the token from the cache or accepting it locally
+            if access_token:
+                TokenCache.get_instance().revoke(access_token, TokenVerifier.read_expiry(access_token))
+                
             return {"success": "User logged out successfully."}
         except Exception as e:
             return {"error": f"Logout failed: {str(e)}"}
@@ -138,8 +144,34 @@ class Auth:
         return {"success": "User deleted successfully."}
         
     @staticmethod
-    def verify_token(token: str):
-        """Verifies a JWT token and returns the user information if valid."""
+    def verify_token(token: str, remote: bool = False):
+        """
+        Verifies a JWT token and returns the user information if valid.
+
+        Tokens are checked in-process unless local verification is disabled or
+        remote is True; the Supabase round trip is only made for keys we cannot
+        check locally.
+        """
+        cache = TokenCache.get_instance()
+        if cache.is_revoked(token):
+            return None
+
+        if not remote:
+            user = cache.get(token)
+            if user is not None:
+                return user
+
+        token_exp = TokenVerifier.read_expiry(token)
+
+        if not remote and TokenVerifier.is_enabled():
+            try:
+                user = TokenVerifier.verify(token)
+                if user:
+                    cache.put(token, user, token_exp)
+                return user
+            except UnknownKeyError:
+                pass  # Fall back to the remote lookup
+
         client: Client = DataConfig.get_client()
         
         try:
@@ -148,12 +180,13 @@ class Auth:
             if not response.user:
                 return None
                 
+            cache.put(token, response.user, token_exp)
             return response.user
         except Exception:
             return None
             
     @staticmethod
-    def refresh_token(refresh_token: str):
+    def refresh_token(refresh_token: str, access_token: str = None):
         """Refreshes an access token using a refresh token."""
         client: Client = DataConfig.get_client()
         
@@ -162,6 +195,10 @@ class Auth:
             if not response.session:
                 return {"error": "Failed to refresh token"}
                 
+            # The old access token is superseded by the new session
+            if access_token:
+                TokenCache.get_instance().invalidate(access_token)
+                
             return {
                 "access_token": response.session.access_token,
                 "refresh_token": response.session.refresh_token
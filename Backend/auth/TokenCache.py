@@ -0,0 +1,214 @@
+from dotenv import load_dotenv
+from Classes.SharedState import SharedState
+from collections import OrderedDict
+import hashlib
+import os
+import sys
+import threading
+import time
+
+# Load environment variables
+load_dotenv()
+
+
+class TokenCache:
+    """
+    Bounded LRU + TTL cache of verified access tokens.
+
+    Entries are keyed by a SHA-256 digest of the bearer token so raw tokens are
+    never kept in memory, and never outlive the token's own expiry. Tokens that
+    were logged out are remembered until they expire so they cannot be served
+    from the cache or re-verified locally. With SharedState enabled, logouts
+    are also recorded there so every worker process rejects the token;
+    otherwise a logout only takes effect in the process that handled it.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    # Rough per-entry bookkeeping cost (OrderedDict node, tuple, digest key)
+    _ENTRY_OVERHEAD = 200
+
+    def __init__(self, max_bytes: int = None, ttl: int = None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("TOKEN_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+        self.ttl = ttl if ttl is not None else int(os.getenv("TOKEN_CACHE_TTL", "300"))
+
+        self._entries = OrderedDict()  # digest -> (user, expires_at, size)
+        self._revoked = {}  # digest -> token expiry
+        self._size = 0
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def get_instance(cls):
+        """Initialize or retrieve the process-wide token cache."""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def _connect(self):
+        connection = SharedState.connect()
+        if not self._schema_ready:
+            connection.execute(
+                "create table if not exists revoked_tokens ("
+                " digest blob primary key, expires_at real not null)"
+            )
+            self._schema_ready = True
+        return connection
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    @staticmethod
+    def _estimate_size(user) -> int:
+        """Shallow estimate of the memory held by a cached user object."""
+        size = sys.getsizeof(user)
+        for value in getattr(user, "__dict__", {}).values():
+            size += sys.getsizeof(value)
+            if isinstance(value, dict):
+                size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+        return size
+
+    def get(self, token: str):
+        """Return the cached user for a token, or None on a miss."""
+        digest = self._digest(token)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            user, expires_at, size = entry
+            if expires_at <= now:
+                self._remove(digest)
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return user
+
+    def put(self, token: str, user, token_exp: float = None):
+        """Cache a verified user until the TTL or the token's expiry, whichever comes first."""
+        digest = self._digest(token)
+        now = time.time()
+        expires_at = now + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        if expires_at <= now:
+            return
+
+        size = self._ENTRY_OVERHEAD + self._estimate_size(user)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if digest in self._revoked:
+                return
+            if digest in self._entries:
+                self._remove(digest)
+
+            self._entries[digest] = (user, expires_at, size)
+            self._size += size
+            self._evict(now)
+
+    def revoke(self, token: str, token_exp: float = None):
+        """Drop a token from the cache and reject it until it expires."""
+        digest = self._digest(token)
+        now = time.time()
+
+        with self._lock:
+            if digest in self._entries:
+                self._remove(digest)
+                self.evictions += 1
+
+            if token_exp is not None and token_exp > now:
+                if digest not in self._revoked:
+                    self._size += self._ENTRY_OVERHEAD
+                self._revoked[digest] = token_exp
+                self._evict(now)
+
+        if SharedState.is_enabled() and token_exp is not None and token_exp > now:
+            connection = self._connect()
+            connection.execute("delete from revoked_tokens where expires_at <= ?", (now,))
+            connection.execute(
+                "insert or replace into revoked_tokens (digest, expires_at) values (?, ?)",
+                (digest, token_exp)
+            )
+
+    def invalidate(self, token: str):
+        """Drop a token from the cache without rejecting it afterwards."""
+        digest = self._digest(token)
+        with self._lock:
+            if digest in self._entries:
+                self._remove(digest)
+                self.evictions += 1
+
+    def is_revoked(self, token: str) -> bool:
+        """Check whether a token was logged out and has not expired yet."""
+        digest = self._digest(token)
+        now = time.time()
+
+        with self._lock:
+            exp = self._revoked.get(digest)
+            if exp is not None:
+                if exp > now:
+                    return True
+                del self._revoked[digest]
+                self._size -= self._ENTRY_OVERHEAD
+
+        if not SharedState.is_enabled():
+            return False
+
+        # Logged out through another worker process
+        row = self._connect().execute(
+            "select 1 from revoked_tokens where digest = ? and expires_at > ?",
+            (digest, now)
+        ).fetchone()
+        if row is None:
+            return False
+
+        self.invalidate(token)
+        return True
+
+    def stats(self) -> dict:
+        """Return cache counters and current memory usage."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "revoked": len(self._revoked),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes
+            }
+
+    def _remove(self, digest: bytes):
+        _, _, size = self._entries.pop(digest)
+        self._size -= size
+
+    def _evict(self, now: float):
+        """Drop expired revocations, then least recently used entries, until under budget."""
+        if self._size <= self.max_bytes:
+            return
+
+        for digest, exp in list(self._revoked.items()):
+            if exp <= now:
+                del self._revoked[digest]
+                self._size -= self._ENTRY_OVERHEAD
+
+        while self._size > self.max_bytes and self._entries:
+            digest = next(iter(self._entries))
+            self._remove(digest)
+            self.evictions += 1
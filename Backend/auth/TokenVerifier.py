@@ -0,0 +1,198 @@
+from dotenv import load_dotenv
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+import urllib.request
+
+# Load environment variables
+load_dotenv()
+
+
+class TokenUser:
+    """User object built from verified JWT claims, shaped like the Supabase auth user."""
+
+    def __init__(self, claims: dict):
+        self.id = claims.get("sub")
+        self.email = claims.get("email")
+        self.phone = claims.get("phone")
+        self.role = claims.get("role")
+        self.aud = claims.get("aud")
+        self.user_metadata = claims.get("user_metadata") or {}
+        self.app_metadata = claims.get("app_metadata") or {}
+        self.session_id = claims.get("session_id")
+        # Not part of the access token claims; only the remote lookup knows it
+        self.created_at = None
+        self.exp = claims.get("exp")
+
+
+class UnknownKeyError(Exception):
+    """Raised when a token is signed with a key or algorithm we cannot check locally."""
+
+
+class TokenVerifier:
+    """
+    Verifies Supabase access tokens in-process.
+
+    HS256 tokens are checked against SUPABASE_JWT_SECRET, RS256 tokens against the
+    project's JWKS (fetched from SUPABASE_JWKS_URL or the default auth endpoint and
+    cached for SUPABASE_JWKS_TTL seconds).
+    """
+
+    _jwks: dict = None  # kid -> jwk
+    _jwks_fetched_at: float = 0.0
+    _jwks_lock = threading.Lock()
+
+    # DER prefix of the DigestInfo structure for SHA-256 (RFC 8017, section 9.2)
+    _SHA256_DIGEST_INFO = bytes.fromhex("3031300d060960864801650304020105000420")
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """Local verification is on unless AUTH_VERIFY_MODE is set to 'remote'."""
+        return os.getenv("AUTH_VERIFY_MODE", "local").lower() != "remote"
+
+    @staticmethod
+    def _b64decode(segment: str) -> bytes:
+        return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+    @classmethod
+    def read_expiry(cls, token: str):
+        """Read the exp claim without checking the signature (only for cache bookkeeping)."""
+        try:
+            exp = json.loads(cls._b64decode(token.split(".")[1])).get("exp")
+        except (ValueError, TypeError, IndexError, AttributeError):
+            return None
+        return exp if isinstance(exp, (int, float)) else None
+
+    @classmethod
+    def verify(cls, token: str):
+        """
+        Verify the signature and standard claims of a token.
+
+        Returns:
+            TokenUser: The user described by the token, or None if the token is invalid
+
+        Raises:
+            UnknownKeyError: If the token cannot be checked locally and the caller
+                should fall back to the remote lookup
+        """
+        try:
+            header_b64, payload_b64, signature_b64 = token.split(".")
+            header = json.loads(cls._b64decode(header_b64))
+            claims = json.loads(cls._b64decode(payload_b64))
+            signature = cls._b64decode(signature_b64)
+            signing_input = f"{header_b64}.{payload_b64}".encode("ascii")
+        except (ValueError, TypeError, AttributeError):
+            return None
+
+        # Valid JSON is not necessarily an object, e.g. a forged "[]" payload
+        if not isinstance(header, dict) or not isinstance(claims, dict):
+            return None
+
+        alg = header.get("alg")
+
+        if alg == "HS256":
+            secret = os.getenv("SUPABASE_JWT_SECRET")
+            if not secret:
+                raise UnknownKeyError("No JWT secret configured")
+            expected = hmac.new(secret.encode("utf-8"), signing_input, hashlib.sha256).digest()
+            if not hmac.compare_digest(expected, signature):
+                return None
+        elif alg == "RS256":
+            if not isinstance(header.get("kid"), str):
+                return None
+            jwk = cls._get_jwk(header.get("kid"))
+            if jwk is None:
+                raise UnknownKeyError(f"Unknown key id '{header.get('kid')}'")
+            if not cls._verify_rs256(jwk, signing_input, signature):
+                return None
+        else:
+            raise UnknownKeyError(f"Unsupported algorithm '{alg}'")
+
+        if not cls._claims_valid(claims):
+            return None
+
+        return TokenUser(claims)
+
+    @staticmethod
+    def _claims_valid(claims: dict) -> bool:
+        """Check expiry, not-before and audience."""
+        now = time.time()
+        leeway = int(os.getenv("AUTH_CLOCK_LEEWAY", "30"))
+
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)) or exp + leeway < now:
+            return False
+
+        nbf = claims.get("nbf")
+        if isinstance(nbf, (int, float)) and nbf - leeway > now:
+            return False
+
+        audience = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+        aud = claims.get("aud")
+        audiences = aud if isinstance(aud, list) else [aud]
+        if audience not in audiences:
+            return False
+
+        sub = claims.get("sub")
+        return isinstance(sub, str) and bool(sub)
+
+    @classmethod
+    def _get_jwk(cls, kid):
+        """Look up a signing key, refreshing the JWKS when the key id is unknown or stale."""
+        ttl = int(os.getenv("SUPABASE_JWKS_TTL", "600"))
+        # Do not hammer the JWKS endpoint with tokens carrying bogus key ids
+        min_refresh_interval = 30
+
+        with cls._jwks_lock:
+            age = time.time() - cls._jwks_fetched_at
+            stale = cls._jwks is None or age > ttl
+            unknown = cls._jwks is not None and kid not in cls._jwks
+
+            if stale or (unknown and age > min_refresh_interval):
+                try:
+                    cls._jwks = cls._fetch_jwks()
+                except Exception as e:
+                    print(f"Error fetching JWKS: {str(e)}")
+                    if cls._jwks is None:
+                        cls._jwks = {}
+                cls._jwks_fetched_at = time.time()
+
+            return cls._jwks.get(kid)
+
+    @staticmethod
+    def _fetch_jwks() -> dict:
+        url = os.getenv("SUPABASE_JWKS_URL")
+        if not url:
+            base_url = os.getenv("SUPABASE_URL")
+            if not base_url:
+                raise Exception("Supabase configuration missing")
+            url = f"{base_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+
+        with urllib.request.urlopen(url, timeout=5) as response:
+            keys = json.loads(response.read()).get("keys", [])
+
+        return {key.get("kid"): key for key in keys if key.get("kty") == "RSA"}
+
+    @classmethod
+    def _verify_rs256(cls, jwk: dict, signing_input: bytes, signature: bytes) -> bool:
+        """RSASSA-PKCS1-v1_5 signature check with SHA-256."""
+        n = int.from_bytes(cls._b64decode(jwk["n"]), "big")
+        e = int.from_bytes(cls._b64decode(jwk["e"]), "big")
+        key_length = (n.bit_length() + 7) // 8
+
+        if len(signature) != key_length:
+            return False
+
+        decrypted = pow(int.from_bytes(signature, "big"), e, n).to_bytes(key_length, "big")
+
+        digest_info = cls._SHA256_DIGEST_INFO + hashlib.sha256(signing_input).digest()
+        padding_length = key_length - len(digest_info) - 3
+        if padding_length < 8:
+            return False
+        expected = b"\x00\x01" + b"\xff" * padding_length + b"\x00" + digest_info
+
+        return hmac.compare_digest(decrypted, expected)
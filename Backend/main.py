@@ -1,17 +1,29 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 from Classes.Tasks import TaskManager
-from Classes.Scripts import ScriptsManager
+from Classes.Scripts import ScriptsManager, ScriptConflictError
 from Classes.Items import ItemsManager
 from Classes.Projects import ProjectManager
 from Classes.ActivityModule import ActivityTracker
+from Classes.ActivityWriter import ActivityWriter
 from Classes.Events import EventManager
 from Classes.Canvas import CanvasManager
+from Classes.DataConfig import DataConfig
+from Classes.Pagination import Pagination
+from Classes.CollectionVersions import CollectionVersions
+from Classes.Dashboard import DashboardManager
+from Classes.Sync import SyncManager
+from Classes.ChangeFeed import ChangeFeed
+from Classes.SearchIndex import SearchIndex
 from auth.AuthConfig import Auth
+from auth.TokenVerifier import TokenVerifier
 
 app = Flask(__name__)
 CORS(app)
 
+# Return the database sessions borrowed by each request to the pool
+app.teardown_appcontext(DataConfig.release_request_clients)
+
 # Initializing The Manager Classes 
 task_manager = TaskManager()
 script_manager = ScriptsManager()
@@ -21,6 +33,13 @@ auth_manager = Auth()
 activity_tracker = ActivityTracker()
 event_manager = EventManager()
 canvas_manager = CanvasManager()
+dashboard_manager = DashboardManager(task_manager, activity_tracker, event_manager, project_manager)
+sync_manager = SyncManager()
+change_feed = ChangeFeed.get_instance()
+search_index = SearchIndex.get_instance()
+
+# Replay activity records spooled before the last shutdown
+ActivityWriter.get_instance().start()
 
 # Token refresh endpoint
 @app.route('/api/auth/refresh', methods=['POST'])
@@ -30,7 +49,13 @@ def refresh_token():
         if not data or not data.get('refresh_token'):
             return jsonify({"error": "Refresh token is required"}), 400
             
-        result = auth_manager.refresh_token(data.get('refresh_token'))
+        # The superseded access token is optional; it is only used to evict it from the cache
+        access_token = None
+        auth_header = request.headers.get('Authorization')
+        if auth_header and auth_header.startswith('Bearer '):
+            access_token = auth_header.split(' ')[1]
+            
+        result = auth_manager.refresh_token(data.get('refresh_token'), access_token)
         
         if "error" in result:
             return jsonify(result), 401
@@ -63,10 +88,62 @@ def add_task():
 
 @app.route('/api/tasks', methods=['GET'])
 @Auth.auth_required
+@CollectionVersions.conditional('tasks')
 def get_tasks():
     try:
-        tasks = task_manager.fetch_tasks(user_id=request.user.id)
+        fields = request.args.get('fields')
+        filters = {
+            "status": request.args.get('status'),
+            "priority": request.args.get('priority'),
+            "search": request.args.get('q'),
+            "sort": request.args.get('sort'),
+            "order": request.args.get('order'),
+            "fields": fields.split(',') if fields else None
+        }
+        
+        # A page size or cursor switches to keyset pagination
+        if 'limit' in request.args or 'cursor' in request.args:
+            page = task_manager.fetch_task_page(
+                user_id=request.user.id,
+                limit=request.args.get('limit', type=int),
+                cursor=request.args.get('cursor'),
+                **filters
+            )
+            return jsonify(page), 200
+            
+        tasks = task_manager.fetch_tasks(user_id=request.user.id, **filters)
         return jsonify(tasks), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/tasks/stats', methods=['GET'])
+@Auth.auth_required
+@CollectionVersions.conditional('tasks', variant=lambda: TaskManager.stats_period(request.args.get('bucket', 'day')))
+def get_task_stats():
+    try:
+        stats = task_manager.fetch_task_stats(
+            user_id=request.user.id,
+            bucket=request.args.get('bucket', 'day'),
+            periods=request.args.get('periods', default=30, type=int)
+        )
+        return jsonify(stats), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/tasks/batch', methods=['POST'])
+@Auth.auth_required
+def batch_tasks():
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('operations'), list):
+            return jsonify({"error": "A list of operations is required"}), 400
+            
+        results = task_manager.apply_batch(data['operations'], user_id=request.user.id)
+        return jsonify({"results": results}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -149,13 +226,31 @@ def add_script():
 
 @app.route('/api/scripts', methods=['GET'])
 @Auth.auth_required
+@CollectionVersions.conditional('scripts')
 def get_scripts():
     try:
-        scripts = script_manager.fetch_scripts(user_id=request.user.id)
+        scripts = script_manager.fetch_scripts(
+            user_id=request.user.id,
+            view=request.args.get('view')
+        )
         return jsonify(scripts), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/scripts/<int:script_id>', methods=['GET'])
+@Auth.auth_required
+@CollectionVersions.conditional('scripts')
+def get_script(script_id):
+    try:
+        script = script_manager.get_script(script_id, user_id=request.user.id)
+        
+        if not script:
+            return jsonify({"error": "Script not found"}), 404
+            
+        return jsonify(script), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/scripts/<int:script_id>', methods=['DELETE'])
 @Auth.auth_required
 def delete_script(script_id):
@@ -174,25 +269,20 @@ def update_script_language(script_id):
         if not data or 'language' not in data:
             return jsonify({"error": "Language is required"}), 400
         
-        # Get the current script
-        scripts = script_manager.fetch_scripts(user_id=request.user.id)
-        script = next((s for s in scripts if s['id'] == script_id), None)
-        
-        if not script:
-            return jsonify({"error": "Script not found"}), 404
-            
-        # Update the script with the new language
+        # Only the language is written; the other fields are left as they are
         updated_script = script_manager.edit_script(
             script_id=script_id,
-            title=script['title'],
-            description=script['description'],
-            code=script['code'],
+            title=None,
+            description=None,
+            code=None,
             language=data['language'],
             user_id=request.user.id
         )
         
         return jsonify(updated_script), 200
     except Exception as e:
+        if "Script not found" in str(e):
+            return jsonify({"error": "Script not found"}), 404
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/scripts/<int:script_id>/code', methods=['PUT'])
@@ -203,19 +293,80 @@ def update_script_code(script_id):
         if not data or 'code' not in data:
             return jsonify({"error": "Code is required"}), 400
             
+        # With a base_hash the code is only replaced if nobody changed it since
         script = script_manager.edit_script(
             script_id=script_id,
             title=None,
             description=None,
             code=data['code'],
             language=None,
-            user_id=request.user.id
+            user_id=request.user.id,
+            base_hash=data.get('base_hash')
         )
         return jsonify(script), 200
+    except ScriptConflictError as e:
+        return jsonify({"error": str(e), "code_hash": e.code_hash}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-   
+@app.route('/api/scripts/<int:script_id>/code', methods=['PATCH'])
+@Auth.auth_required
+def patch_script_code(script_id):
+    try:
+        data = request.get_json()
+        if not data or not data.get('base_hash') or not isinstance(data.get('ops'), list):
+            return jsonify({"error": "A base hash and a list of edit operations are required"}), 400
+            
+        script = script_manager.edit_script(
+            script_id=script_id,
+            title=None,
+            description=None,
+            code=None,
+            language=None,
+            user_id=request.user.id,
+            base_hash=data['base_hash'],
+            ops=data['ops']
+        )
+        
+        # The client already has the code it patched, so only the new version is returned
+        return jsonify({
+            "id": script['id'],
+            "code_hash": script['code_hash'],
+            "size": script['code_size'],
+            "updated_at": script['updated_at']
+        }), 200
+    except ScriptConflictError as e:
+        return jsonify({"error": str(e), "code_hash": e.code_hash}), 409
+    except Exception as e:
+        if "Script not found" in str(e):
+            return jsonify({"error": "Script not found"}), 404
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/scripts/<int:script_id>/versions', methods=['GET'])
+@Auth.auth_required
+@CollectionVersions.conditional('scripts')
+def get_script_versions(script_id):
+    try:
+        versions = script_manager.fetch_versions(script_id, user_id=request.user.id)
+        return jsonify(versions), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/scripts/<int:script_id>/versions/<int:version>', methods=['GET'])
+@Auth.auth_required
+@CollectionVersions.conditional('scripts')
+def get_script_version(script_id, version):
+    try:
+        script_version = script_manager.get_version(script_id, version, user_id=request.user.id)
+
+        if not script_version:
+            return jsonify({"error": "Version not found"}), 404
+
+        return jsonify(script_version), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 # Items operations routes
 @app.route('/api/items/folder', methods=['POST'])
 @Auth.auth_required
@@ -225,12 +376,6 @@ def create_folder():
         if not data or not data.get('name'):
             return jsonify({"error": "Folder name is required"}), 400
 
-        # Get auth token from request header
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            items_manager.set_auth_token(token)
-
         folder = items_manager.create_folder(
             name=data.get('name'),
             parent_id=data.get('parent_id'),
@@ -248,12 +393,6 @@ def create_file():
         if not data or not data.get('name') or not data.get('file_url'):
             return jsonify({"error": "File name and URL are required"}), 400
 
-        # Get auth token from request header
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            items_manager.set_auth_token(token)
-
         file = items_manager.create_file(
             name=data.get('name'),
             file_type=data.get('file_type', 'Other'),
@@ -268,21 +407,62 @@ def create_file():
 
 @app.route('/api/items', methods=['GET'])
 @Auth.auth_required
+@CollectionVersions.conditional('items', 'canvas')
 def get_items():
     try:
         parent_id = request.args.get('parent_id')
-
-        # Get auth token from request header
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            items_manager.set_auth_token(token)
+        sort = request.args.get('sort')
+        order = request.args.get('order')
+
+        # A page size or cursor switches to keyset pagination
+        if 'limit' in request.args or 'cursor' in request.args:
+            page = items_manager.fetch_item_page(
+                user_id=request.user.id,
+                parent_id=parent_id,
+                sort=sort,
+                order=order,
+                limit=request.args.get('limit', type=int),
+                cursor=request.args.get('cursor')
+            )
+            return jsonify(page), 200
 
         items = items_manager.fetch_items(
             user_id=request.user.id,
-            parent_id=parent_id
+            parent_id=parent_id,
+            sort=sort,
+            order=order
         )
         return jsonify(items), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/items/tree', methods=['GET'])
+@Auth.auth_required
+def get_items_tree():
+    try:
+        fields = request.args.get('fields')
+        lines = items_manager.stream_tree(
+            user_id=request.user.id,
+            max_depth=request.args.get('max_depth', type=int),
+            fields=fields.split(',') if fields else None
+        )
+        # Keeps the request's database session until the last line is sent
+        response = Response(stream_with_context(lines), mimetype='application/x-ndjson')
+        # Not validated with an ETag: a stream that fails midway ends in an error line
+        # after the 200 is sent, and such a truncated tree must not be kept
+        response.headers['Cache-Control'] = 'no-store'
+        return response, 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/items/aggregates/repair', methods=['POST'])
+@Auth.auth_required
+def repair_item_aggregates():
+    try:
+        repaired = items_manager.repair_aggregates(user_id=request.user.id)
+        return jsonify({"repaired": repaired}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -290,12 +470,6 @@ def get_items():
 @Auth.auth_required
 def delete_item(item_id):
     try:
-        # Get auth token from request header
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            items_manager.set_auth_token(token)
-
         result = items_manager.delete_item(item_id, user_id=request.user.id)
         return jsonify(result), 200
     except Exception as e:
@@ -309,18 +483,34 @@ def move_item(item_id):
         if not data or 'parent_id' not in data:
             return jsonify({"error": "Parent ID is required"}), 400
 
-        # Get auth token from request header
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            items_manager.set_auth_token(token)
-
         item = items_manager.move_item(
             item_id=item_id,
             new_parent_id=data['parent_id'],
             user_id=request.user.id
         )
         return jsonify(item), 200
+    except Exception as e:
+        if "own subtree" in str(e) or "Parent folder not found" in str(e):
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/items/<item_id>/ancestors', methods=['GET'])
+@Auth.auth_required
+@CollectionVersions.conditional('items')
+def get_item_ancestors(item_id):
+    try:
+        items = items_manager.fetch_ancestors(item_id, user_id=request.user.id)
+        return jsonify(items), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/items/<item_id>/descendants', methods=['GET'])
+@Auth.auth_required
+@CollectionVersions.conditional('items')
+def get_item_descendants(item_id):
+    try:
+        items = items_manager.fetch_descendants(item_id, user_id=request.user.id)
+        return jsonify(items), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -332,12 +522,6 @@ def rename_item(item_id):
         if not data or 'name' not in data:
             return jsonify({"error": "New name is required"}), 400
 
-        # Get auth token from request header
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            items_manager.set_auth_token(token)
-
         item = items_manager.rename_item(
             item_id=item_id,
             new_name=data['name'],
@@ -372,6 +556,7 @@ def create_project():
 
 @app.route('/api/projects', methods=['GET'])
 @Auth.auth_required
+@CollectionVersions.conditional('projects')
 def get_projects():
     try:
         projects = project_manager.fetch_projects(user_id=request.user.id)
@@ -459,7 +644,8 @@ def login_user():
 def logout_user():
     try:
         # Call the logout method from Auth class
-        result = auth_manager.logout()
+        token = request.headers.get('Authorization').split(' ')[1]
+        result = auth_manager.logout(token)
         
         if "error" in result:
             return jsonify(result), 400
@@ -475,6 +661,11 @@ def get_user():
         # Use the user object that was added to the request by the auth_required decorator
         user = request.user
         
+        # Locally verified tokens do not carry the account creation date
+        if user.created_at is None:
+            token = request.headers.get('Authorization').split(' ')[1]
+            user = auth_manager.verify_token(token, remote=True) or user
+        
         # Format the user data to return to the client
         user_data = {
             "id": user.id,
@@ -487,6 +678,79 @@ def get_user():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Search route
+@app.route('/api/search', methods=['GET'])
+@Auth.auth_required
+@CollectionVersions.conditional('tasks', 'scripts', 'projects', 'items', 'canvas')
+def search():
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({"error": "Search query is required"}), 400
+            
+        types = request.args.get('types')
+        results = search_index.search(
+            user_id=request.user.id,
+            query=query,
+            collections=types.split(',') if types else None,
+            limit=Pagination.clamp_limit(request.args.get('limit', type=int))
+        )
+        return jsonify({"results": results}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Delta sync route
+@app.route('/api/sync', methods=['GET'])
+@Auth.auth_required
+def sync_changes():
+    try:
+        # Without a cursor every row is returned, to seed an empty client
+        changes = sync_manager.fetch_changes(
+            user_id=request.user.id,
+            cursor=request.args.get('since'),
+            limit=request.args.get('limit', type=int)
+        )
+        return jsonify(changes), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Change stream route
+@app.route('/api/stream', methods=['GET'])
+@Auth.auth_required
+def stream_changes():
+    try:
+        subscription = change_feed.subscribe(request.user.id)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 429
+        
+    # The stream ends when the token expires, so the client reconnects with a fresh one
+    expires_at = TokenVerifier.read_expiry(DataConfig.get_request_token())
+    response = Response(
+        change_feed.stream(subscription, expires_at=expires_at),
+        mimetype='text/event-stream'
+    )
+    # The stream may be closed before it is ever iterated
+    response.call_on_close(lambda: change_feed.unsubscribe(subscription))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Dashboard route
+@app.route('/api/dashboard', methods=['GET'])
+@Auth.auth_required
+def get_dashboard():
+    try:
+        # The user was verified once by auth_required; the queries then run concurrently
+        dashboard = dashboard_manager.get_dashboard(
+            user_id=request.user.id,
+            auth_token=DataConfig.get_request_token()
+        )
+        return jsonify(dashboard), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # Activities operations routes
 @app.route('/api/activities', methods=['GET'])
 @Auth.auth_required
@@ -494,6 +758,8 @@ def get_activities():
     try:
         # Get query parameters
         limit = request.args.get('limit', default=10, type=int)
+        activity_type = request.args.get('activity_type')
+        related_item_type = request.args.get('related_item_type')
         
         # Get auth token from request headers
         auth_header = request.headers.get('Authorization')
@@ -501,10 +767,28 @@ def get_activities():
         if auth_header and auth_header.startswith('Bearer '):
             auth_token = auth_header.split(' ')[1]
         
+        # Passing a cursor (empty for the first page) switches to the paginated feed
+        if 'cursor' in request.args:
+            page = activity_tracker.get_activity_page(
+                auth_token,
+                limit=limit,
+                cursor=request.args.get('cursor'),
+                activity_type=activity_type,
+                related_item_type=related_item_type
+            )
+            return jsonify(page), 200
+        
         # Fetch activities for the authenticated user
-        activities = activity_tracker.get_auth_activities(auth_token, limit=limit)
+        activities = activity_tracker.get_auth_activities(
+            auth_token,
+            limit=limit,
+            activity_type=activity_type,
+            related_item_type=related_item_type
+        )
         
         return jsonify(activities), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -564,6 +848,7 @@ def create_event():
 
 @app.route('/api/events', methods=['GET'])
 @Auth.auth_required
+@CollectionVersions.conditional('events')
 def get_events():
     try:
         # Get optional date range filters from query parameters
@@ -652,9 +937,6 @@ def save_canvas():
         if not data or not data.get('name') or not data.get('content'):
             return jsonify({"error": "Name and content are required"}), 400
             
-        # Set auth token for RLS
-        canvas_manager.set_auth_token(request.headers.get('Authorization').split(' ')[1])
-        
         canvas = canvas_manager.save_canvas(
             name=data.get('name'),
             content=data.get('content'),
@@ -668,11 +950,9 @@ def save_canvas():
 
 @app.route('/api/canvas', methods=['GET'])
 @Auth.auth_required
+@CollectionVersions.conditional('canvas')
 def get_all_canvas():
     try:
-        # Set auth token for RLS
-        canvas_manager.set_auth_token(request.headers.get('Authorization').split(' ')[1])
-        
         canvases = canvas_manager.fetch_all_canvas(user_id=request.user.id)
         return jsonify(canvases), 200
     except Exception as e:
@@ -682,9 +962,6 @@ def get_all_canvas():
 @Auth.auth_required
 def get_canvas(canvas_id):
     try:
-        # Set auth token for RLS
-        canvas_manager.set_auth_token(request.headers.get('Authorization').split(' ')[1])
-        
         canvas = canvas_manager.fetch_canvas(canvas_id=canvas_id, user_id=request.user.id)
         return jsonify(canvas), 200
     except Exception as e:
@@ -698,9 +975,6 @@ def update_canvas(canvas_id):
         if not data:
             return jsonify({"error": "No data provided"}), 400
             
-        # Set auth token for RLS
-        canvas_manager.set_auth_token(request.headers.get('Authorization').split(' ')[1])
-        
         canvas = canvas_manager.update_canvas(
             canvas_id=canvas_id,
             updates=data,
@@ -715,9 +989,6 @@ def update_canvas(canvas_id):
 @Auth.auth_required
 def delete_canvas(canvas_id):
     try:
-        # Set auth token for RLS
-        canvas_manager.set_auth_token(request.headers.get('Authorization').split(' ')[1])
-        
         result = canvas_manager.delete_canvas(canvas_id=canvas_id, user_id=request.user.id)
         return jsonify(result), 200
     except Exception as e:
@@ -0,0 +1,21 @@
+import threading
+
+import pytest
+
+from Classes.CollectionVersions import CollectionVersions
+from Classes.SharedState import SharedState
+
+
+@pytest.fixture
+def shared_state(tmp_path, monkeypatch):
+    """Enable SharedState with a fresh file for one test."""
+    monkeypatch.setenv("SHARED_STATE_PATH", str(tmp_path / "shared.db"))
+    # Connections are kept per thread and schemas created once; start over for this file
+    monkeypatch.setattr(SharedState, "_local", threading.local())
+    monkeypatch.setattr(CollectionVersions, "_schema_ready", False)
+    monkeypatch.setattr(CollectionVersions, "_shared_epoch", None)
+
+
+@pytest.fixture
+def no_shared_state(monkeypatch):
+    monkeypatch.delenv("SHARED_STATE_PATH", raising=False)
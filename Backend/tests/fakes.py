@@ -0,0 +1,111 @@
+import itertools
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """The subset of the PostgREST query builder used by the managers, over in-memory rows."""
+
+    def __init__(self, database, table):
+        self.database = database
+        self.table = table
+        self.mode = "select"
+        self.payload = None
+        self.filters = []
+        self.orders = []
+        self.row_limit = None
+
+    def select(self, *columns, **options):
+        return self
+
+    def insert(self, payload):
+        self.mode, self.payload = "insert", payload
+        return self
+
+    def update(self, payload):
+        self.mode, self.payload = "update", payload
+        return self
+
+    def delete(self):
+        self.mode = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] <= value)
+        return self
+
+    def in_(self, column, values):
+        values = {str(value) for value in values}
+        self.filters.append(lambda row: str(row.get(column)) in values)
+        return self
+
+    def is_(self, column, value):
+        self.filters.append(lambda row: row.get(column) is None)
+        return self
+
+    def order(self, column, desc=False, nullsfirst=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def execute(self):
+        self.database.requests.append((self.table, self.mode))
+        rows = self.database.tables.setdefault(self.table, [])
+
+        if self.mode == "insert":
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            inserted = []
+            for row in payload:
+                row = dict(row)
+                row.setdefault("id", next(self.database.ids))
+                rows.append(row)
+                inserted.append(dict(row))
+            return FakeResponse(inserted)
+
+        matched = [row for row in rows if all(check(row) for check in self.filters)]
+        if self.mode == "update":
+            for row in matched:
+                row.update(self.payload)
+        elif self.mode == "delete":
+            for row in matched:
+                rows.remove(row)
+
+        for column, desc in reversed(self.orders):
+            matched.sort(key=lambda row: row[column], reverse=desc)
+        if self.row_limit is not None:
+            matched = matched[:self.row_limit]
+        return FakeResponse([dict(row) for row in matched])
+
+
+class FakeClient:
+    """Stands in for a Supabase client; every executed query is recorded in requests."""
+
+    def __init__(self, tables=None):
+        self.tables = tables or {}
+        self.ids = itertools.count(1000)
+        self.requests = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
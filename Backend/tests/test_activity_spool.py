@@ -0,0 +1,149 @@
+import os
+
+import pytest
+from postgrest.exceptions import APIError
+
+from Classes.ActivitySpool import ActivitySpool
+from Classes.ActivityWriter import ActivityWriter
+from Classes.DataConfig import DataConfig
+
+
+def records(count, start=0):
+    return [{"user_id": "user-1", "type": "test", "n": n} for n in range(start, start + count)]
+
+
+def test_pending_records_survive_reopening(tmp_path):
+    spool = ActivitySpool(str(tmp_path))
+    spool.append(records(3))
+    spool.close()
+
+    spool = ActivitySpool(str(tmp_path))
+    assert [record["n"] for record, _ in spool.read_pending(10)] == [0, 1, 2]
+
+
+def test_torn_write_is_truncated_on_open(tmp_path):
+    spool = ActivitySpool(str(tmp_path))
+    spool.append(records(2))
+    complete = os.path.getsize(spool.path)
+    path = spool.path
+    spool.close()
+
+    # A crash while appending leaves half a record behind
+    with open(path, "ab") as log:
+        log.write(b"\x00\x00\x00\x40\x12\x34")
+
+    spool = ActivitySpool(str(tmp_path))
+    assert os.path.getsize(path) == complete
+    assert [record["n"] for record, _ in spool.read_pending(10)] == [0, 1]
+
+    spool.append(records(1, start=2))
+    assert [record["n"] for record, _ in spool.read_pending(10)] == [0, 1, 2]
+
+
+def test_corrupt_record_ends_the_log(tmp_path):
+    spool = ActivitySpool(str(tmp_path))
+    spool.append(records(1))
+    first_end = os.path.getsize(spool.path)
+    spool.append(records(1, start=1))
+    path = spool.path
+    spool.close()
+
+    # Flip a payload byte of the second record so its CRC no longer matches
+    with open(path, "r+b") as log:
+        log.seek(first_end + 10)
+        byte = log.read(1)
+        log.seek(first_end + 10)
+        log.write(bytes([byte[0] ^ 0xFF]))
+
+    spool = ActivitySpool(str(tmp_path))
+    assert os.path.getsize(path) == first_end
+    assert [record["n"] for record, _ in spool.read_pending(10)] == [0]
+
+
+def test_commit_resumes_after_restart_and_truncates_when_drained(tmp_path):
+    spool = ActivitySpool(str(tmp_path))
+    spool.append(records(3))
+    pending = spool.read_pending(2)
+    spool.commit(pending[-1][1])
+    spool.close()
+
+    spool = ActivitySpool(str(tmp_path))
+    pending = spool.read_pending(10)
+    assert [record["n"] for record, _ in pending] == [2]
+
+    spool.commit(pending[-1][1])
+    assert not spool.has_pending()
+    assert spool.pending_bytes() == 0
+    assert os.path.getsize(spool.path) == 0
+
+
+def test_append_past_max_bytes_raises(tmp_path):
+    spool = ActivitySpool(str(tmp_path), max_bytes=100)
+    spool.append(records(1))
+    with pytest.raises(Exception, match="full"):
+        spool.append(records(5))
+    assert len(spool.read_pending(10)) == 1
+
+
+class FakeActivities:
+    """Insert endpoint that rejects records marked bad, or everything while down."""
+
+    def __init__(self):
+        self.rows = []
+        self.down = False
+        self._batch = None
+
+    def table(self, name):
+        return self
+
+    def insert(self, batch):
+        self._batch = batch
+        return self
+
+    def execute(self):
+        if self.down:
+            raise ConnectionError("connection refused")
+        if any(record.get("bad") for record in self._batch):
+            raise APIError({"code": "23502", "message": "null value violates not-null constraint"})
+        self.rows.extend(self._batch)
+
+
+@pytest.fixture
+def writer(tmp_path, monkeypatch):
+    database = FakeActivities()
+    monkeypatch.setattr(DataConfig, "get_client", classmethod(lambda cls: database))
+    writer = ActivityWriter(batch_size=8)
+    writer._spool = ActivitySpool(str(tmp_path))
+    writer.database = database
+    yield writer
+    writer._spool.close()
+
+
+def test_rejected_record_is_set_aside(writer):
+    batch = records(8)
+    batch[5]["bad"] = True
+    writer._spool.append(batch)
+
+    writer._drain()
+
+    assert [row["n"] for row in writer.database.rows] == [0, 1, 2, 3, 4, 6, 7]
+    assert writer.written == 7
+    assert writer.dropped == 1
+    assert not writer._spool.has_pending()
+    with open(writer._spool.path + ".rejected") as rejected:
+        assert '"n":5' in rejected.read()
+
+
+def test_outage_keeps_records_for_retry(writer):
+    writer._spool.append(records(3))
+    writer.database.down = True
+
+    writer._drain()
+
+    assert writer.failed_batches == 1
+    assert writer.dropped == 0
+    assert len(writer._spool.read_pending(10)) == 3
+
+    writer.database.down = False
+    writer._drain()
+    assert [row["n"] for row in writer.database.rows] == [0, 1, 2]
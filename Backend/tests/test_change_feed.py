@@ -0,0 +1,57 @@
+import json
+import time
+
+import pytest
+
+from Classes.ChangeFeed import ChangeFeed
+from Classes.CollectionVersions import CollectionVersions
+
+
+@pytest.fixture(autouse=True)
+def listeners(monkeypatch):
+    # Every ChangeFeed registers itself with CollectionVersions
+    monkeypatch.setattr(CollectionVersions, "_listeners", [])
+
+
+def event(frame):
+    lines = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+    return lines["event"], json.loads(lines["data"])
+
+
+def test_changes_are_streamed_to_the_users_subscriptions(no_shared_state):
+    feed = ChangeFeed()
+    subscription = feed.subscribe("user-1")
+    other = feed.subscribe("user-2")
+    stream = feed.stream(subscription, expires_at=time.time() + 5)
+
+    assert next(stream) == "retry: 5000\n\n"
+    name, ready = event(next(stream))
+    assert name == "ready"
+
+    feed.publish("user-1", "tasks", 7, "update", 3)
+    assert event(next(stream)) == ("change", {"collection": "tasks", "id": 3, "op": "update", "version": 7})
+    assert not other.changes
+
+    stream.close()
+    assert "user-1" not in feed._subscriptions
+
+
+def test_client_is_asked_to_poll_without_shared_state(no_shared_state, monkeypatch):
+    monkeypatch.setenv("STREAM_FALLBACK_POLL_SECONDS", "30")
+    feed = ChangeFeed()
+    stream = feed.stream(feed.subscribe("user-1"))
+    next(stream)
+    assert event(next(stream))[1]["poll"] == 30
+
+    monkeypatch.setenv("STREAM_FALLBACK_POLL_SECONDS", "0")
+    feed = ChangeFeed()
+    stream = feed.stream(feed.subscribe("user-1"))
+    next(stream)
+    assert event(next(stream))[1]["poll"] is None
+
+
+def test_shared_state_streams_need_no_polling(shared_state):
+    feed = ChangeFeed()
+    stream = feed.stream(feed.subscribe("user-1"))
+    next(stream)
+    assert event(next(stream))[1]["poll"] is None
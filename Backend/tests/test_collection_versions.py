@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask, request
+
+from Classes.CollectionVersions import CollectionVersions
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+
+    @app.before_request
+    def authenticate():
+        request.user = SimpleNamespace(id="user-1")
+
+    @app.route("/tasks")
+    @CollectionVersions.conditional("tasks")
+    def tasks():
+        return {"tasks": []}
+
+    @app.route("/tasks/stats")
+    @CollectionVersions.conditional("tasks", variant=lambda: app.config["TODAY"])
+    def task_stats():
+        return {"today": app.config["TODAY"]}
+
+    app.config["TODAY"] = "2026-10-18"
+    return app
+
+
+def test_unchanged_collection_is_not_modified(app, shared_state):
+    client = app.test_client()
+    response = client.get("/tasks")
+    etag = response.headers["ETag"]
+
+    assert response.status_code == 200
+    assert client.get("/tasks", headers={"If-None-Match": etag}).status_code == 304
+
+    CollectionVersions.bump("user-1", "tasks")
+    response = client.get("/tasks", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_view_always_runs_without_shared_state(app, no_shared_state):
+    client = app.test_client()
+    etag = CollectionVersions.etag("user-1", ("tasks",), "/tasks?")
+
+    response = client.get("/tasks", headers={"If-None-Match": f'W/"{etag}"'})
+
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+
+
+def test_variant_changes_the_etag(app, shared_state):
+    client = app.test_client()
+    etag = client.get("/tasks/stats").headers["ETag"]
+    assert client.get("/tasks/stats", headers={"If-None-Match": etag}).status_code == 304
+
+    # Past midnight the same counters describe a different window
+    app.config["TODAY"] = "2026-10-19"
+    response = client.get("/tasks/stats", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json() == {"today": "2026-10-19"}
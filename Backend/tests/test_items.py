@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from Classes.DataConfig import DataConfig
+from Classes.Items import ItemsManager
+from tests.fakes import FakeClient
+
+USER = "user-1"
+
+
+def item(item_id, path, **fields):
+    depth = path.count("/") - 2
+    return {"id": item_id, "name": f"item {item_id}", "type": "folder", "path": path,
+            "depth": depth, "user_id": USER, **fields}
+
+
+def canvas(canvas_id):
+    # A canvas row of the item_listing view (Database/013_item_listing.sql)
+    return {"id": f"canvas_{canvas_id}", "name": f"canvas {canvas_id}", "type": "file", "file_type": "canvas",
+            "path": None, "depth": 0, "canvas_id": canvas_id, "user_id": USER, "sort_id": canvas_id * 2 + 1}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("ACTIVITY_ASYNC", "0")
+    client = FakeClient()
+    monkeypatch.setattr(DataConfig, "get_client", classmethod(lambda cls: client))
+    monkeypatch.setattr(DataConfig, "get_request_client", classmethod(lambda cls: client))
+    return client
+
+
+def streamed(manager, **options):
+    return [json.loads(line) for line in manager.stream_tree(USER, **options)]
+
+
+@pytest.mark.parametrize("path, inside, outside", [
+    ("/4/", ["/4/", "/4/5/", "/4/5/60/", "/4/9999/"], ["/40/", "/41/5/", "/3/4/", "/5/"]),
+    ("/1/23/", ["/1/23/", "/1/23/4/"], ["/1/230/", "/1/24/", "/1/2/", "/1/"]),
+])
+def test_path_range_holds_exactly_the_subtree(path, inside, outside):
+    # Paths compare bytewise, as under the "C" collation of the path column
+    end = ItemsManager._path_end(path)
+    assert all(path <= other < end for other in inside)
+    assert not any(path <= other < end for other in outside)
+
+
+@pytest.mark.parametrize("count", [0, 1, 3, 4, 5])
+def test_stream_tree_reads_every_page(client, monkeypatch, count):
+    monkeypatch.setattr(ItemsManager, "TREE_PAGE_SIZE", 2)
+    client.tables["items"] = [item(n, f"/1/{n}/" if n > 1 else "/1/") for n in range(1, count + 1)]
+    client.tables["item_listing"] = [canvas(n) for n in range(1, 4)]
+
+    rows = streamed(ItemsManager())
+
+    assert [row["id"] for row in rows] == \
+        list(range(1, count + 1)) + ["canvas_1", "canvas_2", "canvas_3"]
+    # A full last page needs one more (empty) page to end, a partial one does not
+    item_pages = sum(1 for table, _ in client.requests if table == "items")
+    assert item_pages == count // 2 + 1
+
+
+def test_stream_tree_pages_by_path_order(client, monkeypatch):
+    monkeypatch.setattr(ItemsManager, "TREE_PAGE_SIZE", 2)
+    client.tables["items"] = [
+        item(10, "/10/"), item(2, "/2/"), item(3, "/2/3/"), item(11, "/10/11/"), item(4, "/2/3/4/"),
+    ]
+
+    rows = streamed(ItemsManager(), fields=["id", "depth"])
+
+    assert rows == [{"id": 10, "depth": 0}, {"id": 11, "depth": 1},
+                    {"id": 2, "depth": 0}, {"id": 3, "depth": 1}, {"id": 4, "depth": 2}]
+
+
+def test_stream_tree_max_depth(client):
+    client.tables["items"] = [item(1, "/1/"), item(2, "/1/2/"), item(3, "/1/2/3/")]
+    assert [row["id"] for row in streamed(ItemsManager(), max_depth=1)] == [1, 2]
+
+
+def test_stream_tree_rejects_bad_arguments_before_streaming(client):
+    with pytest.raises(Exception, match="Unknown fields: secret"):
+        ItemsManager().stream_tree(USER, fields=["id", "secret"])
+    with pytest.raises(Exception, match="negative"):
+        ItemsManager().stream_tree(USER, max_depth=-1)
+    assert client.requests == []
+
+
+@pytest.mark.parametrize("arguments", [
+    {"sort": "path"},
+    {"sort": "name", "order": "up"},
+    {"cursor": "not a cursor"},
+    {"cursor": "WzFd"},  # [1]
+])
+def test_invalid_listing_arguments_are_client_errors(client, arguments):
+    with pytest.raises(ValueError):
+        ItemsManager().fetch_item_page(USER, **arguments)
+
+
+def test_invalid_sort_of_a_full_listing_is_a_client_error(client):
+    with pytest.raises(ValueError, match="Cannot sort by 'path'"):
+        ItemsManager().fetch_items(USER, sort="path")
@@ -0,0 +1,260 @@
+"""
+Tests of the items triggers (Database/009 to 016) against a real PostgreSQL.
+
+Set TEST_DATABASE_URL to a scratch database to run them: they drop and
+recreate public.items and public.canvas there.
+"""
+import os
+import pathlib
+import random
+import threading
+import uuid
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+MIGRATIONS = pathlib.Path(__file__).resolve().parent.parent / "Database"
+ITEM_MIGRATIONS = ("009_items_path.sql", "010_items_depth.sql", "011_items_canvas_id.sql",
+                   "012_items_aggregates.sql", "013_item_listing.sql", "016_items_tree_lock.sql")
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+USER = str(uuid.uuid4())
+
+
+@pytest.fixture
+def db():
+    """A connection in autocommit mode to freshly migrated items tables."""
+    with psycopg.connect(DATABASE_URL, autocommit=True) as connection:
+        connection.execute("drop view if exists public.item_listing")
+        connection.execute("drop table if exists public.items, public.canvas cascade")
+        connection.execute(
+            "create table public.items ("
+            " id bigint generated by default as identity primary key,"
+            " name text not null, type text not null, file_type text, file_url text, size bigint,"
+            " parent_id bigint, user_id uuid not null,"
+            " created_at timestamptz not null default now(), updated_at timestamptz not null default now())"
+        )
+        connection.execute(
+            "create table public.canvas ("
+            " id bigint generated by default as identity primary key, name text, content text,"
+            " user_id uuid not null,"
+            " created_at timestamptz not null default now(), updated_at timestamptz not null default now())"
+        )
+        for name in ITEM_MIGRATIONS:
+            connection.execute((MIGRATIONS / name).read_text())
+        yield connection
+
+
+def add(db, name, parent_id=None, type="folder", size=None, user_id=USER):
+    return db.execute(
+        "insert into public.items (name, type, size, parent_id, user_id) values (%s, %s, %s, %s, %s) returning id",
+        (name, type, size, parent_id, user_id)
+    ).fetchone()[0]
+
+
+def move(db, item_id, parent_id):
+    db.execute("update public.items set parent_id = %s where id = %s", (parent_id, item_id))
+
+
+def paths(db):
+    return dict(db.execute("select name, path from public.items").fetchall())
+
+
+def test_paths_follow_inserts_and_moves(db):
+    docs = add(db, "docs")
+    work = add(db, "work", docs)
+    notes = add(db, "notes", work, "file", 10)
+    archive = add(db, "archive")
+
+    assert paths(db)["notes"] == f"/{docs}/{work}/{notes}/"
+
+    move(db, work, archive)
+    assert paths(db) == {
+        "docs": f"/{docs}/",
+        "archive": f"/{archive}/",
+        "work": f"/{archive}/{work}/",
+        "notes": f"/{archive}/{work}/{notes}/",
+    }
+    assert db.execute("select depth from public.items where id = %s", (notes,)).fetchone()[0] == 2
+
+
+def test_path_cannot_be_written_directly(db):
+    docs = add(db, "docs")
+    db.execute("update public.items set path = '/1/2/' where id = %s", (docs,))
+    assert paths(db)["docs"] == f"/{docs}/"
+
+
+def test_moving_into_own_subtree_is_rejected(db):
+    docs = add(db, "docs")
+    work = add(db, "work", docs)
+
+    with pytest.raises(psycopg.errors.RaiseException, match="own subtree"):
+        move(db, docs, work)
+    with pytest.raises(psycopg.errors.RaiseException, match="own subtree"):
+        move(db, docs, docs)
+
+
+def test_parent_must_belong_to_the_user(db):
+    other = add(db, "other", user_id=str(uuid.uuid4()))
+    with pytest.raises(psycopg.errors.RaiseException, match="Parent folder not found"):
+        add(db, "docs", other)
+
+
+def test_concurrent_crossed_moves_cannot_make_a_cycle(db):
+    a = add(db, "a")
+    b = add(db, "b")
+    errors = []
+
+    with psycopg.connect(DATABASE_URL) as first, psycopg.connect(DATABASE_URL) as second:
+        move(first, a, b)  # Not committed yet
+
+        def move_b_into_a():
+            try:
+                move(second, b, a)
+                second.commit()
+            except psycopg.Error as e:
+                errors.append(e)
+                second.rollback()
+
+        thread = threading.Thread(target=move_b_into_a)
+        thread.start()
+        thread.join(0.5)
+        assert thread.is_alive()  # Waits for the first move's transaction
+
+        first.commit()
+        thread.join(5)
+
+    assert len(errors) == 1 and "own subtree" in str(errors[0])
+    assert paths(db) == {"a": f"/{b}/{a}/", "b": f"/{b}/"}
+
+
+def test_insert_into_a_folder_being_moved_gets_its_new_path(db):
+    docs = add(db, "docs")
+    work = add(db, "work", docs)
+    archive = add(db, "archive")
+
+    with psycopg.connect(DATABASE_URL) as first, psycopg.connect(DATABASE_URL) as second:
+        move(first, docs, archive)  # Not committed yet
+
+        thread = threading.Thread(target=lambda: (add(second, "notes", work, "file", 1), second.commit()))
+        thread.start()
+        thread.join(0.5)
+        assert thread.is_alive()
+
+        first.commit()
+        thread.join(5)
+
+    assert paths(db)["notes"].startswith(f"/{archive}/{docs}/{work}/")
+
+
+def aggregates(db):
+    return {name: (total_size, count) for name, total_size, count in db.execute(
+        "select name, total_size, descendant_count from public.items"
+    ).fetchall()}
+
+
+def delete_subtree(db, item_id):
+    # Like ItemsManager.delete_item: one statement for the item and everything inside it
+    path = db.execute("select path from public.items where id = %s", (item_id,)).fetchone()[0]
+    db.execute("delete from public.items where path >= %s and path < %s", (path, path[:-1] + "0"))
+
+
+def test_aggregates_follow_inserts_moves_resizes_and_deletes(db):
+    docs = add(db, "docs")
+    work = add(db, "work", docs)
+    add(db, "a.txt", work, "file", 100)
+    b = add(db, "b.txt", docs, "file", 20)
+    archive = add(db, "archive")
+    old = add(db, "old", archive)
+    add(db, "c.txt", old, "file", 3)
+
+    assert aggregates(db)["docs"] == (120, 3)
+
+    move(db, work, archive)
+    assert aggregates(db)["docs"] == (20, 1)
+    assert aggregates(db)["archive"] == (103, 4)
+
+    db.execute("update public.items set size = 25 where id = %s", (b,))
+    assert aggregates(db)["docs"] == (25, 1)
+
+    move(db, old, None)
+    delete_subtree(db, work)
+    assert aggregates(db)["archive"] == (0, 0)
+    assert aggregates(db)["old"] == (3, 1)
+
+    # Several rows moved and deleted by one statement each
+    db.execute("update public.items set parent_id = %s where parent_id is null and id <> %s", (docs, docs))
+    assert aggregates(db)["docs"] == (28, 4)
+    db.execute("delete from public.items where type = 'file'")
+    assert aggregates(db)["docs"] == (0, 2)
+
+    assert db.execute("select public.repair_item_aggregates()").fetchone()[0] == 0
+
+
+def test_aggregates_stay_consistent_under_random_changes(db):
+    rng = random.Random(24)
+    folders = [add(db, "root")]
+    for n in range(60):
+        action = rng.random()
+        if action < 0.5 or len(folders) < 3:
+            kind = rng.choice(["folder", "file"])
+            new = add(db, f"{kind} {n}", rng.choice(folders), kind, rng.randint(0, 1000) if kind == "file" else None)
+            if kind == "folder":
+                folders.append(new)
+        elif action < 0.75:
+            item_id, parent_id = rng.sample(folders, 2)
+            try:
+                move(db, item_id, parent_id)
+            except psycopg.errors.RaiseException:
+                pass  # Into its own subtree
+        elif action < 0.85:
+            db.execute("update public.items set size = %s where id = (select id from public.items"
+                       " where type = 'file' order by random() limit 1)", (rng.randint(0, 1000),))
+        else:
+            victim = rng.choice(folders[1:])
+            delete_subtree(db, victim)
+            remaining = {row[0] for row in db.execute("select id from public.items").fetchall()}
+            folders = [folder for folder in folders if folder in remaining]
+
+    assert db.execute("select public.repair_item_aggregates()").fetchone()[0] == 0
+
+
+def test_item_listing_pages_items_and_canvases_in_one_order(db):
+    docs = add(db, "docs")
+    for n in range(5):
+        add(db, f"file {n}", docs, "file", 10)
+    add(db, "same size", None, "file", 10)
+    linked, unlinked = (db.execute(
+        "insert into public.canvas (name, user_id) values (%s, %s) returning id", (name, USER)
+    ).fetchone()[0] for name in ("linked", "unlinked"))
+    db.execute(
+        "insert into public.items (name, type, file_type, file_url, user_id) values ('linked', 'file', 'canvas', %s, %s)",
+        (f"/canvas/{linked}", USER)
+    )
+
+    root = db.execute(
+        "select id, sort_size, sort_id from public.item_listing where user_id = %s and parent_id is null"
+        " order by sort_size, sort_id", (USER,)
+    ).fetchall()
+
+    # A canvas that an item links to is listed once, through the item
+    ids = [str(row[0]) for row in root]
+    assert ids.count(f"canvas_{unlinked}") == 1
+    assert f"canvas_{linked}" not in ids
+    assert len(ids) == 4
+    assert len({row[2] for row in root}) == len(root)
+
+    # Keyset pages over (sort_size, sort_id) visit every row exactly once
+    seen, last = [], None
+    while True:
+        query = ("select id, sort_size, sort_id from public.item_listing where user_id = %s and parent_id is null"
+                 + (" and (sort_size, sort_id) > (%s, %s)" if last else "") + " order by sort_size, sort_id limit 2")
+        page = db.execute(query, (USER, *last) if last else (USER,)).fetchall()
+        if not page:
+            break
+        seen.extend(page)
+        last = page[-1][1:]
+    assert seen == root
@@ -0,0 +1,49 @@
+import pytest
+
+from Classes.Pagination import Pagination
+
+
+def test_cursor_round_trip():
+    cursor = Pagination.encode_cursor(["2025-01-01T00:00:00", 42])
+    assert Pagination.decode_cursor(cursor) == ["2025-01-01T00:00:00", 42]
+
+
+@pytest.mark.parametrize("cursor", [
+    "WzFd",  # [1]
+    Pagination.encode_cursor([1, 2, 3]),
+    Pagination.encode_cursor({"value": 1, "id": 2}),
+    Pagination.encode_cursor("text"),
+    "not base64 json!",
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        Pagination.decode_cursor(cursor)
+
+
+def test_after_filter_ascending():
+    assert Pagination.after_filter("title", False, "b", 7) == \
+        'title.gt."b",and(title.eq."b",id.gt."7"),title.is.null'
+
+
+def test_after_filter_descending():
+    assert Pagination.after_filter("title", True, "b", 7) == \
+        'title.lt."b",and(title.eq."b",id.lt."7")'
+
+
+def test_after_filter_from_a_null_value():
+    # Nulls sort last ascending, so only later nulls follow a null
+    assert Pagination.after_filter("title", False, None, 7) == 'and(title.is.null,id.gt."7")'
+    # and first descending, so every non-null value follows too
+    assert Pagination.after_filter("title", True, None, 7) == \
+        'title.not.is.null,and(title.is.null,id.lt."7")'
+
+
+@pytest.mark.parametrize("text, pattern", [
+    ("report", '"*report*"'),
+    ("100%", '"*100\\\\%*"'),
+    ("a_b", '"*a\\\\_b*"'),
+    ("a*b", '"*a_b*"'),
+    ('say "hi", (now)', '"*say \\"hi\\", (now)*"'),
+])
+def test_contains_pattern_escapes_wildcards_and_quotes(text, pattern):
+    assert Pagination.contains_pattern(text) == pattern
@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from Classes.DataConfig import DataConfig
+from Classes.Tasks import TaskManager
+from tests.fakes import FakeClient
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("ACTIVITY_ASYNC", "0")
+    client = FakeClient({"tasks": [
+        {"id": 1, "title": "Write", "priority": "High", "status": "Pending", "user_id": "user-1"},
+        {"id": 2, "title": "Review", "priority": "Low", "status": "Pending", "user_id": "user-1"},
+        {"id": 3, "title": "Other", "priority": "Low", "status": "Pending", "user_id": "user-2"},
+    ]})
+    monkeypatch.setattr(DataConfig, "get_client", classmethod(lambda cls: client))
+    return client
+
+
+def test_batch_applies_each_kind_of_operation(client):
+    results = TaskManager().apply_batch([
+        {"op": "create", "data": {"title": "New"}},
+        {"op": "status", "id": 1, "status": "Completed"},
+        {"op": "delete", "id": 2},
+    ], "user-1")
+
+    assert [result["op"] for result in results] == ["create", "status", "delete"]
+    assert all("error" not in result for result in results)
+    titles = {task["title"]: task["status"] for task in client.tables["tasks"] if task["user_id"] == "user-1"}
+    assert titles == {"Write": "Completed", "New": "Pending"}
+
+
+@pytest.mark.parametrize("operation, error", [
+    ({"op": "update", "id": 1, "data": []}, "Data must be an object"),
+    ({"op": "create", "data": "title"}, "Data must be an object"),
+    ({"op": "update", "id": [1], "data": {"title": "x"}}, "Task ID must be a number or a string"),
+    ({"op": "update", "id": 1}, "No data provided"),
+    ({"op": "rename", "id": 1}, "Unknown operation 'rename'"),
+    ("delete", "Unknown operation 'None'"),
+])
+def test_invalid_operation_only_fails_itself(client, operation, error):
+    results = TaskManager().apply_batch([operation, {"op": "delete", "id": 2}], "user-1")
+
+    assert results[0]["error"] == error
+    assert results[1] == {"op": "delete", "id": 2, "task": results[1]["task"]}
+    assert [task["id"] for task in client.tables["tasks"]] == [1, 3]
+
+
+def test_other_users_tasks_are_not_found(client):
+    results = TaskManager().apply_batch([{"op": "delete", "id": 3}], "user-1")
+    assert results == [{"op": "delete", "id": 3, "error": "Task not found"}]
+
+
+@pytest.mark.parametrize("arguments", [
+    {"sort": "password"},
+    {"sort": "title", "order": "sideways"},
+    {"fields": ["title", "secret"]},
+    {"cursor": "not a cursor"},
+])
+def test_invalid_listing_arguments_are_client_errors(client, arguments):
+    with pytest.raises(ValueError):
+        TaskManager().fetch_task_page("user-1", **arguments)
+
+
+@pytest.mark.parametrize("bucket, period", [
+    ("day", "2026-10-18"),
+    ("week", "2026-10-12"),
+    ("month", "2026-10-01"),
+])
+def test_stats_period_is_the_start_of_the_current_bucket(bucket, period):
+    now = datetime(2026, 10, 18, 23, 59, tzinfo=timezone.utc)  # A Sunday
+    assert TaskManager.stats_period(bucket, now) == period
@@ -0,0 +1,45 @@
+import time
+
+from auth.TokenCache import TokenCache
+
+
+class User:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+def test_put_and_get():
+    cache = TokenCache(max_bytes=1024 * 1024, ttl=60)
+    cache.put("token", User("user-1"), time.time() + 60)
+    assert cache.get("token").id == "user-1"
+    assert cache.get("other") is None
+
+
+def test_revoked_token_is_not_cached_again(no_shared_state):
+    cache = TokenCache(max_bytes=1024 * 1024, ttl=60)
+    cache.put("token", User("user-1"), time.time() + 60)
+
+    cache.revoke("token", time.time() + 60)
+    cache.put("token", User("user-1"), time.time() + 60)
+
+    assert cache.is_revoked("token")
+    assert cache.get("token") is None
+
+
+def test_revocation_expires_with_the_token(no_shared_state):
+    cache = TokenCache(max_bytes=1024 * 1024, ttl=60)
+    cache.revoke("token", time.time() - 1)
+    assert not cache.is_revoked("token")
+
+
+def test_revocation_is_seen_by_other_processes(shared_state):
+    # Two caches stand in for the caches of two worker processes
+    worker_a = TokenCache(max_bytes=1024 * 1024, ttl=60)
+    worker_b = TokenCache(max_bytes=1024 * 1024, ttl=60)
+    worker_b.put("token", User("user-1"), time.time() + 60)
+
+    worker_a.revoke("token", time.time() + 60)
+
+    assert worker_b.is_revoked("token")
+    assert worker_b.get("token") is None
+    assert not worker_b.is_revoked("other")
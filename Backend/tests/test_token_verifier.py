@@ -0,0 +1,78 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+
+from auth.TokenVerifier import TokenVerifier, UnknownKeyError
+
+SECRET = "test-secret"
+
+
+def encode(part) -> str:
+    raw = part if isinstance(part, bytes) else json.dumps(part).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def make_token(claims=None, header=None, secret=SECRET) -> str:
+    header = {"alg": "HS256", "typ": "JWT"} if header is None else header
+    if claims is None:
+        claims = {"sub": "user-1", "aud": "authenticated", "exp": time.time() + 3600}
+    signing_input = f"{encode(header)}.{encode(claims)}"
+    signature = hmac.new(secret.encode("utf-8"), signing_input.encode("ascii"), hashlib.sha256).digest()
+    return f"{signing_input}.{encode(signature)}"
+
+
+@pytest.fixture(autouse=True)
+def jwt_secret(monkeypatch):
+    monkeypatch.setenv("SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.delenv("SUPABASE_JWT_AUDIENCE", raising=False)
+
+
+def test_valid_token():
+    user = TokenVerifier.verify(make_token())
+    assert user.id == "user-1"
+    assert user.aud == "authenticated"
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "only.two",
+    "a.b.c.d",
+    "!!!.@@@.###",
+    "é.é.é",
+    make_token(secret="other-secret"),
+    make_token(header=[]),
+    make_token(header=1),
+    make_token(claims=[]),
+    make_token(claims="text"),
+    make_token(header={"alg": "RS256", "kid": ["a"]}),
+])
+def test_malformed_or_forged_token_is_rejected(token):
+    assert TokenVerifier.verify(token) is None
+
+
+@pytest.mark.parametrize("claims", [
+    {"sub": "user-1", "aud": "authenticated", "exp": time.time() - 3600},
+    {"sub": "user-1", "aud": "authenticated", "exp": "never"},
+    {"sub": "user-1", "aud": "authenticated"},
+    {"sub": "user-1", "aud": "authenticated", "exp": time.time() + 3600, "nbf": time.time() + 3600},
+    {"sub": "user-1", "aud": "anon", "exp": time.time() + 3600},
+    {"sub": "", "aud": "authenticated", "exp": time.time() + 3600},
+    {"sub": ["user-1"], "aud": "authenticated", "exp": time.time() + 3600},
+])
+def test_invalid_claims_are_rejected(claims):
+    assert TokenVerifier.verify(make_token(claims)) is None
+
+
+def test_unsupported_algorithm_falls_back_to_remote():
+    with pytest.raises(UnknownKeyError):
+        TokenVerifier.verify(make_token(header={"alg": "ES256"}))
+
+
+def test_missing_secret_falls_back_to_remote(monkeypatch):
+    monkeypatch.delenv("SUPABASE_JWT_SECRET")
+    with pytest.raises(UnknownKeyError):
+        TokenVerifier.verify(make_token())
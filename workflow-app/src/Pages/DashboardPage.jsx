@@ -1,7 +1,7 @@
 import { useState, useEffect, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import { apiRequest } from "../services/apiService";
-import useProjectStats from "../hooks/useProjectStats";
+import useChangeStream from "../hooks/useChangeStream";
 import Calendar from "../Components/Calendar/Calendar";
 import "./DashboardPage.css";
 
@@ -12,8 +12,12 @@ const DashboardPage = () => {
     upcomingDeadlines: 2,
   });
 
-  // Get project statistics from the custom hook
-  const projectStats = useProjectStats();
+  const [projectStats, setProjectStats] = useState({
+    totalProjects: 0,
+    activeProjects: 0,
+    onHoldProjects: 0,
+    completedProjects: 0,
+  });
 
   const [recentActivities, setRecentActivities] = useState([]);
   const [allActivities, setAllActivities] = useState([]);
@@ -55,29 +59,64 @@ const DashboardPage = () => {
 
   const navigate = useNavigate();
 
-  // Fetch tasks and calculate statistics
-  const fetchTaskStats = async () => {
-    try {
-      // The API endpoint already filters by the authenticated user through the auth middleware
-      const response = await apiRequest("http://localhost:8080/api/tasks");
-      if (!response.ok) {
-        throw new Error("Failed to fetch tasks");
+  // Format an activity record for display
+  const formatActivity = (activity) => {
+    // Format the timestamp
+    const timestamp = new Date(activity.timestamp);
+    const now = new Date();
+    
+    // Calculate time difference
+    const diffMs = now - timestamp;
+    const diffMins = Math.round(diffMs / 60000);
+    const diffHours = Math.round(diffMs / 3600000);
+    const diffDays = Math.round(diffMs / 86400000);
+    
+    let timeString;
+    if (diffMins < 60) {
+      timeString = `${diffMins} minute${diffMins !== 1 ? 's' : ''} ago`;
+    } else if (diffHours < 24) {
+      timeString = `${diffHours} hour${diffHours !== 1 ? 's' : ''} ago`;
+    } else if (diffDays < 30) {
+      timeString = `${diffDays} day${diffDays !== 1 ? 's' : ''} ago`;
+    } else {
+      timeString = timestamp.toLocaleDateString();
+    }
+    
+    // Determine activity type icon
+    let type;
+    // Special case for script creation
+    if (activity.activity_type === 'create' && activity.related_item_type === 'script') {
+      type = 'script';
+    } else {
+      switch (activity.activity_type) {
+        case 'create':
+          type = 'add';
+          break;
+        case 'complete':
+          type = 'complete';
+          break;
+        case 'update':
+        case 'rename':
+        case 'move':
+          type = 'update';
+          break;
+        case 'delete':
+          type = 'delete';
+          break;
+        default:
+          type = 'update';
       }
-
-      const tasks = await response.json();
-      
-      // Calculate task statistics
-      const completedTasks = tasks.filter(task => task.status === "Completed").length;
-      const totalTasks = tasks.length;
-      
-      setStats(prevStats => ({
-        ...prevStats,
-        totalTasks,
-        completedTasks,
-      }));
-    } catch (error) {
-      console.error("Error fetching task statistics:", error);
     }
+    
+    return {
+      id: activity.id,
+      type,
+      text: activity.description,
+      time: timeString,
+      timestamp: timestamp,
+      related_item_id: activity.related_item_id,
+      related_item_type: activity.related_item_type
+    };
   };
 
   // Fetch user activities
@@ -92,64 +131,7 @@ const DashboardPage = () => {
       const activities = await response.json();
       
       // Transform activities for display
-      const formattedActivities = activities.map(activity => {
-        // Format the timestamp
-        const timestamp = new Date(activity.timestamp);
-        const now = new Date();
-        
-        // Calculate time difference
-        const diffMs = now - timestamp;
-        const diffMins = Math.round(diffMs / 60000);
-        const diffHours = Math.round(diffMs / 3600000);
-        const diffDays = Math.round(diffMs / 86400000);
-        
-        let timeString;
-        if (diffMins < 60) {
-          timeString = `${diffMins} minute${diffMins !== 1 ? 's' : ''} ago`;
-        } else if (diffHours < 24) {
-          timeString = `${diffHours} hour${diffHours !== 1 ? 's' : ''} ago`;
-        } else if (diffDays < 30) {
-          timeString = `${diffDays} day${diffDays !== 1 ? 's' : ''} ago`;
-        } else {
-          timeString = timestamp.toLocaleDateString();
-        }
-        
-        // Determine activity type icon
-        let type;
-        // Special case for script creation
-        if (activity.activity_type === 'create' && activity.related_item_type === 'script') {
-          type = 'script';
-        } else {
-          switch (activity.activity_type) {
-            case 'create':
-              type = 'add';
-              break;
-            case 'complete':
-              type = 'complete';
-              break;
-            case 'update':
-            case 'rename':
-            case 'move':
-              type = 'update';
-              break;
-            case 'delete':
-              type = 'delete';
-              break;
-            default:
-              type = 'update';
-          }
-        }
-        
-        return {
-          id: activity.id,
-          type,
-          text: activity.description,
-          time: timeString,
-          timestamp: timestamp,
-          related_item_id: activity.related_item_id,
-          related_item_type: activity.related_item_type
-        };
-      });
+      const formattedActivities = activities.map(formatActivity);
       
       if (limit === 10) {
         setRecentActivities(formattedActivities);
@@ -179,10 +161,61 @@ const DashboardPage = () => {
     setShowFullCalendar(true);
   };
 
+  // Fetch everything shown on load in a single request
+  const fetchDashboard = async () => {
+    try {
+      const response = await apiRequest("http://localhost:8080/api/dashboard");
+      if (!response.ok) {
+        throw new Error("Failed to fetch dashboard");
+      }
+
+      const dashboard = await response.json();
+
+      if (dashboard.tasks) {
+        setStats(prevStats => ({
+          ...prevStats,
+          totalTasks: dashboard.tasks.total,
+          completedTasks: dashboard.tasks.completed,
+        }));
+      }
+
+      if (dashboard.projects) {
+        setProjectStats({
+          totalProjects: dashboard.projects.total,
+          activeProjects: dashboard.projects.active,
+          onHoldProjects: dashboard.projects.on_hold,
+          completedProjects: dashboard.projects.completed,
+        });
+      }
+
+      if (dashboard.activities) {
+        setRecentActivities(dashboard.activities.map(formatActivity));
+      }
+
+      if (dashboard.upcoming_events) {
+        setUpcomingEvents(dashboard.upcoming_events);
+      }
+    } catch (error) {
+      console.error("Error fetching dashboard:", error);
+    } finally {
+      setActivitiesLoading(false);
+      setEventsLoading(false);
+    }
+  };
+
+  useEffect(() => {
+    fetchDashboard();
+  }, []);
+
+  // Reload when data changes elsewhere, batching bursts of changes into one request
+  const refreshTimerRef = useRef(null);
+  useChangeStream(() => {
+    clearTimeout(refreshTimerRef.current);
+    refreshTimerRef.current = setTimeout(fetchDashboard, 500);
+  });
+
   useEffect(() => {
-    fetchTaskStats();
-    fetchActivities();
-    fetchUpcomingEvents(); // Fetch upcoming events on component mount
+    return () => clearTimeout(refreshTimerRef.current);
   }, []);
 
   // Calculate percentages for progress bars
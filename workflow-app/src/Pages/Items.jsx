@@ -397,6 +397,19 @@ const Items = () => {
     });
   };
 
+  const formatSize = (bytes) => {
+    const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+    let size = bytes || 0;
+    let unit = 0;
+    while (size >= 1024 && unit < units.length - 1) {
+      size /= 1024;
+      unit++;
+    }
+    // One decimal for small values in the larger units, e.g. 1.5 MB
+    const digits = unit > 0 && size < 10 ? 1 : 0;
+    return `${size.toFixed(digits)} ${units[unit]}`;
+  };
+
   const formatDate = (dateString) => {
     const date = new Date(dateString);
     const now = new Date();
@@ -482,7 +495,7 @@ const Items = () => {
             <div className="item-info">
               <h2>{selectedItem.name}</h2>
               <p>Type: {selectedItem.file_type || "Unknown"}</p>
-              <p>Size: {selectedItem.size ? `${Math.round(selectedItem.size / 1024)} KB` : "Unknown"}</p>
+              <p>Size: {selectedItem.size != null ? formatSize(selectedItem.size) : "Unknown"}</p>
               <p>Created: {formatDate(selectedItem.created_at)}</p>
               {selectedItem.description && <p>Description: {selectedItem.description}</p>}
             </div>
@@ -627,6 +640,9 @@ const Items = () => {
                         </div>
                         <div className="folder-info">
                           <p className="folder-date">{formatDate(folder.created_at)}</p>
+                          <p className="folder-size">
+                            {folder.descendant_count ?? 0} {folder.descendant_count === 1 ? "item" : "items"} · {formatSize(folder.total_size)}
+                          </p>
                         </div>
                         <button
                           className="item-delete-button"
@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useAuth } from "../context/AuthContext";
 import { apiRequest } from "../services/apiService";
 import ScriptsForm from "../Components/ScriptForm";
@@ -29,6 +29,25 @@ const languages = [
   { name: "C#", color: "#239120" },
 ];
 
+// Describe the change between two versions of the code as one ranged edit.
+// Offsets are in code points, like on the server.
+const diffCode = (base, next) => {
+  const a = Array.from(base);
+  const b = Array.from(next);
+
+  let start = 0;
+  while (start < a.length && start < b.length && a[start] === b[start]) start++;
+
+  let endA = a.length;
+  let endB = b.length;
+  while (endA > start && endB > start && a[endA - 1] === b[endB - 1]) {
+    endA--;
+    endB--;
+  }
+
+  return { start, end: endA, text: b.slice(start, endB).join("") };
+};
+
 const ScriptsPage = () => {
   const [scripts, setScripts] = useState([]);
   const [showForm, setShowForm] = useState(false);
@@ -39,6 +58,11 @@ const ScriptsPage = () => {
   const [selectedScript, setSelectedScript] = useState(null);
   const { currentUser } = useAuth();
 
+  // Last version of the open script the server confirmed, and the newest unsaved code
+  const savedRef = useRef(null);
+  const pendingRef = useRef(null);
+  const savingRef = useRef(false);
+
   useEffect(() => {
     fetchScripts();
   }, []);
@@ -49,7 +73,8 @@ const ScriptsPage = () => {
   
   const fetchScripts = async () => {
     try {
-      const response = await apiRequest(API_BASE_URL);
+      // The listing leaves out the code; it is loaded when a script is opened
+      const response = await apiRequest(`${API_BASE_URL}?view=summary`);
       if (!response.ok) {
         throw new Error("Failed to fetch scripts");
       }
@@ -63,8 +88,18 @@ const ScriptsPage = () => {
   };
   
   //new function
-  const handleScriptClick = (script) => {
-    setSelectedScript(script);
+  const handleScriptClick = async (script) => {
+    try {
+      const response = await apiRequest(`${API_BASE_URL}/${script.id}`);
+      if (!response.ok) {
+        throw new Error("Failed to fetch script");
+      }
+      const fullScript = await response.json();
+      savedRef.current = { id: fullScript.id, code: fullScript.code || "", code_hash: fullScript.code_hash };
+      setSelectedScript(fullScript);
+    } catch (error) {
+      console.error("Error fetching script:", error);
+    }
   };
 
   const handleBackClick = () => {
@@ -102,7 +137,8 @@ const ScriptsPage = () => {
       }
       
       const data = await response.json();
-      setScripts([...scripts, data]);
+      const { code, ...summary } = data;
+      setScripts([...scripts, { ...summary, size: new Blob([code || ""]).size }]);
       setShowForm(false);
     } catch (error) {
       console.error("Error adding script:", error);
@@ -162,28 +198,57 @@ const ScriptsPage = () => {
       if (selectedScript && selectedScript.id === scriptId) {
         const originalScript = scripts.find(script => script.id === scriptId);
         if (originalScript) {
-          setSelectedScript(originalScript);
+          setSelectedScript({ ...selectedScript, language: originalScript.language });
         }
       }
     }
   };
 
   const handleCodeChange = async (script, newCode) => {
+    pendingRef.current = { id: script.id, code: newCode };
+
+    // One save at a time: each patch is made against the version the previous one produced
+    if (savingRef.current) return;
+    savingRef.current = true;
+
     try {
-      const response = await apiRequest(`${API_BASE_URL}/${script.id}/code`, {
-        method: "PUT",
-        body: JSON.stringify({ code: newCode })
-      });
+      while (pendingRef.current) {
+        const { id, code } = pendingRef.current;
+        pendingRef.current = null;
 
-      if (!response.ok) {
-        throw new Error("Failed to update script code");
-      }
+        const saved = savedRef.current;
+        if (!saved || saved.id !== id || saved.code === code) continue;
 
-      const updatedScript = await response.json();
-      setScripts(scripts.map(s => s.id === script.id ? updatedScript : s));
-      setSelectedScript(updatedScript);
+        // Only the edited range is sent
+        const response = await apiRequest(`${API_BASE_URL}/${id}/code`, {
+          method: "PATCH",
+          body: JSON.stringify({ base_hash: saved.code_hash, ops: [diffCode(saved.code, code)] })
+        });
+
+        if (response.status === 409) {
+          alert("This script was changed somewhere else and has been reloaded.");
+          pendingRef.current = null;
+          await handleScriptClick({ id });
+          break;
+        }
+
+        if (!response.ok) {
+          throw new Error("Failed to update script code");
+        }
+
+        const result = await response.json();
+        savedRef.current = { id, code, code_hash: result.code_hash };
+        setScripts(prevScripts => prevScripts.map(s =>
+          s.id === id ? { ...s, size: result.size, updated_at: result.updated_at } : s
+        ));
+        setSelectedScript(prevScript =>
+          prevScript && prevScript.id === id ? { ...prevScript, code, code_hash: result.code_hash } : prevScript
+        );
+      }
     } catch (error) {
       console.error("Error updating script code:", error);
+    } finally {
+      savingRef.current = false;
     }
   };
 
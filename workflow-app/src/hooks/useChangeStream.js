@@ -0,0 +1,101 @@
+import { useEffect, useRef } from "react";
+
+// Custom hook to receive change notifications from the server instead of polling.
+// onChange is called with {collection, id, op, version}, or with null when the
+// client fell too far behind (or the server asks it to poll) and should refetch everything.
+const useChangeStream = (onChange) => {
+  const onChangeRef = useRef(onChange);
+
+  useEffect(() => {
+    onChangeRef.current = onChange;
+  }, [onChange]);
+
+  useEffect(() => {
+    let controller = null;
+    let retryTimer = null;
+    let pollTimer = null;
+    let retryDelay = 5000;
+
+    const handleFrame = (frame) => {
+      let event = "message";
+      const data = [];
+      for (const line of frame.split("\n")) {
+        if (line.startsWith(":")) continue; // Heartbeat comment
+        const separator = line.indexOf(":");
+        const field = separator === -1 ? line : line.slice(0, separator);
+        const value = separator === -1 ? "" : line.slice(separator + 1).replace(/^ /, "");
+        if (field === "event") event = value;
+        else if (field === "data") data.push(value);
+        else if (field === "retry" && /^\d+$/.test(value)) retryDelay = Number(value);
+      }
+
+      if (event === "change") {
+        onChangeRef.current(JSON.parse(data.join("\n")));
+      } else if (event === "resync") {
+        onChangeRef.current(null);
+      } else if (event === "ready") {
+        // Without shared state the server only sees its own process's changes,
+        // so it tells the client how often to refetch as well
+        const { poll } = JSON.parse(data.join("\n"));
+        clearInterval(pollTimer);
+        pollTimer = poll ? setInterval(() => onChangeRef.current(null), poll * 1000) : null;
+      }
+    };
+
+    // EventSource cannot send headers, so the stream is read with fetch to keep
+    // the token in the Authorization header rather than in the URL
+    const connect = async () => {
+      const session = localStorage.getItem('session');
+      if (!session) return;
+
+      const { access_token } = JSON.parse(session);
+      controller = new AbortController();
+
+      try {
+        const response = await fetch("http://localhost:8080/api/stream", {
+          headers: {
+            'Authorization': `Bearer ${access_token}`,
+            'Accept': 'text/event-stream',
+          },
+          signal: controller.signal,
+        });
+        if (!response.ok || !response.body) {
+          throw new Error(`Change stream failed with status ${response.status}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+
+          let end;
+          while ((end = buffer.indexOf("\n\n")) !== -1) {
+            handleFrame(buffer.slice(0, end));
+            buffer = buffer.slice(end + 2);
+          }
+        }
+      } catch (error) {
+        if (controller.signal.aborted) return;
+        console.error("Change stream error:", error);
+      }
+
+      // The server closes the stream when the token expires; reconnect with the current one
+      if (!controller.signal.aborted) {
+        retryTimer = setTimeout(connect, retryDelay);
+      }
+    };
+
+    connect();
+
+    return () => {
+      if (retryTimer) clearTimeout(retryTimer);
+      clearInterval(pollTimer);
+      if (controller) controller.abort();
+    };
+  }, []);
+};
+
+export default useChangeStream;